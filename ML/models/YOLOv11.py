@@ -1,20 +1,66 @@
-from ultralytics import YOLO
+import argparse
 
-def handle_detections(detections):
+import cv2
+
+from capture import ThreadedCapture
+from detectors import YOLOv11Detector
+from engine import draw_detections
+from reporting import EventReporter
+from scheduler import DetectionScheduler
+
+def handle_detections(detections, reporter=None):
+    if reporter is not None:
+        # debounced, and posted to the database off this thread
+        for transition in reporter.report(detections):
+            disaster = "fire" if transition.label == "fire" else "flood"
+            print(f"{disaster} {'detected' if transition.state == 'start' else 'cleared'}")
+        return
     for detection in detections:
         if detection["class"] == "fire" and detection["confidence"] > 0.7:
             print("fire detected")
         elif detection["class"] == "water" and detection["confidence"] > 0.7:
             print("flood detected")
 
-if __name__ == "__main__":
-    model = YOLO('yolo11n.pt')
-    results = model(0, show=True)
+def main():
+    parser = argparse.ArgumentParser(description="YOLO11 on a camera, optionally detecting on some frames only")
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--weights", default="yolo11n.pt")
+    parser.add_argument("--every", type=int, default=1, help="run the detector every N frames, tracking in between")
+    parser.add_argument("--motion", type=float, help="also run it when the frame changes by more than this (0-1)")
+    parser.add_argument("--budget-ms", type=float, help="adapt N so each frame fits this latency budget")
+    parser.add_argument("--report-url", help="record detected disasters as events in the database API at this URL")
+    parser.add_argument("--robot-type", default="TurtleBot3")
+    parser.add_argument("--world-type", default="Warehouse")
+    args = parser.parse_args()
+
+    detector = YOLOv11Detector(args.weights)
+    detector.warm_up()
+    scheduler = DetectionScheduler(detector, every=args.every, motion_threshold=args.motion,
+                                   latency_budget=args.budget_ms / 1000 if args.budget_ms else None)
+    reporter = EventReporter(args.report_url, args.robot_type, args.world_type) if args.report_url else None
 
-    for result in results:
-        frame_detections = [
-            {"class": model.names[int(box.cls)], "confidence": float(box.conf), "bbox": box.xyxy[0].tolist()}
-            for box in result.boxes
-        ]
-        # handle_detections(frame_detections) , this is where we handle such detections
+    # read on its own thread so a slow detector run never backs up the camera
+    with ThreadedCapture(args.source) as capture:
+        capture.start()
+        while True:
+            frame = capture.latest(timeout=1.0)
+            if frame is None:
+                break
+            result = scheduler.process(frame.image)
 
+            frame_detections = [detection.to_dict() for detection in result.detections]
+            handle_detections(frame_detections, reporter)
+
+            cv2.imshow("YOLO11 Detection", draw_detections(frame.image, result.detections))
+            # break loop with q key
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+
+    cv2.destroyAllWindows()
+    print(scheduler.stats())
+    if reporter is not None:
+        reporter.close()
+        print(reporter.stats())
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
+import os
+from typing import List, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
 import torch
 import torch.nn as nn
-from torchvision.transforms import v2
-import cv2
+from torchvision.ops import batched_nms
+
+from capture import ThreadedCapture
+
+IMAGE_SIZE = 416
+
+# YOLOv3's anchors for its stride 8 output, in input pixels (width, height)
+DEFAULT_ANCHORS = ((10, 13), (16, 30), (33, 23))
+
+# Pascal VOC, the 20 classes the default head predicts
+class_labels = [
+    "aeroplane", "bicycle", "bird", "boat", "bottle", "bus", "car", "cat", "chair", "cow",
+    "diningtable", "dog", "horse", "motorbike", "person", "pottedplant", "sheep", "sofa", "train", "tvmonitor",
+]
 
 class ConvBlock(nn.Module):
     def __init__(self, in_channels, out_channels, kernel_size, stride, padding):
@@ -40,8 +57,11 @@ class YOLOHead(nn.Module):
         return self.detector(x).permute(0, 2, 3, 1).contiguous()
 
 class YOLO(nn.Module):
-    def __init__(self, grid_size=7, num_classes=20, num_anchors=3):
+    def __init__(self, grid_size=7, num_classes=20, num_anchors=3, anchors=DEFAULT_ANCHORS):
         super(YOLO, self).__init__()
+        if len(anchors) != num_anchors:
+            raise ValueError(f"Expected {num_anchors} anchors, got {len(anchors)}")
+        self.anchors = anchors
         self.backbone = YOLOBackbone()
         self.head = YOLOHead(grid_size, num_classes, num_anchors)
 
@@ -52,44 +72,127 @@ class YOLO(nn.Module):
 
 
 
+def preprocess(frames: Sequence[np.ndarray], image_size: int, device) -> torch.Tensor:
+    """(B, 3, S, S) RGB float batch in [0, 1] from BGR uint8 frames, resized to the square model input."""
+    resized = np.stack([cv2.resize(frame, (image_size, image_size), interpolation=cv2.INTER_LINEAR)
+                        for frame in frames])
+    # Convert on the device: the uint8 copy is a quarter the size of a float one
+    batch = torch.from_numpy(resized).to(device).permute(0, 3, 1, 2).flip(1)
+    return batch.float().div_(255)
+
+
+def make_grid(height: int, width: int, device) -> torch.Tensor:
+    """(1, H, W, 1, 2) x, y cell offsets."""
+    ys, xs = torch.meshgrid(torch.arange(height, device=device), torch.arange(width, device=device), indexing="ij")
+    return torch.stack((xs, ys), -1).view(1, height, width, 1, 2).float()
+
+
+def decode_predictions(predictions: torch.Tensor, image_size: Union[int, Tuple[int, int]],
+                       anchors=DEFAULT_ANCHORS) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Boxes and class scores from YOLOHead output.
+
+    predictions is the (B, H, W, A * (5 + C)) head output for inputs of
+    image_size pixels (an int for square inputs, or height, width). Returns
+    (B, H * W * A, 4) x1, y1, x2, y2 boxes in input pixels and
+    (B, H * W * A, C) scores, objectness times class probability.
+    """
+    batch, height, width, _ = predictions.shape
+    input_height, input_width = (image_size, image_size) if isinstance(image_size, int) else image_size
+    anchors = torch.as_tensor(anchors, dtype=predictions.dtype, device=predictions.device)
+    p = predictions.view(batch, height, width, len(anchors), -1)
+
+    stride = torch.tensor((input_width / width, input_height / height), dtype=p.dtype, device=p.device)
+    xy = (p[..., :2].sigmoid() + make_grid(height, width, p.device)) * stride
+    wh = p[..., 2:4].exp() * anchors
+    boxes = torch.cat((xy - wh / 2, xy + wh / 2), -1).view(batch, -1, 4)
+    scores = (p[..., 4:5].sigmoid() * p[..., 5:].sigmoid()).view(batch, boxes.shape[1], -1)
+    return boxes, scores
+
+
+def non_max_suppression(boxes: torch.Tensor, scores: torch.Tensor, conf_threshold: float = 0.25,
+                        iou_threshold: float = 0.45, max_det: int = 300) -> List[torch.Tensor]:
+    """Class-aware NMS over a batch of decode_predictions() output.
+
+    Each box takes its best class. Returns one (N, 6) x1, y1, x2, y2,
+    confidence, class tensor per image, by decreasing confidence, on the
+    device of the inputs.
+    """
+    batch, _, num_classes = scores.shape
+    confidence, classes = scores.max(-1)
+    image_index, box_index = (confidence > conf_threshold).nonzero(as_tuple=True)
+    candidates = boxes[image_index, box_index]
+    confidence = confidence[image_index, box_index]
+    classes = classes[image_index, box_index]
+
+    # One NMS call for the whole batch: boxes only suppress each other within
+    # the same image and class
+    keep = batched_nms(candidates, confidence, image_index * num_classes + classes, iou_threshold)
+
+    # keep is by decreasing confidence; a stable sort by image keeps that
+    # order within each image, and a box's rank in its image is its position
+    # minus where its image starts
+    image_index = image_index[keep]
+    image_index, order = torch.sort(image_index, stable=True)
+    keep = keep[order]
+    counts = torch.bincount(image_index, minlength=batch)
+    rank = torch.arange(len(keep), device=keep.device) - (counts.cumsum(0) - counts)[image_index]
+    keep = keep[rank < max_det]
+    counts = counts.clamp(max=max_det)
+
+    detections = torch.cat((candidates[keep], confidence[keep, None], classes[keep, None].to(candidates.dtype)), 1)
+    return list(detections.split(counts.tolist()))
+
+
+def scale_boxes(detections: torch.Tensor, image_size: int, shape: Tuple[int, ...]) -> torch.Tensor:
+    """detections with boxes scaled from the square model input back to a frame of shape (H, W, ...)."""
+    height, width = shape[:2]
+    scale = detections.new_tensor((width / image_size, height / image_size) * 2)
+    return torch.cat((detections[:, :4] * scale, detections[:, 4:]), 1)
+
+
+def visualize_predictions(frame: np.ndarray, detections: torch.Tensor, labels: Sequence[str]) -> np.ndarray:
+    """Draw (N, 6) detections in frame pixels onto frame."""
+    for x1, y1, x2, y2, conf, cls in detections.cpu().tolist():
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+        cv2.putText(frame, f"{labels[int(cls)]} {conf:.2f}", (int(x1), max(int(y1) - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return frame
+
+
+def main():
+    from detectors import default_device
+    device = default_device()
+
+    # a state_dict saved with torch.save(); darknet .weights files need converting first
+    weight_path = "weights/yolov3.pt"
+    model = YOLO(grid_size=7, num_classes=20, num_anchors=3).to(device).eval()
+    if os.path.exists(weight_path):
+        model.load_state_dict(torch.load(weight_path, map_location=device), strict=False)
+    else:
+        print(f"Warning: {weight_path} not found, running with random weights.")
+
+    # open camera, read on its own thread so a slow frame never backs up the camera
+    capture = ThreadedCapture(0).start()
 
-
-if __name__ == "__main__":
-    weight_path = "weights/yolov3.weights"
-    state_dict = torch.load(weight_path)
-
-    model = YOLO(grid_size=7, num_classes=20, num_anchors=3)
-    model.load_state_dict(state_dict, strict=False)
-
-    # open camera
-    cap = cv2.VideoCapture(0)
-    
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        latest = capture.latest(timeout=1.0)
+        if latest is None:
             break
-        
-        image_tensor = v2.ToTensor()(frame).unsqueeze(0).to('cuda')
-        
-        with torch.no_grad():
-            predictions = model(image_tensor)
-        
-        boxes = non_max_suppression(predictions.cpu().numpy())
-        visualize_predictions(frame, boxes, class_labels)
+        frame = latest.image
+
+        with torch.inference_mode():
+            boxes, scores = decode_predictions(model(preprocess([frame], IMAGE_SIZE, device)), IMAGE_SIZE,
+                                               model.anchors)
+        detections = non_max_suppression(boxes, scores)[0]
+        visualize_predictions(frame, scale_boxes(detections, IMAGE_SIZE, frame.shape), class_labels)
 
         cv2.imshow("YOLO Detection", frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    cap.release()
+    capture.stop()
     cv2.destroyAllWindows()
 
 
-
-
-
-
-
-
-
-
+if __name__ == "__main__":
+    main()
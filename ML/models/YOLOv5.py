@@ -3,47 +3,65 @@ from PIL import Image
 import cv2
 import numpy as np
 
-model = torch.hub.load("ultralytics/yolov5", "yolov5s", pretrained=True)
+from capture import ThreadedCapture
+from registry import default_registry
 
-#device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
-model.to(device)
 
-#img = Image.open("../test/car.jpg.webp")
-#res = model(img)
-#res.print()
-#res.show()
+def default_device():
+    #return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return torch.device("mps" if torch.backends.mps.is_available() else "cpu")
 
-# open camera
-cap = cv2.VideoCapture(0)
 
-if not cap.isOpened(): 
-    print("Error: Could not open camera.")
-    exit()
+def load_model(variant="yolov5s", device=None):
+    # the hub code and the weights are pinned in the local registry, so nothing is fetched from GitHub on start
+    registry = default_registry()
+    model = torch.hub.load(registry.extract("yolov5-repo"), "custom", path=registry.path(variant),
+                           source="local", _verbose=False)
+    model.to(device or default_device())
+    return model
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Error: Could not read frame.")
-        break
 
-    # BGR -> RGB
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def main():
+    model = load_model()
 
-    # numpy to PIL image
-    pil_img = Image.fromarray(frame_rgb)
-    results = model(pil_img)
-    frame_with_detections = results.render()[0]
-    # back to BGR for OpenCV display
-    frame_with_detections = cv2.cvtColor(frame_with_detections, cv2.COLOR_RGB2BGR)
-    cv2.imshow("YOLOv5 Real-Time Detection", frame_with_detections)
+    #img = Image.open("../test/car.jpg.webp")
+    #res = model(img)
+    #res.print()
+    #res.show()
 
-    # break loop with q key, temp for testing
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    # open camera, read on its own thread so a slow frame never backs up the camera
+    try:
+        capture = ThreadedCapture(0).start()
+    except RuntimeError as e:
+        print(e)
+        return
 
-cap.release()
-cv2.destroyAllWindows()
+    while True:
+        latest = capture.latest(timeout=1.0)
+        if latest is None:
+            print("Error: Could not read frame.")
+            break
+        frame = latest.image
 
+        # BGR -> RGB
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
+        # numpy to PIL image
+        pil_img = Image.fromarray(frame_rgb)
+        results = model(pil_img)
+        frame_with_detections = results.render()[0]
+        # back to BGR for OpenCV display
+        frame_with_detections = cv2.cvtColor(frame_with_detections, cv2.COLOR_RGB2BGR)
+        cv2.imshow("YOLOv5 Real-Time Detection", frame_with_detections)
 
+        # break loop with q key, temp for testing
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    capture.stop()
+    cv2.destroyAllWindows()
+    print(capture.stats())
+
+
+if __name__ == "__main__":
+    main()
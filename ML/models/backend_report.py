@@ -0,0 +1,160 @@
+import argparse
+import json
+import sys
+import time
+from typing import List, Sequence
+
+import numpy as np
+import torch
+
+from backends import BACKENDS, TEST_IMAGES, load_images
+from capture import percentiles
+from detectors import DETECTORS, Detection, load_detector
+
+
+def iou(a: Sequence[float], b: Sequence[float]) -> float:
+    width = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    height = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def drift(reference: List[List[Detection]], candidate: List[List[Detection]], iou_threshold: float = 0.5) -> dict:
+    """How far candidate detections are from the reference ones, image by image.
+
+    A reference detection is matched by a candidate of the same class whose
+    box overlaps it by iou_threshold (any candidate of the same class for
+    whole-frame labels). recall is the share of reference detections matched,
+    extra the unmatched candidates, and confidence_delta the mean absolute
+    confidence difference of the matches. For a top-1 classifier recall is
+    the top-1 agreement.
+    """
+    expected = matched = extra = 0
+    deltas = []
+    for reference_detections, candidate_detections in zip(reference, candidate):
+        unmatched = list(candidate_detections)
+        for detection in reference_detections:
+            expected += 1
+            for other in unmatched:
+                if other.class_id == detection.class_id and (
+                        detection.bbox is None or iou(detection.bbox, other.bbox) >= iou_threshold):
+                    matched += 1
+                    deltas.append(abs(other.confidence - detection.confidence))
+                    unmatched.remove(other)
+                    break
+        extra += len(unmatched)
+    return {
+        "recall": matched / expected if expected else None,
+        "extra": extra,
+        "confidence_delta": float(np.mean(deltas)) if deltas else None,
+    }
+
+
+def measure(detector, images: List[np.ndarray], batch_size: int, repeat: int) -> dict:
+    """Latency per batch and throughput over repeat passes through images, after one warm-up pass."""
+    batches = [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+    detections = [frame for batch in batches for frame in detector.predict(batch)]
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for batch in batches:
+            batch_start = time.perf_counter()
+            detector.predict(batch)
+            latencies.append(time.perf_counter() - batch_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "latency_ms": percentiles(latencies),
+        "frames_per_second": round(repeat * len(images) / elapsed, 2),
+        "detections": detections,
+    }
+
+
+def report(models: Sequence[str], backends: Sequence[str], images: List[np.ndarray], batch_size: int,
+           repeat: int, seed: int, options: dict, progress=None) -> List[dict]:
+    """One result per model and backend; drift is measured against each model's first backend."""
+    results = []
+    for model in models:
+        reference = None
+        for backend in backends:
+            result = {"model": model, "backend": backend, "batch_size": batch_size, "images": len(images)}
+            # The same seed gives every backend the same weights when there are no trained ones
+            torch.manual_seed(seed)
+            try:
+                start = time.perf_counter()
+                detector = load_detector(model, backend=backend, **options.get(model, {}))
+                result["load_seconds"] = round(time.perf_counter() - start, 3)
+                measured = measure(detector, images, batch_size, repeat)
+            except (ImportError, RuntimeError, ValueError) as e:
+                result["error"] = str(e)
+            else:
+                detections = measured.pop("detections")
+                result.update(measured)
+                if reference is None:
+                    reference = detections
+                    result["drift"] = None
+                else:
+                    result["drift"] = drift(reference, detections)
+            if progress:
+                progress(result)
+            results.append(result)
+    return results
+
+
+def format_result(result: dict) -> str:
+    prefix = f"{result['model']:>8} {result['backend']:>8}"
+    if "error" in result:
+        return f"{prefix}  skipped: {result['error']}"
+    latency = result["latency_ms"]
+    line = (f"{prefix} {latency['p50']:>9.1f} {latency['p95']:>9.1f} {result['frames_per_second']:>8.1f} "
+            f"{result['load_seconds']:>7.1f}")
+    if result["drift"]:
+        recall = result["drift"]["recall"]
+        delta = result["drift"]["confidence_delta"]
+        line += f"  recall {recall:.3f}" if recall is not None else "  recall -"
+        line += f", conf delta {delta:.4f}" if delta is not None else ""
+        line += f", extra {result['drift']['extra']}"
+    else:
+        line += "  (reference)"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency, throughput and accuracy drift of each detector "
+                                                 "under each backend, on a fixed image set")
+    parser.add_argument("--models", nargs="+", choices=list(DETECTORS), default=["yolov3", "vit"])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="the first one is the reference for accuracy drift")
+    parser.add_argument("--images", default=TEST_IMAGES, help="directory of test images")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=10, help="timed passes over the image set")
+    parser.add_argument("--threads", type=int, help="torch CPU threads (default: torch's choice)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--yolov3-weights", help="state_dict for yolov3 (default: seeded random weights)")
+    parser.add_argument("--vit-random-weights", action="store_true",
+                        help="don't download the ImageNet weights for vit, for timing only")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    images = load_images(args.images)
+    if not images:
+        parser.error(f"no images in {args.images}")
+    options = {
+        "yolov3": {"weights": args.yolov3_weights},
+        "vit": {"pretrained": not args.vit_random_weights, "top_k": 5},
+    }
+
+    if not args.json:
+        print(f"{len(images)} images, batch size {args.batch_size}, {torch.get_num_threads()} threads")
+        print(f"{'model':>8} {'backend':>8} {'p50 ms':>9} {'p95 ms':>9} {'fps':>8} {'load s':>7}  drift")
+    progress = None if args.json else lambda result: print(format_result(result), flush=True)
+    results = report(args.models, args.backends, images, args.batch_size, args.repeat, args.seed, options, progress)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
+    sys.stdout.flush()
@@ -0,0 +1,144 @@
+import os
+import tempfile
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from sources import ImageDirectorySource
+
+try:
+    import onnxruntime
+except ImportError:  # optional, see requirements.txt
+    onnxruntime = None
+
+# eager: the fp32 PyTorch model as is
+# dynamic: int8 weights for Linear layers, activations quantized on the fly
+# static: int8 weights and activations, scales calibrated on sample frames
+# onnx: exported to ONNX and run under ONNX Runtime
+BACKENDS = ("eager", "dynamic", "static", "onnx")
+
+# Quantized kernels and our ONNX Runtime sessions only run on the CPU
+CPU_BACKENDS = {"dynamic", "static", "onnx"}
+
+# The fixed image set for calibration and accuracy checks
+TEST_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test")
+
+
+def load_images(path: str = TEST_IMAGES) -> List[np.ndarray]:
+    return list(frame.image for frame in ImageDirectorySource(path))
+
+
+def quantize_dynamic(model: nn.Module) -> nn.Module:
+    """int8 Linear layers. Pays off for transformers like vit_b_16, which are
+    almost all Linear; convolutional models are left unchanged."""
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model: nn.Module, example: torch.Tensor, calibration: Iterable[torch.Tensor]) -> nn.Module:
+    """int8 model from FX graph mode quantization, with activation ranges
+    observed over the calibration batches (or just example if there are none)."""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+    prepared = prepare_fx(model, get_default_qconfig_mapping(torch.backends.quantized.engine), (example,))
+    with torch.inference_mode():
+        calibrated = False
+        for batch in calibration:
+            prepared(batch)
+            calibrated = True
+        if not calibrated:
+            prepared(example)
+    return convert_fx(prepared)
+
+
+class OnnxModel:
+    """Callable like the model it was exported from: a batch tensor in, the
+    first output as a tensor out. The batch dimension is dynamic.
+
+    The model is exported to path, or to a temporary file if path is None;
+    an existing file at path is reused as is (registry.Registry.artifact()
+    keys paths by the weights' checksum, so the file is never stale).
+    """
+
+    def __init__(self, model: nn.Module, example: torch.Tensor, path: Optional[str] = None,
+                 threads: Optional[int] = None):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed, see requirements.txt")
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix="onnx-"), "model.onnx")
+        if not os.path.exists(path):
+            export_onnx(model, example, path)
+        self.path = path
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        output = self.session.run(None, {self.input_name: batch.detach().cpu().numpy()})[0]
+        return torch.from_numpy(output)
+
+
+def export_onnx(model: nn.Module, example: torch.Tensor, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    torch.onnx.export(
+        model.cpu().eval(), (example.cpu(),), path,
+        input_names=["images"], output_names=["output"],
+        dynamic_axes={"images": {0: "batch"}, "output": {0: "batch"}},
+        opset_version=17, dynamo=False,
+    )
+
+
+def prepare_model(model: nn.Module, backend: str, example: torch.Tensor,
+                  calibration: Iterable[torch.Tensor] = (), onnx_path: Optional[str] = None,
+                  cache_path: Optional[str] = None) -> Callable:
+    """model ready to run under backend, as a callable taking and returning tensors.
+
+    example is a preprocessed input batch, used to trace and export the
+    model. calibration batches are only used by the static backend.
+
+    With cache_path, what a backend builds is kept there and loaded instead
+    of built on the next run: the ONNX file (unless onnx_path is given) and
+    the quantized model, as TorchScript traced on example.
+    """
+    model = model.eval()
+    if backend == "eager":
+        return model
+    if backend == "onnx":
+        return OnnxModel(model, example, onnx_path or cache_path)
+    if backend not in ("dynamic", "static"):
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if cache_path and os.path.exists(cache_path):
+        return torch.jit.load(cache_path, map_location="cpu")
+    if backend == "dynamic":
+        quantized = quantize_dynamic(model.cpu())
+    else:
+        quantized = quantize_static(model.cpu(), example.cpu(), (batch.cpu() for batch in calibration))
+    if not cache_path:
+        return quantized
+    with torch.inference_mode():
+        traced = torch.jit.trace(quantized, example.cpu())
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    torch.jit.save(traced, cache_path + ".tmp")
+    os.replace(cache_path + ".tmp", cache_path)
+    return traced
+
+
+def prepare_for_frames(model: nn.Module, backend: str, preprocess: Callable[[Sequence[np.ndarray]], torch.Tensor],
+                       calibration: Optional[Sequence[np.ndarray]] = None, onnx_path: Optional[str] = None,
+                       example_shape: Tuple[int, int, int] = (480, 640, 3),
+                       cache_path: Optional[str] = None) -> Callable:
+    """prepare_model() for a model fed by preprocess(frames).
+
+    The static backend calibrates on calibration frames, the test images by
+    default.
+    """
+    if calibration is None:
+        calibration = load_images() if backend == "static" else []
+    batches = [preprocess([frame]) for frame in calibration]
+    example = batches[0] if batches else preprocess([np.zeros(example_shape, np.uint8)])
+    return prepare_model(model, backend, example, batches, onnx_path, cache_path)
@@ -0,0 +1,150 @@
+import argparse
+import json
+import math
+import time
+from typing import List, Tuple
+
+import torch
+
+from YOLOv3_torch import DEFAULT_ANCHORS, decode_predictions, non_max_suppression
+
+
+def sigmoid(x: float) -> float:
+    return 1 / (1 + math.exp(-x))
+
+
+def naive_decode(predictions: torch.Tensor, image_size: int, anchors=DEFAULT_ANCHORS) -> List[List[Tuple]]:
+    """Reference decoding, one Python loop iteration per cell and anchor:
+    per image a list of (x1, y1, x2, y2, confidence, class)."""
+    batch, height, width, channels = predictions.shape
+    per_anchor = channels // len(anchors)
+    values = predictions.tolist()
+    decoded = []
+    for b in range(batch):
+        boxes = []
+        for y in range(height):
+            for x in range(width):
+                cell = values[b][y][x]
+                for a, (anchor_w, anchor_h) in enumerate(anchors):
+                    p = cell[a * per_anchor:(a + 1) * per_anchor]
+                    cx = (sigmoid(p[0]) + x) * image_size / width
+                    cy = (sigmoid(p[1]) + y) * image_size / height
+                    w = math.exp(p[2]) * anchor_w
+                    h = math.exp(p[3]) * anchor_h
+                    objectness = sigmoid(p[4])
+                    scores = [objectness * sigmoid(c) for c in p[5:]]
+                    cls = max(range(len(scores)), key=scores.__getitem__)
+                    boxes.append((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, scores[cls], cls))
+        decoded.append(boxes)
+    return decoded
+
+
+def iou(a: Tuple, b: Tuple) -> float:
+    width = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    height = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def naive_nms(decoded: List[List[Tuple]], conf_threshold: float = 0.25, iou_threshold: float = 0.45,
+              max_det: int = 300) -> List[List[Tuple]]:
+    """Reference greedy NMS, per image and per class, box against box."""
+    results = []
+    for boxes in decoded:
+        candidates = sorted((box for box in boxes if box[4] > conf_threshold), key=lambda box: -box[4])
+        kept = []
+        for box in candidates:
+            if all(other[5] != box[5] or iou(box, other) <= iou_threshold for other in kept):
+                kept.append(box)
+        results.append(kept[:max_det])
+    return results
+
+
+def synthetic_predictions(batch: int, image_size: int, num_classes: int, seed: int = 0) -> torch.Tensor:
+    """Head output shaped like YOLOHead's, with a realistic few confident boxes.
+
+    Objectness logits sit around -5, so only a small fraction of the boxes
+    clear the confidence threshold and reach NMS.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    cells = image_size // 8
+    p = torch.randn(batch, cells, cells, len(DEFAULT_ANCHORS), 5 + num_classes, generator=generator)
+    p[..., 4] = p[..., 4] * 2 - 5
+    return p.view(batch, cells, cells, -1)
+
+
+def vectorized(predictions: torch.Tensor, image_size: int, conf: float, iou_threshold: float):
+    boxes, scores = decode_predictions(predictions, image_size)
+    return non_max_suppression(boxes, scores, conf, iou_threshold)
+
+
+def matches(reference: List[List[Tuple]], result: List[torch.Tensor], tolerance: float = 1e-3) -> bool:
+    for expected, actual in zip(reference, result):
+        if len(expected) != len(actual):
+            return False
+        if expected and not torch.allclose(torch.tensor(expected, dtype=actual.dtype), actual.cpu(),
+                                           rtol=tolerance, atol=tolerance):
+            return False
+    return True
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds per call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tensor decoding and NMS of YOLOv3_torch output "
+                                                 "against a naive Python reference")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--image-size", type=int, default=416)
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs of the tensor version")
+    parser.add_argument("--naive-repeat", type=int, default=3, help="timed runs of the reference")
+    parser.add_argument("--threads", type=int, help="torch CPU threads (default: torch's choice)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    for batch in args.batch_sizes:
+        predictions = synthetic_predictions(batch, args.image_size, args.classes)
+        reference = naive_nms(naive_decode(predictions, args.image_size), args.conf, args.iou)
+        result = vectorized(predictions, args.image_size, args.conf, args.iou)
+        # Warm up the tensor path before timing it
+        vectorized(predictions, args.image_size, args.conf, args.iou)
+
+        naive_seconds = timed(lambda: naive_nms(naive_decode(predictions, args.image_size), args.conf, args.iou),
+                              args.naive_repeat)
+        tensor_seconds = timed(lambda: vectorized(predictions, args.image_size, args.conf, args.iou), args.repeat)
+        results.append({
+            "batch_size": batch,
+            "boxes_per_image": predictions.shape[1] * predictions.shape[2] * len(DEFAULT_ANCHORS),
+            "detections": sum(len(r) for r in result),
+            "naive_ms": round(naive_seconds * 1000, 3),
+            "tensor_ms": round(tensor_seconds * 1000, 3),
+            "speedup": round(naive_seconds / tensor_seconds, 1),
+            "matches_reference": matches(reference, result),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'batch':>5} {'boxes/img':>9} {'dets':>6} {'naive ms':>10} {'tensor ms':>10} {'speedup':>8}  match")
+    for r in results:
+        print(f"{r['batch_size']:>5} {r['boxes_per_image']:>9} {r['detections']:>6} {r['naive_ms']:>10.1f} "
+              f"{r['tensor_ms']:>10.2f} {r['speedup']:>7.1f}x  {r['matches_reference']}")
+
+
+if __name__ == "__main__":
+    main()
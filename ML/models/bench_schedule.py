@@ -0,0 +1,123 @@
+import argparse
+import itertools
+import json
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from backend_report import drift
+from detectors import DETECTORS, Detection, Detector, load_detector
+from scheduler import DetectionScheduler
+from sources import open_source
+
+
+class ReplayedDetector(Detector):
+    """Replays the detections and latency the real detector had on each frame
+    of the reference pass, so every schedule sees the same model output
+    without running it again."""
+
+    def __init__(self, detections: List[List[Detection]], latencies: List[float]):
+        super().__init__("cpu")
+        self.detections = detections
+        self.latencies = latencies
+        self.position = 0
+
+    def predict(self, frames):
+        # Sleeping keeps the latency the adaptive schedule measures realistic
+        time.sleep(self.latencies[self.position])
+        return [self.detections[self.position]]
+
+
+def reference_pass(detector: Detector, frames: List[np.ndarray]):
+    detections, latencies = [], []
+    detector.predict(frames[:1])
+    for frame in frames:
+        start = time.perf_counter()
+        detections.extend(detector.predict([frame]))
+        latencies.append(time.perf_counter() - start)
+    return detections, latencies
+
+
+def run_schedule(frames: List[np.ndarray], detections: List[List[Detection]], latencies: List[float],
+                 every: int = 1, motion: Optional[float] = None, budget: Optional[float] = None) -> dict:
+    replayed = ReplayedDetector(detections, latencies)
+    scheduler = DetectionScheduler(replayed, every=every, motion_threshold=motion, latency_budget=budget)
+    outputs = []
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        replayed.position = index
+        outputs.append(scheduler.process(frame).detections)
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    return {
+        "every": every,
+        "motion_threshold": motion,
+        "latency_budget_ms": budget * 1000 if budget else None,
+        "final_every": stats["every"],
+        "detector_runs": stats["detector_runs"],
+        "motion_runs": stats["motion_runs"],
+        "compute_saved": stats["compute_saved"],
+        "mean_frame_ms": round(elapsed / len(frames) * 1000, 3),
+        "tracker_ms_per_frame": round(stats["tracker_seconds"] / len(frames) * 1000, 4),
+        **drift(detections, outputs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute saved and recall lost by running the detector on "
+                                                 "some frames only, with a tracker in between")
+    parser.add_argument("--model", choices=list(DETECTORS), default="yolov11")
+    parser.add_argument("--source", required=True, help="recorded video file or image directory")
+    parser.add_argument("--frames", type=int, default=300, help="at most this many frames of the source")
+    parser.add_argument("--every", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--motion", type=float, nargs="*", default=[0.02],
+                        help="motion thresholds to try, alone and with each --every")
+    parser.add_argument("--budget-ms", type=float, nargs="*", default=[33.3],
+                        help="per-frame latency budgets for the adaptive schedule")
+    parser.add_argument("--device", help="torch device (default: cuda, then mps, then cpu)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    source = open_source(args.source)
+    frames = [frame.image for frame in itertools.islice(source, args.frames)]
+    source.close()
+    if not frames:
+        parser.error(f"no frames in {args.source}")
+
+    detector = load_detector(args.model, device=args.device)
+    detections, latencies = reference_pass(detector, frames)
+
+    schedules = [{"every": every} for every in args.every]
+    schedules += [{"every": every, "motion": motion} for motion in args.motion for every in [args.frames] + args.every]
+    schedules += [{"budget": budget / 1000} for budget in args.budget_ms]
+    results = [run_schedule(frames, detections, latencies, **schedule) for schedule in schedules]
+    report = {
+        "model": args.model,
+        "source": args.source,
+        "frames": len(frames),
+        "detector_ms_per_frame": round(float(np.mean(latencies)) * 1000, 3),
+        "reference_detections": sum(len(frame_detections) for frame_detections in detections),
+        "schedules": results,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['frames']} frames, detector {report['detector_ms_per_frame']} ms/frame, "
+          f"{report['reference_detections']} reference detections")
+    print(f"{'schedule':>22} {'runs':>5} {'saved':>7} {'ms/frame':>9} {'recall':>7} {'extra':>6}")
+    for r in results:
+        if r["latency_budget_ms"]:
+            name = f"budget {r['latency_budget_ms']:.1f}ms (N={r['final_every']})"
+        elif r["motion_threshold"] is not None:
+            name = f"motion {r['motion_threshold']}" + (f" N={r['every']}" if r["every"] < len(frames) else "")
+        else:
+            name = f"every {r['every']}"
+        recall = f"{r['recall']:.3f}" if r["recall"] is not None else "-"
+        print(f"{name:>22} {r['detector_runs']:>5} {r['compute_saved']:>7.1%} {r['mean_frame_ms']:>9.2f} "
+              f"{recall:>7} {r['extra']:>6}")
+
+
+if __name__ == "__main__":
+    main()
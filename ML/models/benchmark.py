@@ -0,0 +1,186 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+from backends import BACKENDS, TEST_IMAGES
+from capture import percentiles
+from detectors import DETECTORS, load_detector
+from sources import open_source
+
+
+def replay(spec, count: int) -> Iterator[Tuple[np.ndarray, float]]:
+    """count frames of spec with the seconds each took to read and decode,
+    reopening the source whenever it runs out."""
+    produced = 0
+    while produced < count:
+        source = open_source(spec)
+        try:
+            read_any = False
+            while produced < count:
+                start = time.perf_counter()
+                image = source.read()
+                elapsed = time.perf_counter() - start
+                if image is None:
+                    break
+                read_any = True
+                produced += 1
+                yield image, elapsed
+        finally:
+            source.close()
+        if not read_any:
+            raise RuntimeError(f"Error: no frames in {spec}.")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(detector, spec, frames: int, batch_size: int, warmup: int) -> dict:
+    """Replay frames of spec through detector in batches of batch_size."""
+    warmup_batch = [image for image, _ in replay(spec, batch_size)]
+    for _ in range(warmup):
+        detector.predict(warmup_batch)
+
+    detector.timer.reset()
+    detector.timer.enabled = True
+    decode, latencies = [], []
+    batch = []
+    start = time.perf_counter()
+    try:
+        for image, decode_seconds in replay(spec, frames):
+            decode.append(decode_seconds)
+            batch.append(image)
+            if len(batch) == batch_size:
+                batch_start = time.perf_counter()
+                detector.predict(batch)
+                latencies.append(time.perf_counter() - batch_start)
+                batch = []
+        if batch:
+            batch_start = time.perf_counter()
+            detector.predict(batch)
+            latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+    finally:
+        detector.timer.enabled = False
+
+    stages = {"decode": {**percentiles(decode), "count": len(decode), "total_seconds": round(sum(decode), 4)}}
+    stages.update(detector.timer.summary())
+    return {
+        "frames": frames,
+        "batch_size": batch_size,
+        "stages": stages,
+        "batch_latency_ms": percentiles(latencies),
+        "frames_per_second": round(frames / elapsed, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def benchmark_model(model: str, options: dict, spec, frames: int, batch_sizes: List[int], threads: List[int],
+                    warmup: int) -> dict:
+    """Every batch size and thread count for one model. Meant to run in a
+    process of its own so peak_rss_mb belongs to this model alone."""
+    result = {"model": model, "backend": options.get("backend", "eager"), "cases": []}
+    try:
+        start = time.perf_counter()
+        detector = load_detector(model, **options)
+        result["load_seconds"] = round(time.perf_counter() - start, 3)
+        result["device"] = str(detector.device)
+        for thread_count in threads:
+            torch.set_num_threads(thread_count)
+            cv2.setNumThreads(thread_count)
+            for batch_size in batch_sizes:
+                case = run_case(detector, spec, frames, batch_size, warmup)
+                case["threads"] = thread_count
+                result["cases"].append(case)
+                print(f"{model} threads={thread_count} batch={batch_size}: {case['frames_per_second']} frames/s",
+                      file=sys.stderr, flush=True)
+    except Exception as e:
+        # A model that can't load here (missing package, no network for weights) shouldn't sink the others
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "cuda": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video or image set through each model and report "
+                                                 "per-stage latency, throughput and peak memory as JSON")
+    parser.add_argument("--models", nargs="+", choices=list(DETECTORS), default=list(DETECTORS))
+    parser.add_argument("--source", default=TEST_IMAGES, help="video file, image directory or image")
+    parser.add_argument("--frames", type=int, default=64, help="frames per case; short sources are replayed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="torch and OpenCV thread counts to try")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed batches before each case")
+    parser.add_argument("--backend", choices=BACKENDS, default="eager",
+                        help="backend for the models that support it (see backends.py)")
+    parser.add_argument("--device", help="torch device (default: cuda, then mps, then cpu)")
+    parser.add_argument("--yolov3-weights", help="state_dict for yolov3 (default: random weights)")
+    parser.add_argument("--vit-random-weights", action="store_true",
+                        help="don't download the ImageNet weights for vit, for timing only")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    threads = sorted(set(args.threads))
+    options = {model: {"device": args.device} for model in args.models}
+    for model in args.models:
+        if args.backend in DETECTORS[model].backends:
+            options[model]["backend"] = args.backend
+    if "yolov3" in options:
+        options["yolov3"]["weights"] = args.yolov3_weights
+    if "vit" in options:
+        options["vit"]["pretrained"] = not args.vit_random_weights
+
+    # One fresh process per model keeps peak RSS and thread pools separate
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for model in args.models:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(benchmark_model, (model, options[model], args.source, args.frames,
+                                                        args.batch_sizes, threads, args.warmup)))
+
+    report = {
+        "environment": environment(),
+        "source": args.source,
+        "frames": args.frames,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
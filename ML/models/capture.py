@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Sequence
+
+from sources import Frame, open_source
+
+
+def percentiles(values: Sequence[float], qs=(50, 95, 99)) -> dict:
+    """{"p50": ..., ...} of values in milliseconds (values are seconds), or {} if there are none."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{q}": round(ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)] * 1000, 3) for q in qs}
+    result["max"] = round(ordered[-1] * 1000, 3)
+    return result
+
+
+class FrameRing:
+    """The few most recent frames of a stream.
+
+    The writer never blocks: a new frame overwrites the oldest one once the
+    ring is full. Readers take the newest frames and everything older that
+    was never read is discarded, so a slow reader always works on fresh
+    frames instead of a growing backlog.
+    """
+
+    def __init__(self, capacity: int = 2):
+        self.frames = deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.written = 0
+        self.delivered = 0
+        # Frames that were never read: pushed out of a full ring, or skipped
+        # over because a newer frame was read first
+        self.overwritten = 0
+        self.skipped = 0
+
+    def put(self, frame: Frame):
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.overwritten += 1
+            self.frames.append(frame)
+            self.written += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """No more frames will be written; readers get what is left, then nothing."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def recent(self, count: int = 1, timeout: Optional[float] = None) -> List[Frame]:
+        """Up to count of the newest unread frames, oldest first, dropping the rest.
+
+        Waits up to timeout seconds (forever if None) for a frame. Returns an
+        empty list on timeout or once the ring is closed and empty.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frames or self.closed, timeout)
+            frames = list(self.frames)[-count:]
+            self.skipped += len(self.frames) - len(frames)
+            self.delivered += len(frames)
+            self.frames.clear()
+            return frames
+
+    @property
+    def dropped(self) -> int:
+        return self.overwritten + self.skipped
+
+
+class ThreadedCapture:
+    """Reads a frame source on its own thread into a FrameRing.
+
+    Camera reads never wait for inference and inference never waits for a
+    queue of stale frames: latest() hands out the newest frame and counts the
+    ones it skipped. pace replays a video file or image directory at that many
+    frames per second, as a camera would deliver it; frame timestamps are
+    then the time each frame was released.
+    """
+
+    def __init__(self, source, capacity: int = 2, pace: Optional[float] = None, age_window: int = 1000,
+                 **camera_options):
+        self.source = open_source(source, **camera_options)
+        self.ring = FrameRing(capacity)
+        self.pace = pace
+        self.stopping = threading.Event()
+        self.thread = None
+        # Seconds between a frame being read and handed to the consumer
+        self.pickup_ages = deque(maxlen=age_window)
+
+    def start(self) -> "ThreadedCapture":
+        self.thread = threading.Thread(target=self.run, name="capture", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        interval = 1 / self.pace if self.pace else 0
+        release_at = time.monotonic()
+        try:
+            for frame in self.source:
+                if self.stopping.is_set():
+                    break
+                if interval:
+                    delay = release_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    release_at += interval
+                    frame = frame._replace(timestamp=time.monotonic())
+                self.ring.put(frame)
+        finally:
+            self.source.close()
+            self.ring.close()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """The newest frame not handed out yet; None on timeout or at the end of the source."""
+        frames = self.recent(1, timeout)
+        return frames[0] if frames else None
+
+    def recent(self, count: int, timeout: Optional[float] = None) -> List[Frame]:
+        frames = self.ring.recent(count, timeout)
+        now = time.monotonic()
+        self.pickup_ages.extend(now - frame.timestamp for frame in frames)
+        return frames
+
+    @property
+    def finished(self) -> bool:
+        return self.ring.closed and not self.ring.frames
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        return {
+            "captured": self.ring.written,
+            "delivered": self.ring.delivered,
+            "dropped": self.ring.dropped,
+            "overwritten": self.ring.overwritten,
+            "skipped": self.ring.skipped,
+            "pickup_age_ms": percentiles(self.pickup_ages),
+        }
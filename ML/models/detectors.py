@@ -0,0 +1,257 @@
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+from backends import CPU_BACKENDS
+from registry import default_registry
+from timing import StageTimer
+
+
+class Detection(NamedTuple):
+    label: str
+    class_id: int
+    confidence: float
+    # x1, y1, x2, y2 in pixels of the input frame; None for whole-frame classifications
+    bbox: Optional[Tuple[float, float, float, float]]
+
+    def to_dict(self) -> dict:
+        """The dict shape YOLOv11.handle_detections() expects."""
+        return {
+            "class": self.label,
+            "class_id": self.class_id,
+            "confidence": self.confidence,
+            "bbox": list(self.bbox) if self.bbox is not None else None,
+        }
+
+
+def default_device() -> torch.device:
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def boxes_to_detections(boxes: torch.Tensor, names: Dict[int, str]) -> List[Detection]:
+    """Detections from an (N, 6) x1, y1, x2, y2, confidence, class tensor."""
+    # One device-to-host copy per frame instead of one per box and field
+    return [
+        Detection(names[int(cls)], int(cls), conf, (x1, y1, x2, y2))
+        for x1, y1, x2, y2, conf, cls in boxes[:, :6].float().cpu().tolist()
+    ]
+
+
+class Detector:
+    """Common interface of the models in this directory.
+
+    predict() takes a batch of HxWx3 BGR uint8 frames, as OpenCV reads them,
+    and returns one list of Detections per frame. Frames in a batch may differ
+    in size. names maps class ids to labels.
+
+    backend selects how the model runs (see backends.py); the quantized and
+    ONNX backends always run on the CPU. predict() charges its work to the
+    stages of timer (preprocess, forward, postprocess, and color where
+    colour conversion is a step of its own) once timer.enabled is set.
+
+    Weights given by name ("yolo11n", "vit_b_16") come from the local
+    registry (see registry.py), pinned by checksum; call warm_up() before
+    the first real frame.
+    """
+
+    name = "detector"
+    backends: Tuple[str, ...] = ("eager",)
+
+    def __init__(self, device=None, backend: str = "eager"):
+        if backend not in self.backends:
+            raise ValueError(f"{self.name} does not support the {backend!r} backend, "
+                             f"expected one of {', '.join(self.backends)}")
+        self.backend = backend
+        if backend in CPU_BACKENDS:
+            device = "cpu"
+        self.device = torch.device(device) if device else default_device()
+        self.names: Dict[int, str] = {}
+        self.timer = StageTimer(self.device)
+
+    def predict(self, frames: Sequence[np.ndarray]) -> List[List[Detection]]:
+        raise NotImplementedError
+
+    def warm_up(self, batch_size: int = 1, shape: Tuple[int, int, int] = (480, 640, 3), runs: int = 3) -> List[float]:
+        """Run predict() on noise so the first real frame runs at steady-state
+        latency; the first runs pay for lazy initialisation, torch.compile,
+        kernel autotuning and allocator growth. Seconds each run took."""
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(batch_size)]
+        seconds = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            self.predict(frames)
+            seconds.append(time.perf_counter() - start)
+        return seconds
+
+
+class YOLOv11Detector(Detector):
+    """Ultralytics YOLO11 (see YOLOv11.py)."""
+
+    name = "yolov11"
+    backends = ("eager", "onnx")
+
+    def __init__(self, weights: str = "yolo11n.pt", conf: float = 0.25, image_size: int = 640,
+                 backend: str = "eager", onnx_path: Optional[str] = None, device=None):
+        super().__init__(device, backend)
+        from ultralytics import YOLO
+        weights = default_registry().resolve(weights)
+        self.model = YOLO(weights)
+        self.names = self.model.names
+        if backend == "onnx":
+            # ultralytics exports next to the weights and runs the file with onnxruntime itself;
+            # an export newer than the weights is reused
+            if onnx_path is None:
+                onnx_path = os.path.splitext(weights)[0] + ".onnx"
+                if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(weights):
+                    onnx_path = self.model.export(format="onnx", imgsz=image_size, dynamic=True)
+            self.model = YOLO(onnx_path, task="detect")
+        self.conf = conf
+        self.image_size = image_size
+
+    def predict(self, frames):
+        # ultralytics letterboxes and batches a list of BGR arrays itself
+        results = self.model.predict(list(frames), conf=self.conf, imgsz=self.image_size,
+                                     device=self.device, verbose=False)
+        # ultralytics times its own stages, in ms per image
+        if results:
+            for stage, key in (("preprocess", "preprocess"), ("forward", "inference"), ("postprocess", "postprocess")):
+                self.timer.record(stage, results[0].speed[key] * len(frames) / 1000)
+        return [
+            boxes_to_detections(torch.cat([r.boxes.xyxy, r.boxes.conf[:, None], r.boxes.cls[:, None]], 1), self.names)
+            for r in results
+        ]
+
+
+class YOLOv5Detector(Detector):
+    """YOLOv5 from torch.hub (see YOLOv5.py)."""
+
+    name = "yolov5"
+
+    def __init__(self, variant: str = "yolov5s", conf: float = 0.25, image_size: int = 640,
+                 backend: str = "eager", device=None):
+        super().__init__(device, backend)
+        from YOLOv5 import load_model
+        self.model = load_model(variant, self.device)
+        self.model.conf = conf
+        self.names = self.model.names
+        self.image_size = image_size
+
+    def predict(self, frames):
+        # The hub model's AutoShape wrapper batches a list of RGB arrays
+        with self.timer("color"):
+            rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+        results = self.model(rgb, size=self.image_size)
+        # AutoShape times its own stages, in ms per image
+        for stage, milliseconds in zip(("preprocess", "forward", "postprocess"), results.t):
+            self.timer.record(stage, milliseconds * len(frames) / 1000)
+        return [boxes_to_detections(boxes, self.names) for boxes in results.xyxy]
+
+
+class YOLOv3Detector(Detector):
+    """The YOLO model in YOLOv3_torch.py, decoded and NMS'd on its device.
+
+    weights is a state_dict saved with torch.save(), as a path or the name
+    it was added to the registry under; without one the model has random
+    weights, which is only good for timing. Registry weights keep what the
+    quantized and ONNX backends build between runs.
+    """
+
+    name = "yolov3"
+    backends = ("eager", "dynamic", "static", "onnx")
+
+    def __init__(self, weights: Optional[str] = None, conf: float = 0.25, iou: float = 0.45,
+                 image_size: int = 416, num_classes: int = 20, backend: str = "eager",
+                 calibration: Optional[Sequence[np.ndarray]] = None, onnx_path: Optional[str] = None, device=None):
+        super().__init__(device, backend)
+        from backends import prepare_for_frames
+        from YOLOv3_torch import YOLO, class_labels, preprocess
+        self.model = YOLO(num_classes=num_classes).to(self.device).eval()
+        registry = default_registry()
+        cache_path = None
+        if weights:
+            if backend != "eager" and calibration is None and weights in registry.manifest:
+                cache_path = registry.artifact(weights, f"{backend}-{image_size}",
+                                               "onnx" if backend == "onnx" else "pt")
+            self.model.load_state_dict(torch.load(registry.resolve(weights), map_location=self.device))
+        self.forward = prepare_for_frames(self.model, backend, lambda frames: preprocess(frames, image_size, self.device),
+                                          calibration, onnx_path, cache_path=cache_path)
+        self.names = dict(enumerate(class_labels if num_classes == len(class_labels) else map(str, range(num_classes))))
+        self.conf = conf
+        self.iou = iou
+        self.image_size = image_size
+
+    def predict(self, frames):
+        from YOLOv3_torch import decode_predictions, non_max_suppression, preprocess, scale_boxes
+        with torch.inference_mode():
+            # preprocess() swaps BGR to RGB as part of the batch conversion
+            with self.timer("preprocess"):
+                batch = preprocess(frames, self.image_size, self.device)
+            with self.timer("forward"):
+                predictions = self.forward(batch)
+            with self.timer("postprocess"):
+                boxes, scores = decode_predictions(predictions, self.image_size, self.model.anchors)
+                detections = non_max_suppression(boxes, scores, self.conf, self.iou)
+                return [
+                    boxes_to_detections(scale_boxes(frame_detections, self.image_size, frame.shape), self.names)
+                    for frame, frame_detections in zip(frames, detections)
+                ]
+
+
+class ViTDetector(Detector):
+    """vit_b_16 ImageNet classifier (see vit.py): top_k whole-frame labels per frame.
+
+    With target_classes, only those class ids are considered.
+    """
+
+    name = "vit"
+    backends = ("eager", "dynamic", "static", "onnx")
+
+    def __init__(self, target_classes: Optional[Set[int]] = None, top_k: int = 1,
+                 target_size: Tuple[int, int] = (224, 224), pretrained: bool = True, backend: str = "eager",
+                 calibration: Optional[Sequence[np.ndarray]] = None, onnx_path: Optional[str] = None,
+                 compile: bool = False, device=None):
+        super().__init__(device, backend)
+        from vit import ViTClassifier
+        self.classifier = ViTClassifier(target_classes, target_size, pretrained, self.device, compile,
+                                        backend=backend, calibration=calibration, onnx_path=onnx_path)
+        self.model = self.classifier.model
+        self.names = dict(enumerate(self.classifier.categories))
+        self.top_k = top_k
+
+    def predict(self, frames):
+        # vit.preprocess() swaps BGR to RGB as part of the batch conversion
+        with self.timer("preprocess"):
+            batch = self.classifier.preprocess(frames)
+        with self.timer("forward"):
+            logits = self.classifier.logits(batch)
+        with self.timer("postprocess"):
+            confidences, indexes = self.classifier.top_k_logits(logits, self.top_k)
+            return [
+                [Detection(self.names[cls], cls, conf, None) for conf, cls in zip(frame_confidences, frame_indexes)]
+                for frame_confidences, frame_indexes in zip(confidences.cpu().tolist(), indexes.cpu().tolist())
+            ]
+
+
+DETECTORS = {
+    YOLOv11Detector.name: YOLOv11Detector,
+    YOLOv5Detector.name: YOLOv5Detector,
+    YOLOv3Detector.name: YOLOv3Detector,
+    ViTDetector.name: ViTDetector,
+}
+
+
+def load_detector(name: str, **options) -> Detector:
+    try:
+        detector_class = DETECTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model {name!r}, expected one of {', '.join(DETECTORS)}")
+    return detector_class(**options)
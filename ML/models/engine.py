@@ -0,0 +1,222 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from capture import ThreadedCapture, percentiles
+from detectors import DETECTORS, Detection, Detector, load_detector
+from sources import Frame, open_source
+
+
+class FrameResult(NamedTuple):
+    frame: Frame
+    detections: List[Detection]
+    # Seconds from reading the frame to having its detections
+    latency: float
+    batch_size: int
+
+    def to_dict(self) -> dict:
+        return {
+            "frame": self.frame.index,
+            "source": self.frame.source,
+            "latency_ms": round(self.latency * 1000, 3),
+            "batch_size": self.batch_size,
+            "detections": [detection.to_dict() for detection in self.detections],
+        }
+
+
+class InferenceEngine:
+    """Runs a Detector over frames from any source in batches.
+
+    A batch is sent to the model once it holds batch_size frames or its
+    oldest frame has waited max_latency seconds, whichever comes first. An
+    image directory or in-memory array therefore runs in full batches, while a
+    30 fps camera with the default 50 ms deadline gets batches of one or two
+    frames and no frame waits long for company.
+
+    run_live() instead always works on the newest frame of a live source and
+    drops the frames that arrive while the model is busy.
+    """
+
+    def __init__(self, detector: Detector, batch_size: int = 8, max_latency: float = 0.05,
+                 queue_size: int = 0):
+        self.detector = detector
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue_size = queue_size or batch_size * 4
+        self.frames = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.inference_time = 0.0
+        # End-to-end frame age (read to detections) of the most recent frames
+        self.frame_ages = deque(maxlen=1000)
+        self.capture: Optional[ThreadedCapture] = None
+
+    def infer(self, images: Sequence[np.ndarray]) -> List[List[Detection]]:
+        """Detections for in-memory BGR images, batch_size at a time."""
+        results = []
+        for start in range(0, len(images), self.batch_size):
+            results.extend(self.predict(images[start:start + self.batch_size]))
+        return results
+
+    def predict(self, images: Sequence[np.ndarray]) -> List[List[Detection]]:
+        start = time.perf_counter()
+        detections = self.detector.predict(images)
+        self.inference_time += time.perf_counter() - start
+        self.frames += len(images)
+        self.batches += 1
+        self.batch_sizes[len(images)] += 1
+        return detections
+
+    def run(self, source, **camera_options) -> Iterator[FrameResult]:
+        """Yield a FrameResult per frame of source, in order.
+
+        source is anything sources.open_source() accepts. Frames are read on
+        a separate thread so reading the next frames overlaps inference.
+        """
+        source = open_source(source, **camera_options)
+        pending = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        reader = threading.Thread(target=self.read_frames, args=(source, pending, stop),
+                                  name="frame-reader", daemon=True)
+        reader.start()
+        try:
+            finished = False
+            while not finished:
+                frame = pending.get()
+                if frame is None:
+                    break
+                batch = [frame]
+                deadline = frame.timestamp + self.max_latency
+                while len(batch) < self.batch_size:
+                    try:
+                        frame = pending.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if frame is None:
+                        finished = True
+                        break
+                    batch.append(frame)
+
+                yield from self.results(batch)
+        finally:
+            stop.set()
+            reader.join()
+
+    def run_live(self, source, capacity: int = 2, pace: Optional[float] = None,
+                 **camera_options) -> Iterator[FrameResult]:
+        """Yield a FrameResult for the newest frame of source each time the model is free.
+
+        Frames are captured into a ring of capacity frames on a separate
+        thread (see capture.ThreadedCapture); the ones that arrive while a
+        frame is being processed are dropped, so results never lag behind the
+        camera. pace replays a file at that many frames per second. The
+        capture counters are in stats() under "capture".
+        """
+        with ThreadedCapture(source, capacity, pace, **camera_options) as capture:
+            self.capture = capture.start()
+            while True:
+                frame = capture.latest()
+                if frame is None:
+                    break
+                yield from self.results([frame])
+
+    def results(self, batch: List[Frame]) -> Iterator[FrameResult]:
+        detections = self.predict([frame.image for frame in batch])
+        done = time.monotonic()
+        for frame, frame_detections in zip(batch, detections):
+            self.frame_ages.append(done - frame.timestamp)
+            yield FrameResult(frame, frame_detections, done - frame.timestamp, len(batch))
+
+    def read_frames(self, source, pending, stop):
+        try:
+            for frame in source:
+                while not stop.is_set():
+                    try:
+                        pending.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        finally:
+            source.close()
+            # The end marker must get through even if the consumer is slow
+            while not stop.is_set():
+                try:
+                    pending.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def stats(self) -> dict:
+        stats = {
+            "frames": self.frames,
+            "batches": self.batches,
+            "mean_batch_size": self.frames / self.batches if self.batches else None,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "inference_seconds": round(self.inference_time, 3),
+            "frames_per_second": self.frames / self.inference_time if self.inference_time else None,
+            "frame_age_ms": percentiles(self.frame_ages),
+        }
+        if self.capture:
+            stats["capture"] = self.capture.stats()
+        return stats
+
+
+def draw_detections(image: np.ndarray, detections: List[Detection]) -> np.ndarray:
+    y = 20
+    for detection in detections:
+        caption = f"{detection.label} {detection.confidence:.2f}"
+        if detection.bbox is None:
+            cv2.putText(image, caption, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            y += 22
+            continue
+        x1, y1, x2, y2 = (int(v) for v in detection.bbox)
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(image, caption, (x1, max(y1 - 5, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a detector over a camera, video, image directory or image")
+    parser.add_argument("--model", choices=list(DETECTORS), default="yolov11")
+    parser.add_argument("--source", default="0", help="camera index, video file, image directory or image file")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-latency", type=float, default=50, help="longest a frame waits for its batch, in ms")
+    parser.add_argument("--live", action="store_true",
+                        help="always process the newest frame, dropping the ones that arrive meanwhile")
+    parser.add_argument("--pace", type=float, help="with --live, replay a file at this many frames per second")
+    parser.add_argument("--device", help="torch device (default: cuda, then mps, then cpu)")
+    parser.add_argument("--show", action="store_true", help="display frames with their detections")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per frame")
+    args = parser.parse_args()
+
+    engine = InferenceEngine(load_detector(args.model, device=args.device), args.batch_size, args.max_latency / 1000)
+    try:
+        results = engine.run_live(args.source, pace=args.pace) if args.live else engine.run(args.source)
+        for result in results:
+            if args.json:
+                print(json.dumps(result.to_dict()))
+            elif result.detections:
+                labels = ", ".join(f"{d.label} {d.confidence:.2f}" for d in result.detections)
+                print(f"frame {result.frame.index}: {labels} ({result.latency * 1000:.1f} ms)")
+            if args.show:
+                cv2.imshow(f"{args.model} detections", draw_detections(result.frame.image, result.detections))
+                # break loop with q key
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+    finally:
+        if args.show:
+            cv2.destroyAllWindows()
+    print(json.dumps(engine.stats()))
+
+
+if __name__ == "__main__":
+    main()
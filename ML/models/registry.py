@@ -0,0 +1,282 @@
+import argparse
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+import zipfile
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+import torch
+
+# Weights, their manifest and built artifacts live here; MODEL_REGISTRY overrides it
+DEFAULT_ROOT = os.environ.get("MODEL_REGISTRY",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights"))
+
+
+class ModelSpec(NamedTuple):
+    filename: str
+    url: str
+    # Expected sha256, or a prefix of it (torchvision names its files after
+    # the first 8 hex digits); None trusts the first download and pins that
+    sha256: Optional[str] = None
+
+
+MODELS: Dict[str, ModelSpec] = {
+    "vit_b_16": ModelSpec("vit_b_16-c867db91.pth", "https://download.pytorch.org/models/vit_b_16-c867db91.pth",
+                          "c867db91"),
+    **{f"yolov5{size}": ModelSpec(f"yolov5{size}.pt",
+                                  f"https://github.com/ultralytics/yolov5/releases/download/v7.0/yolov5{size}.pt")
+       for size in "nsmlx"},
+    # The YOLOv5 code torch.hub would otherwise fetch from GitHub on every start
+    "yolov5-repo": ModelSpec("yolov5-7.0.zip", "https://github.com/ultralytics/yolov5/archive/refs/tags/v7.0.zip"),
+    "yolo11n": ModelSpec("yolo11n.pt", "https://github.com/ultralytics/assets/releases/download/v8.3.0/yolo11n.pt"),
+}
+
+
+class RegistryError(RuntimeError):
+    pass
+
+
+def sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Registry:
+    """Model files pinned by checksum in a local directory.
+
+    manifest.json records the sha256 of every file added, so a file that
+    changes on disk is refused instead of loaded. A file is only hashed again
+    when its size or mtime changes. path() downloads a missing file from its
+    ModelSpec url once, unless offline (or MODEL_REGISTRY_OFFLINE is set);
+    nothing else here touches the network.
+
+    Artifacts built from a model (ONNX exports, quantized TorchScript, the
+    torch.compile cache) go under cache/, keyed by the weights' checksum and
+    the torch version, so they are rebuilt when either changes.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, offline: Optional[bool] = None):
+        self.root = root
+        self.offline = bool(os.environ.get("MODEL_REGISTRY_OFFLINE")) if offline is None else offline
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.manifest: Dict[str, dict] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+
+    def add(self, name: str, source: str) -> str:
+        """Copy source into the registry as name and pin its checksum."""
+        spec = MODELS.get(name)
+        digest = sha256(source)
+        if spec and spec.sha256 and not digest.startswith(spec.sha256):
+            raise RegistryError(f"{source} has sha256 {digest}, expected {spec.sha256} for {name}")
+        filename = spec.filename if spec else os.path.basename(source)
+        path = os.path.join(self.root, filename)
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.abspath(source) != os.path.abspath(path):
+            shutil.copyfile(source, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self.manifest[name] = {"file": filename, "sha256": digest, **self.stamp(path)}
+        self.save()
+        return path
+
+    def fetch(self, name: str) -> str:
+        spec = MODELS.get(name)
+        if spec is None:
+            raise RegistryError(f"Unknown model {name!r}, add it with: python registry.py add {name} PATH")
+        if self.offline:
+            raise RegistryError(f"{name} is not in {self.root} and the registry is offline, "
+                                f"run: python registry.py fetch {name}")
+        os.makedirs(self.root, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.root, suffix=".part", delete=False) as f:
+            temporary = f.name
+        try:
+            urllib.request.urlretrieve(spec.url, temporary)
+            return self.add(name, temporary)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @staticmethod
+    def stamp(path: str) -> dict:
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def path(self, name: str) -> str:
+        """Local path of name, checked against its pinned checksum."""
+        entry = self.manifest.get(name)
+        if entry is None:
+            return self.fetch(name)
+        path = os.path.join(self.root, entry["file"])
+        if not os.path.exists(path):
+            return self.fetch(name)
+        stamp = self.stamp(path)
+        if stamp != {key: entry.get(key) for key in stamp}:
+            digest = sha256(path)
+            if digest != entry["sha256"]:
+                raise RegistryError(f"{path} has sha256 {digest}, but {name} is pinned to {entry['sha256']}")
+            entry.update(stamp)
+            self.save()
+        return path
+
+    def digest(self, name: str) -> str:
+        self.path(name)
+        return self.manifest[name]["sha256"]
+
+    def resolve(self, weights: str) -> str:
+        """weights as given if it is an existing file, else the registry's
+        copy of the model it names ("yolo11n" or "yolo11n.pt")."""
+        if os.path.exists(weights):
+            return weights
+        if weights in self.manifest or weights in MODELS:
+            return self.path(weights)
+        for name, spec in MODELS.items():
+            if weights == spec.filename:
+                return self.path(name)
+        return weights
+
+    def extract(self, name: str) -> str:
+        """Directory name's zip archive unpacks to, unpacking it on first use."""
+        directory = os.path.join(self.root, "cache", name, self.digest(name)[:12])
+        if not os.path.isdir(directory):
+            with zipfile.ZipFile(self.path(name)) as archive:
+                archive.extractall(directory + ".tmp")
+            os.replace(directory + ".tmp", directory)
+        entries = os.listdir(directory)
+        # GitHub archives hold a single top-level directory
+        return os.path.join(directory, entries[0]) if len(entries) == 1 else directory
+
+    def artifact(self, name: str, kind: str, extension: str) -> str:
+        """Where to keep a kind of artifact built from name's weights."""
+        version = torch.__version__.split("+")[0]
+        directory = os.path.join(self.root, "cache", name)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{self.digest(name)[:12]}-{kind}-torch{version}.{extension}")
+
+    def use_compile_cache(self):
+        """Keep torch.compile's on-disk cache in the registry rather than /tmp,
+        so a restart reuses the kernels compiled last time."""
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(self.root, "cache", "inductor"))
+
+    def clear_cache(self, name: Optional[str] = None):
+        shutil.rmtree(os.path.join(self.root, "cache", *([name] if name else [])), ignore_errors=True)
+
+
+@functools.lru_cache(maxsize=None)
+def default_registry() -> Registry:
+    return Registry()
+
+
+@functools.lru_cache(maxsize=None)
+def load_state_dict(path: str) -> dict:
+    """A state_dict, memory-mapped so tensors are only read as they are used,
+    and shared by every model built from it in this process (with
+    load_state_dict(assign=True)), so those models must not train."""
+    return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+
+
+def startup(name: str, options: dict, frames: int) -> dict:
+    """Seconds to build the detector, each warm-up run, and the latency of
+    the first real frame after warm-up and of the ones after it."""
+    from backends import load_images
+    from detectors import load_detector
+
+    start = time.perf_counter()
+    detector = load_detector(name, **options)
+    load = time.perf_counter() - start
+    start = time.perf_counter()
+    warm_up = detector.warm_up()
+    warm_up_total = time.perf_counter() - start
+    images = load_images()
+    latencies = []
+    for index in range(frames):
+        start = time.perf_counter()
+        detector.predict([images[index % len(images)]])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "load_seconds": round(load, 3),
+        "warm_up_seconds": round(warm_up_total, 3),
+        # What the first frame would have cost without warming up
+        "unwarmed_first_frame_ms": round(warm_up[0] * 1000, 1),
+        "first_frame_ms": round(latencies[0] * 1000, 1),
+        "steady_frame_ms": round(float(np.median(latencies[1:] or latencies)) * 1000, 1),
+    }
+
+
+def report_startup(registry: Registry, name: str, options: dict, frames: int = 10) -> dict:
+    """Startup of name in a fresh process with no built artifacts (cold), then
+    in another that reuses what the first one built (warm)."""
+    registry.clear_cache()
+    # The startup processes find the registry through the environment
+    os.environ["MODEL_REGISTRY"] = registry.root
+    # spawn, so each run pays for imports and sees nothing the other loaded
+    context = multiprocessing.get_context("spawn")
+    report = {"model": name, "options": options}
+    for run in ("cold", "warm"):
+        with context.Pool(1) as pool:
+            report[run] = pool.apply(startup, (name, options, frames))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pin model weights locally and report cold vs warm startup")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="registry directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="download models once and pin their checksums")
+    fetch.add_argument("names", nargs="*", help=f"default: all of {', '.join(MODELS)}")
+    add = commands.add_parser("add", help="pin a local file as a model")
+    add.add_argument("name")
+    add.add_argument("path")
+    commands.add_parser("list", help="show pinned models and check their checksums")
+    commands.add_parser("clear-cache", help="delete built artifacts, keeping the weights")
+    measure = commands.add_parser("startup", help="cold vs warm startup time of a detector")
+    measure.add_argument("--model", default="vit", help="detector name, see detectors.DETECTORS")
+    measure.add_argument("--backend", default="eager")
+    measure.add_argument("--device", help="torch device (default: cuda, then mps, then cpu)")
+    measure.add_argument("--compile", action="store_true", help="vit only: torch.compile the eager model")
+    measure.add_argument("--frames", type=int, default=10, help="timed frames after warm-up")
+    args = parser.parse_args()
+
+    registry = Registry(args.root)
+    if args.command == "fetch":
+        for name in args.names or MODELS:
+            print(f"{name}: {registry.path(name)}")
+    elif args.command == "add":
+        print(registry.add(args.name, args.path))
+    elif args.command == "list":
+        for name, entry in sorted(registry.manifest.items()):
+            try:
+                registry.path(name)
+                state = "ok"
+            except RegistryError as e:
+                state = str(e)
+            print(f"{name:>12} {entry['sha256'][:12]} {entry['file']} {state}")
+    elif args.command == "clear-cache":
+        registry.clear_cache()
+    else:
+        options = {"backend": args.backend, "device": args.device}
+        if args.compile:
+            options["compile"] = True
+        report = report_startup(registry, args.model, options, args.frames)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
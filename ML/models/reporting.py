@@ -0,0 +1,443 @@
+import argparse
+import http.client
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from detectors import Detection
+
+# Detector labels that mean a disaster, and the SimulationEvent.disaster_type
+# each is recorded as (see handle_detections() in YOLOv11.py)
+DISASTER_CLASSES = {"fire": "Fire", "water": "Flood"}
+
+
+class Transition(NamedTuple):
+    label: str
+    # "start" once the class has been seen long enough, "end" once it has been gone long enough
+    state: str
+    confidence: float
+    # Seconds the class has been active; 0 at its start
+    duration: float
+
+
+class LabelState:
+    def __init__(self):
+        self.active = False
+        # When the current on (or off) condition first held, None if it doesn't
+        self.since: Optional[float] = None
+        self.last_seen = 0.0
+        self.started = 0.0
+        self.peak = 0.0
+
+
+class Debouncer:
+    """Per-class on/off state from noisy per-frame detections.
+
+    A class turns on once it has been detected at or above on_threshold for
+    min_on seconds, with no gap longer than max_gap, and back off once it
+    has stayed below off_threshold (or gone undetected) for min_off seconds.
+    The gap between the thresholds keeps a confidence hovering around one
+    of them from flapping; the durations ignore one-frame blips and dropouts.
+    """
+
+    def __init__(self, labels: Iterable[str] = DISASTER_CLASSES, on_threshold: float = 0.7,
+                 off_threshold: float = 0.5, min_on: float = 1.0, min_off: float = 2.0, max_gap: float = 0.5):
+        if off_threshold > on_threshold:
+            raise ValueError("off_threshold must not be above on_threshold")
+        self.labels = set(labels)
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_on = min_on
+        self.min_off = min_off
+        self.max_gap = max_gap
+        self.states: Dict[str, LabelState] = {label: LabelState() for label in self.labels}
+
+    def update(self, detections: Iterable[Union[Detection, dict]], now: Optional[float] = None) -> List[Transition]:
+        """Transitions caused by one frame's detections, as Detections or
+        their to_dict() form. now is a time.monotonic() timestamp."""
+        now = time.monotonic() if now is None else now
+        confidences = dict.fromkeys(self.labels, 0.0)
+        for detection in detections:
+            label, confidence = ((detection["class"], detection["confidence"]) if isinstance(detection, dict)
+                                 else (detection.label, detection.confidence))
+            if label in confidences:
+                confidences[label] = max(confidences[label], confidence)
+
+        transitions = []
+        for label, confidence in confidences.items():
+            state = self.states[label]
+            if not state.active:
+                if confidence < self.on_threshold:
+                    if state.since is not None and now - state.last_seen > self.max_gap:
+                        state.since = None
+                    continue
+                if state.since is None or now - state.last_seen > self.max_gap:
+                    state.since = now
+                    state.peak = 0.0
+                state.last_seen = now
+                state.peak = max(state.peak, confidence)
+                if now - state.since >= self.min_on:
+                    state.active = True
+                    state.started = state.since
+                    state.since = None
+                    transitions.append(Transition(label, "start", state.peak, 0.0))
+            else:
+                state.peak = max(state.peak, confidence)
+                if confidence >= self.off_threshold:
+                    state.since = None
+                    continue
+                if state.since is None:
+                    state.since = now
+                if now - state.since >= self.min_off:
+                    state.active = False
+                    # The class was last seen when the off condition began
+                    transitions.append(Transition(label, "end", state.peak, state.since - state.started))
+                    state.since = None
+        return transitions
+
+
+class HTTPPool:
+    """Keep-alive HTTP/1.1 connections to one server, shared between threads.
+
+    A connection that fails is closed and replaced on next use.
+    """
+
+    def __init__(self, url: str, size: int = 2, timeout: float = 5.0):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def request(self, method: str, path: str, body=None) -> Tuple[int, dict, bytes]:
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            connection.request(method, self.prefix + path, body=json.dumps(body) if body is not None else None,
+                               headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                self.idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        return response.status, dict(response.getheaders()), data
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RequestFailed(Exception):
+    pass
+
+
+# Worth retrying: the server is overloaded or restarting (the ingest queue
+# answers 503 with Retry-After when full)
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class Item(NamedTuple):
+    kind: str  # "create" or "complete"
+    episode: int
+    body: dict
+
+
+class EventReporter:
+    """Records debounced disaster detections as simulation events, off the inference thread.
+
+    report() runs the Debouncer and queues work in a bounded outbox; it never
+    touches the network. A sender thread posts the outbox in batches to
+    /api/events/batch (a disaster starting) and /api/events/complete/batch
+    (ending, with its duration as resolution_time_seconds) whenever
+    batch_size items are waiting or flush_interval seconds have passed.
+    Connection errors and overload responses are retried with exponential
+    backoff, honouring Retry-After. When the outbox is full the oldest item is
+    dropped, so a long outage costs old reports rather than memory.
+    """
+
+    def __init__(self, url: str, robot_type: str, world_type: str, debouncer: Optional[Debouncer] = None,
+                 disaster_types: Dict[str, str] = DISASTER_CLASSES, batch_size: int = 100,
+                 flush_interval: float = 1.0, outbox_size: int = 1000, retries: int = 5, backoff: float = 0.5,
+                 timeout: float = 5.0):
+        self.pool = HTTPPool(url, timeout=timeout)
+        self.robot_type = robot_type
+        self.world_type = world_type
+        self.debouncer = debouncer or Debouncer(disaster_types)
+        self.disaster_types = disaster_types
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+
+        self.outbox = deque()
+        self.outbox_size = outbox_size
+        self.condition = threading.Condition()
+        self.closed = False
+        self.next_episode = 1
+        self.episodes: Dict[str, int] = {}
+        # Event ids of created episodes, and completions waiting for theirs
+        self.event_ids: Dict[int, int] = {}
+        self.waiting: Dict[int, dict] = {}
+        self.counts = dict.fromkeys(("transitions", "created", "completed", "failed", "dropped", "retries"), 0)
+        self.last_error: Optional[str] = None
+
+        self.sender = threading.Thread(target=self.run, name="event-reporter", daemon=True)
+        self.sender.start()
+
+    def report(self, detections: Iterable[Union[Detection, dict]], now: Optional[float] = None) -> List[Transition]:
+        """Debounce one frame's detections and queue any resulting events. Never blocks on the network."""
+        transitions = self.debouncer.update(detections, now)
+        for transition in transitions:
+            self.counts["transitions"] += 1
+            if transition.state == "start":
+                episode = self.next_episode
+                self.next_episode += 1
+                self.episodes[transition.label] = episode
+                self.enqueue(Item("create", episode, {
+                    "robot_type": self.robot_type,
+                    "world_type": self.world_type,
+                    "disaster_type": self.disaster_types.get(transition.label, transition.label),
+                }))
+            else:
+                episode = self.episodes.pop(transition.label, None)
+                if episode is not None:
+                    self.enqueue(Item("complete", episode, {"resolution_time_seconds": round(transition.duration, 3)}))
+        return transitions
+
+    def enqueue(self, item: Item):
+        with self.condition:
+            if len(self.outbox) >= self.outbox_size:
+                self.outbox.popleft()
+                self.counts["dropped"] += 1
+            self.outbox.append(item)
+            if len(self.outbox) >= self.batch_size:
+                self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed or len(self.outbox) >= self.batch_size,
+                                        self.flush_interval)
+                items = [self.outbox.popleft() for _ in range(min(len(self.outbox), self.batch_size))]
+                done = self.closed and not self.outbox
+            if items:
+                self.send(items)
+            if done:
+                return
+
+    def send(self, items: List[Item]):
+        creates = [item for item in items if item.kind == "create"]
+        if creates:
+            try:
+                reply = self.post("/api/events/batch", {"events": [item.body for item in creates]})
+            except RequestFailed as e:
+                self.counts["failed"] += len(creates)
+                self.last_error = str(e)
+            else:
+                for created in reply.get("created", []):
+                    self.event_ids[creates[created["index"]].episode] = created["id"]
+                self.counts["created"] += len(reply.get("created", []))
+                self.counts["failed"] += len(reply.get("errors", []))
+
+        # A completion whose create hasn't been answered yet waits for it;
+        # one whose create failed is dropped with it
+        for item in items:
+            if item.kind == "complete":
+                self.waiting[item.episode] = item.body
+        completions = []
+        for episode in list(self.waiting):
+            if episode in self.event_ids:
+                completions.append({"id": self.event_ids.pop(episode), **self.waiting.pop(episode)})
+            elif not any(item.kind == "create" and item.episode == episode for item in self.outbox):
+                del self.waiting[episode]
+                self.counts["failed"] += 1
+        if completions:
+            try:
+                reply = self.post("/api/events/complete/batch", {"completions": completions})
+            except RequestFailed as e:
+                self.counts["failed"] += len(completions)
+                self.last_error = str(e)
+            else:
+                self.counts["completed"] += len(reply.get("completed", []))
+                self.counts["failed"] += len(reply.get("errors", []))
+
+    def post(self, path: str, body: dict) -> dict:
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                status, headers, data = self.pool.request("POST", path, body)
+            except (OSError, http.client.HTTPException) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if status < 300 or status not in RETRY_STATUSES and status < 500:
+                    reply = json.loads(data) if data else {}
+                    if status >= 300 and not reply.get("created") and not reply.get("completed"):
+                        raise RequestFailed(f"POST {path}: {status} {reply.get('error', '')}".strip())
+                    return reply
+                error = f"POST {path}: {status}"
+                if headers.get("Retry-After", "").isdigit():
+                    delay = max(delay, int(headers["Retry-After"]))
+            if attempt == self.retries:
+                raise RequestFailed(error)
+            self.counts["retries"] += 1
+            time.sleep(delay)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until the outbox is empty; False if it isn't after timeout seconds."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.condition.notify()
+        while time.monotonic() < deadline:
+            with self.condition:
+                if not self.outbox:
+                    return True
+                self.condition.notify()
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout: float = 10.0):
+        """Send what is queued, then stop."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.sender.join(timeout)
+        self.pool.close()
+
+    def stats(self) -> dict:
+        with self.condition:
+            outbox = len(self.outbox)
+        return {**self.counts, "outbox": outbox, "waiting": len(self.waiting), "last_error": self.last_error}
+
+
+class StubEventServer:
+    """Stands in for the database API's batch event endpoints, in memory.
+
+    Answers the first fail_first requests with 503 and Retry-After: 0, to
+    exercise the retry path. requests holds (path, body) of every request.
+    """
+
+    def __init__(self, port: int = 0, fail_first: int = 0):
+        stub = self
+        self.requests: List[Tuple[str, dict]] = []
+        self.events: Dict[int, dict] = {}
+        self.fail_remaining = fail_first
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                status, reply = stub.handle(self.path, body)
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 503:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def handle(self, path: str, body) -> Tuple[int, dict]:
+        with self.lock:
+            self.requests.append((path, body))
+            if self.fail_remaining > 0:
+                self.fail_remaining -= 1
+                return 503, {"error": "stub overloaded"}
+            if path == "/api/events/batch":
+                created = []
+                for index, event in enumerate(body["events"]):
+                    event_id = len(self.events) + 1
+                    self.events[event_id] = dict(event, id=event_id, completed=False)
+                    created.append(dict(self.events[event_id], index=index))
+                return 201, {"created": created, "errors": []}
+            if path == "/api/events/complete/batch":
+                completed, errors = [], []
+                for index, completion in enumerate(body["completions"]):
+                    event = self.events.get(completion["id"])
+                    if event is None:
+                        errors.append({"index": index, "error": "Event not found"})
+                        continue
+                    event.update(completed=True, resolution_time_seconds=completion["resolution_time_seconds"])
+                    completed.append(dict(event, index=index))
+                return 200, {"completed": completed, "errors": errors}
+            return 404, {"error": "Not found"}
+
+    def start(self) -> "StubEventServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def demo_detections(seconds: float, fps: float) -> Iterable[Tuple[float, List[dict]]]:
+    """A flickering fire from 1 s to 5 s and a flood from 3 s on, at fps frames per second."""
+    frames = int(seconds * fps)
+    for index in range(frames):
+        t = index / fps
+        detections = []
+        if 1 <= t < 5 and index % 7:
+            detections.append({"class": "fire", "confidence": 0.85})
+        if t >= 3 and index % 11:
+            detections.append({"class": "water", "confidence": 0.75 if index % 3 else 0.6})
+        yield t, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a synthetic detection sequence through the event "
+                                                 "reporter, against the database API or a local stub")
+    parser.add_argument("--url", help="database API base URL (default: an in-process stub server)")
+    parser.add_argument("--robot-type", default="TurtleBot3")
+    parser.add_argument("--world-type", default="Warehouse")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--fail-first", type=int, default=1, help="stub only: answer this many requests with 503")
+    args = parser.parse_args()
+
+    stub = None if args.url else StubEventServer(fail_first=args.fail_first).start()
+    reporter = EventReporter(args.url or stub.url, args.robot_type, args.world_type, flush_interval=0.2)
+    slowest = 0.0
+    for t, detections in demo_detections(args.seconds, args.fps):
+        start = time.perf_counter()
+        for transition in reporter.report(detections, now=t):
+            print(f"{t:6.2f}s {transition.label} {transition.state}"
+                  + (f" after {transition.duration:.2f}s" if transition.state == "end" else ""))
+        slowest = max(slowest, time.perf_counter() - start)
+    reporter.close()
+    print(json.dumps({**reporter.stats(), "slowest_report_ms": round(slowest * 1000, 3)}))
+    if stub:
+        print(json.dumps({"requests": len(stub.requests), "events": list(stub.events.values())}))
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
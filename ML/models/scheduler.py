@@ -0,0 +1,234 @@
+import math
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from detectors import Detection, Detector
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, M) IoU of (N, 4) and (M, 4) x1, y1, x2, y2 boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(-1)
+    area_a = (a[:, 2:] - a[:, :2]).prod(-1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(-1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+class Track:
+    def __init__(self, track_id: int, detection: Detection):
+        self.id = track_id
+        self.detection = detection
+        # Box at the last detection and its change per frame since; frames_since
+        # counts the tracker-only frames after it
+        self.anchor = np.array(detection.bbox, dtype=np.float64) if detection.bbox is not None else None
+        self.velocity = np.zeros(4)
+        self.frames_since = 0
+        self.misses = 0
+
+    @property
+    def bbox(self) -> Optional[np.ndarray]:
+        if self.anchor is None:
+            return None
+        return self.anchor + self.velocity * self.frames_since
+
+    def current(self) -> Detection:
+        bbox = self.bbox
+        return self.detection if bbox is None else self.detection._replace(bbox=tuple(float(v) for v in bbox))
+
+
+class IoUTracker:
+    """Carries detections across the frames the detector skips.
+
+    update() matches a detector run to the tracks, greedily by IoU within a
+    class, falling back to centroid distance for boxes that moved further
+    than they overlap; step() moves every track on by one frame at its
+    constant velocity. Whole-frame labels (bbox None) match by class alone.
+    A track is dropped once more than max_misses detector runs in a row miss
+    it; the default trusts every run, as the tracker would otherwise keep
+    showing a box the detector no longer sees until the next run.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, centroid_distance: float = 0.5, max_misses: int = 0,
+                 smoothing: float = 0.5):
+        self.iou_threshold = iou_threshold
+        # As a fraction of the larger side of the track's box
+        self.centroid_distance = centroid_distance
+        self.max_misses = max_misses
+        self.smoothing = smoothing
+        self.tracks: List[Track] = []
+        self.next_id = 1
+
+    def update(self, detections: Sequence[Detection]) -> List[Detection]:
+        matches = self.match(detections)
+        matched_tracks = set()
+        for track_index, detection_index in matches:
+            track = self.tracks[track_index]
+            detection = detections[detection_index]
+            if track.anchor is not None and detection.bbox is not None:
+                # This detection is one frame after the last tracker-only step
+                observed = (np.array(detection.bbox) - track.anchor) / (track.frames_since + 1)
+                track.velocity = self.smoothing * track.velocity + (1 - self.smoothing) * observed
+            track.detection = detection
+            track.anchor = np.array(detection.bbox, dtype=np.float64) if detection.bbox is not None else None
+            track.frames_since = 0
+            track.misses = 0
+            matched_tracks.add(track_index)
+
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        matched_detections = {detection_index for _, detection_index in matches}
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                survivors.append(Track(self.next_id, detection))
+                self.next_id += 1
+        self.tracks = survivors
+        return self.detections()
+
+    def match(self, detections: Sequence[Detection]) -> List[tuple]:
+        """(track index, detection index) pairs."""
+        if not self.tracks or not detections:
+            return []
+        track_boxes = [track.bbox for track in self.tracks]
+        same_class = np.array([[track.detection.class_id == detection.class_id for detection in detections]
+                               for track in self.tracks])
+        boxed_tracks = np.array([bbox is not None for bbox in track_boxes])
+        boxed_detections = np.array([detection.bbox is not None for detection in detections])
+
+        # Whole-frame labels score 1 against their class, boxes by IoU,
+        # or just under the IoU threshold if their centres are close
+        score = np.where(same_class & ~boxed_tracks[:, None] & ~boxed_detections[None, :], 1.0, 0.0)
+        if boxed_tracks.any() and boxed_detections.any():
+            a = np.array([bbox for bbox in track_boxes if bbox is not None])
+            b = np.array([detection.bbox for detection in detections if detection.bbox is not None], dtype=np.float64)
+            overlap = iou_matrix(a, b)
+            centres_a = (a[:, :2] + a[:, 2:]) / 2
+            centres_b = (b[:, :2] + b[:, 2:]) / 2
+            distance = np.linalg.norm(centres_a[:, None] - centres_b[None, :], axis=-1)
+            reach = (a[:, 2:] - a[:, :2]).max(-1, keepdims=True) * self.centroid_distance
+            overlap = np.where((overlap < self.iou_threshold) & (distance <= reach), self.iou_threshold, overlap)
+            score[np.ix_(boxed_tracks, boxed_detections)] = overlap
+        score = np.where(same_class, score, 0.0)
+
+        matches = []
+        while True:
+            track_index, detection_index = np.unravel_index(score.argmax(), score.shape)
+            if score[track_index, detection_index] < self.iou_threshold:
+                return matches
+            matches.append((int(track_index), int(detection_index)))
+            score[track_index, :] = 0
+            score[:, detection_index] = 0
+
+    def step(self) -> List[Detection]:
+        for track in self.tracks:
+            track.frames_since += 1
+        return self.detections()
+
+    def detections(self) -> List[Detection]:
+        return [track.current() for track in self.tracks]
+
+
+class ScheduledResult(NamedTuple):
+    detections: List[Detection]
+    # Whether the detector ran on this frame, rather than the tracker
+    detected: bool
+    motion: float
+
+
+class DetectionScheduler:
+    """Runs detector on some frames only and tracks boxes in between.
+
+    The detector runs on the first frame, then every `every` frames, or
+    sooner when the frame has changed by more than motion_threshold since the
+    last detector run (mean absolute difference of small grayscale copies,
+    0 to 1). With latency_budget, seconds per frame, `every` adapts instead:
+    it is the smallest N for which the detector's cost spread over N frames
+    plus the tracker's cost fits the budget, between min_every and max_every.
+    """
+
+    def __init__(self, detector: Detector, every: int = 1, motion_threshold: Optional[float] = None,
+                 latency_budget: Optional[float] = None, min_every: int = 1, max_every: int = 30,
+                 tracker: Optional[IoUTracker] = None, motion_width: int = 64):
+        self.detector = detector
+        self.every = every
+        self.motion_threshold = motion_threshold
+        self.latency_budget = latency_budget
+        self.min_every = min_every
+        self.max_every = max_every
+        self.tracker = tracker or IoUTracker()
+        self.motion_width = motion_width
+        self.reference: Optional[np.ndarray] = None
+        self.frames_since = 0
+        self.frames = 0
+        self.detector_runs = 0
+        self.motion_runs = 0
+        # Exponential moving averages, in seconds
+        self.detector_time: Optional[float] = None
+        self.tracker_time = 0.0
+        self.detector_total = 0.0
+        self.tracker_total = 0.0
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, round(frame.shape[0] * self.motion_width / frame.shape[1]))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, (self.motion_width, height), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def process(self, frame: np.ndarray) -> ScheduledResult:
+        self.frames += 1
+        thumbnail = self.thumbnail(frame) if self.motion_threshold is not None else None
+        motion = 0.0
+        if thumbnail is not None and self.reference is not None:
+            motion = float(np.abs(thumbnail - self.reference).mean() / 255)
+
+        due = self.detector_runs == 0 or self.frames_since + 1 >= self.every
+        moved = self.motion_threshold is not None and motion > self.motion_threshold
+        if due or moved:
+            start = time.perf_counter()
+            detections = self.detector.predict([frame])[0]
+            elapsed = time.perf_counter() - start
+            self.detector_total += elapsed
+            self.detector_time = elapsed if self.detector_time is None else 0.8 * self.detector_time + 0.2 * elapsed
+            self.detector_runs += 1
+            self.motion_runs += moved and not due
+            self.reference = thumbnail
+            self.frames_since = 0
+            start = time.perf_counter()
+            detections = self.tracker.update(detections)
+            self.tracker_total += time.perf_counter() - start
+            self.adapt()
+            return ScheduledResult(detections, True, motion)
+
+        start = time.perf_counter()
+        detections = self.tracker.step()
+        elapsed = time.perf_counter() - start
+        self.tracker_total += elapsed
+        self.tracker_time = 0.8 * self.tracker_time + 0.2 * elapsed
+        self.frames_since += 1
+        return ScheduledResult(detections, False, motion)
+
+    def adapt(self):
+        if self.latency_budget is None or self.detector_time is None:
+            return
+        available = self.latency_budget - self.tracker_time
+        every = math.ceil(self.detector_time / available) if available > 0 else self.max_every
+        self.every = min(max(every, self.min_every), self.max_every)
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "detector_runs": self.detector_runs,
+            "motion_runs": self.motion_runs,
+            "compute_saved": round(1 - self.detector_runs / self.frames, 4) if self.frames else None,
+            "every": self.every,
+            "detector_seconds": round(self.detector_total, 4),
+            "tracker_seconds": round(self.tracker_total, 4),
+        }
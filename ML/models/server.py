@@ -0,0 +1,517 @@
+import argparse
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS
+from capture import percentiles
+from detectors import DETECTORS, Detection, Detector, load_detector
+from engine import InferenceEngine
+from sources import open_source
+
+# Wire format, both ways: a 4 byte big-endian header length, a JSON header,
+# then header["size"] bytes of payload (frames only).
+HEADER_LENGTH = struct.Struct("!I")
+# Limits on what a peer may make the reader allocate; a raw 4K frame is ~25 MB
+MAX_HEADER_LENGTH = 64 * 1024
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+
+
+class ProtocolError(ValueError):
+    """A message that breaks the wire format; the stream cannot be resynchronised."""
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    if payload:
+        header = dict(header, size=len(payload))
+    data = json.dumps(header).encode()
+    sock.sendall(HEADER_LENGTH.pack(len(data)) + data)
+    if payload:
+        sock.sendall(payload)
+
+
+def receive_message(rfile, max_payload_size: int = MAX_PAYLOAD_SIZE) -> Optional[Tuple[dict, bytes]]:
+    """The next (header, payload) from a buffered socket file, or None once the peer has closed.
+
+    Raises ProtocolError for a malformed or oversized message, before reading its payload.
+    """
+    prefix = rfile.read(HEADER_LENGTH.size)
+    if len(prefix) < HEADER_LENGTH.size:
+        return None
+    (length,) = HEADER_LENGTH.unpack(prefix)
+    if length > MAX_HEADER_LENGTH:
+        raise ProtocolError(f"Header of {length} bytes is over the {MAX_HEADER_LENGTH} byte limit")
+    data = rfile.read(length)
+    if len(data) < length:
+        return None
+    try:
+        header = json.loads(data)
+    except ValueError as e:
+        raise ProtocolError(f"Header is not valid JSON: {e}") from None
+    if not isinstance(header, dict):
+        raise ProtocolError("Header must be a JSON object")
+    size = header.get("size", 0)
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ProtocolError(f"Header size must be a non-negative integer, not {size!r}")
+    if size > max_payload_size:
+        raise ProtocolError(f"Payload of {size} bytes is over the {max_payload_size} byte limit")
+    payload = rfile.read(size) if size else b""
+    if len(payload) < size:
+        return None
+    return header, payload
+
+
+def encode_frame(image: np.ndarray, encoding: str = "raw") -> Tuple[dict, bytes]:
+    """Header fields and payload for a BGR frame. raw is cheapest over a
+    local socket; jpeg is smaller when the server is on another machine."""
+    if encoding == "raw":
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        return {"encoding": "raw", "shape": list(image.shape)}, image.tobytes()
+    if encoding == "jpeg":
+        ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise ValueError("Could not encode frame as JPEG")
+        return {"encoding": "jpeg"}, data.tobytes()
+    raise ValueError(f"Unknown encoding {encoding!r}, expected raw or jpeg")
+
+
+def decode_frame(header: dict, payload: bytes) -> np.ndarray:
+    encoding = header.get("encoding", "raw")
+    if encoding == "raw":
+        shape = tuple(header["shape"])
+        if len(shape) != 3 or shape[2] != 3 or np.prod(shape) != len(payload):
+            raise ValueError(f"Frame of {len(payload)} bytes does not match shape {list(shape)}")
+        return np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+    if encoding == "jpeg":
+        image = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode JPEG frame")
+        return image
+    raise ValueError(f"Unknown encoding {encoding!r}, expected raw or jpeg")
+
+
+class Overloaded(Exception):
+    """The batcher's queue is full; the frame was not accepted."""
+
+
+class Outcome(NamedTuple):
+    detections: List[Detection]
+    # Seconds from submit() to the frame joining a batch, and to its detections
+    queued: float
+    latency: float
+    batch_size: int
+
+
+class Request(NamedTuple):
+    stream: str
+    image: np.ndarray
+    future: Future
+    submitted: float
+
+
+class StreamStats:
+    def __init__(self, window: int = 1000):
+        self.frames = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=window)
+        self.queued = deque(maxlen=window)
+
+
+class DynamicBatcher:
+    """Batches frames from many streams into one detector.
+
+    A batch goes to the model once it holds max_batch_size frames or its
+    oldest frame has waited max_latency seconds. The queue holds at most
+    queue_size frames; submit() refuses more rather than let latency grow,
+    and the producer decides whether to drop or retry the frame.
+    """
+
+    def __init__(self, detector: Detector, max_batch_size: int = 16, max_latency: float = 0.02,
+                 queue_size: int = 256):
+        self.engine = InferenceEngine(detector, max_batch_size, max_latency)
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.streams = defaultdict(StreamStats)
+        self.max_queue_depth = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.worker = threading.Thread(target=self.run, name="batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, stream: str, image: np.ndarray) -> Future:
+        future = Future()
+        try:
+            self.pending.put_nowait(Request(stream, image, future, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.streams[stream].rejected += 1
+            raise Overloaded(f"queue full ({self.pending.maxsize} frames)")
+        depth = self.pending.qsize()
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def run(self):
+        while True:
+            request = self.pending.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = request.submitted + self.max_latency
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self.pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+
+            started = time.monotonic()
+            try:
+                detections = self.engine.predict([request.image for request in batch])
+            except Exception as e:
+                self.errors += 1
+                for request in batch:
+                    request.future.set_exception(e)
+            else:
+                done = time.monotonic()
+                with self.lock:
+                    for request in batch:
+                        stats = self.streams[request.stream]
+                        stats.frames += 1
+                        stats.queued.append(started - request.submitted)
+                        stats.latencies.append(done - request.submitted)
+                for request, frame_detections in zip(batch, detections):
+                    request.future.set_result(Outcome(frame_detections, started - request.submitted,
+                                                      done - request.submitted, len(batch)))
+            if stopping:
+                return
+
+    def close(self):
+        self.pending.put(None)
+        self.worker.join()
+
+    def metrics(self) -> dict:
+        engine = self.engine.stats()
+        with self.lock:
+            streams = {
+                name: {
+                    "frames": stats.frames,
+                    "rejected": stats.rejected,
+                    "latency_ms": percentiles(stats.latencies),
+                    "queue_ms": percentiles(stats.queued),
+                }
+                for name, stats in sorted(self.streams.items())
+            }
+            max_queue_depth = self.max_queue_depth
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "queue_depth": self.pending.qsize(),
+            "max_queue_depth": max_queue_depth,
+            "frames": engine["frames"],
+            "batches": engine["batches"],
+            "mean_batch_size": engine["mean_batch_size"],
+            "batch_sizes": engine["batch_sizes"],
+            "model_frames_per_second": engine["frames_per_second"],
+            "rejected": sum(stats["rejected"] for stats in streams.values()),
+            "errors": self.errors,
+            "streams": streams,
+        }
+
+
+class FrameHandler(socketserver.StreamRequestHandler):
+    """One producer connection. Frames may be pipelined: each reply carries
+    the request's id and is written as soon as its batch is done.
+
+    Replies go through a queue to a writer thread of the connection's own,
+    so the batcher thread never waits on a socket. A producer that lets more
+    than reply_backlog replies pile up is not reading them, and is
+    disconnected rather than buffered for without bound.
+
+    A message that breaks the wire format (see receive_message()) gets an
+    error reply and the connection is closed, since nothing after it can be
+    trusted to start on a message boundary.
+    """
+
+    reply_backlog = 64
+    # Seconds a closing connection waits for its queued replies to be written
+    drain_timeout = 5.0
+
+    def handle(self):
+        batcher: DynamicBatcher = self.server.batcher
+        replies = queue.Queue(maxsize=self.reply_backlog)
+
+        def disconnect():
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # already gone
+
+        def write():
+            while True:
+                header = replies.get()
+                if header is None:
+                    return
+                try:
+                    send_message(self.connection, header)
+                except OSError:
+                    disconnect()  # the producer went away; nothing to tell it
+                    return
+
+        def reply(header: dict):
+            try:
+                replies.put_nowait(header)
+            except queue.Full:
+                disconnect()
+
+        writer = threading.Thread(target=write, name="reply-writer", daemon=True)
+        writer.start()
+        try:
+            while True:
+                try:
+                    message = receive_message(self.rfile, self.server.max_payload_size)
+                except ProtocolError as e:
+                    reply({"error": str(e)})
+                    return
+                except OSError:
+                    return
+                if message is None:
+                    return
+                header, payload = message
+                if header.get("type") == "metrics":
+                    reply({"type": "metrics", **batcher.metrics()})
+                    continue
+
+                request_id = header.get("id")
+                stream = str(header.get("stream", "default"))
+                try:
+                    future = batcher.submit(stream, decode_frame(header, payload))
+                except (Overloaded, ValueError, TypeError, KeyError) as e:
+                    reply({"id": request_id, "stream": stream, "error": str(e)})
+                    continue
+                future.add_done_callback(lambda done, request_id=request_id, stream=stream:
+                                         reply(result_message(request_id, stream, done)))
+        finally:
+            # Let the replies already queued go out, for a while
+            try:
+                replies.put(None, timeout=self.drain_timeout)
+            except queue.Full:
+                pass
+            writer.join(self.drain_timeout)
+            if writer.is_alive():
+                disconnect()
+                writer.join()
+
+
+def result_message(request_id, stream: str, future: Future) -> dict:
+    if future.exception() is not None:
+        return {"id": request_id, "stream": stream, "error": str(future.exception())}
+    outcome = future.result()
+    return {
+        "id": request_id,
+        "stream": stream,
+        "detections": [detection.to_dict() for detection in outcome.detections],
+        "queue_ms": round(outcome.queued * 1000, 3),
+        "latency_ms": round(outcome.latency * 1000, 3),
+        "batch_size": outcome.batch_size,
+    }
+
+
+def parse_address(address: str):
+    """A host:port pair for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return address
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address: str, batcher: DynamicBatcher,
+                max_payload_size: int = MAX_PAYLOAD_SIZE) -> socketserver.BaseServer:
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        server = TCPServer(address, FrameHandler)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)  # left over from a server that didn't shut down cleanly
+        server = UnixServer(address, FrameHandler)
+    server.batcher = batcher
+    server.max_payload_size = max_payload_size
+    return server
+
+
+class InferenceClient:
+    """A producer connection to the server, one frame in flight at a time.
+
+    For concurrent streams use one client per stream (or thread).
+    """
+
+    def __init__(self, address: str, stream: str = "default", encoding: str = "raw", timeout: float = 30.0):
+        address = parse_address(address)
+        family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.stream = stream
+        self.encoding = encoding
+        self.next_id = 0
+
+    def detect(self, image: np.ndarray) -> dict:
+        """The server's reply for image: detections as dicts, or an "error" key."""
+        self.next_id += 1
+        fields, payload = encode_frame(image, self.encoding)
+        send_message(self.sock, {"id": self.next_id, "stream": self.stream, **fields}, payload)
+        return self.receive()
+
+    def metrics(self) -> dict:
+        send_message(self.sock, {"type": "metrics"})
+        return self.receive()
+
+    def receive(self) -> dict:
+        message = receive_message(self.rfile)
+        if message is None:
+            raise ConnectionError("Inference server closed the connection")
+        return message[0]
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def simulate_robot(address: str, name: str, frames: List[np.ndarray], fps: float, duration: float,
+                   encoding: str, results: dict):
+    """One robot: sends frames at fps for duration seconds, skipping a frame
+    when the previous reply is late, as a live camera would."""
+    round_trips, sent, errors = [], 0, 0
+    interval = 1 / fps
+    with InferenceClient(address, name, encoding) as client:
+        start = next_frame = time.monotonic()
+        while time.monotonic() - start < duration:
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            sent_at = time.monotonic()
+            reply = client.detect(frames[sent % len(frames)])
+            round_trips.append(time.monotonic() - sent_at)
+            sent += 1
+            errors += "error" in reply
+            next_frame = max(next_frame + interval, time.monotonic())
+    results[name] = {"sent": sent, "errors": errors, "round_trip_ms": percentiles(round_trips)}
+
+
+def run_fleet(address: str, source, robots: int, fps: float, duration: float, encoding: str = "raw",
+              max_frames: int = 100) -> dict:
+    source = open_source(source)
+    frames = [frame.image for _, frame in zip(range(max_frames), source)]
+    source.close()
+    if not frames:
+        raise RuntimeError("Error: no frames to send.")
+    results = {}
+    threads = [
+        threading.Thread(target=simulate_robot, args=(address, f"robot{i}", frames, fps, duration, encoding, results))
+        for i in range(robots)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with InferenceClient(address) as client:
+        server = client.metrics()
+    return {"robots": dict(sorted(results.items())), "server": server}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one model to many frame producers with dynamic batching")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="load a model and serve it")
+    serve.add_argument("--address", default="/tmp/disaster-detector.sock", help="Unix socket path or host:port")
+    serve.add_argument("--model", choices=list(DETECTORS), default="yolov11")
+    serve.add_argument("--backend", choices=BACKENDS, default="eager")
+    serve.add_argument("--device", help="torch device (default: cuda, then mps, then cpu)")
+    serve.add_argument("--batch-size", type=int, default=16, help="largest batch sent to the model")
+    serve.add_argument("--max-latency", type=float, default=20, help="longest a frame waits for its batch, in ms")
+    serve.add_argument("--queue-size", type=int, default=256, help="frames queued before producers are refused")
+    serve.add_argument("--max-frame-mb", type=float, default=MAX_PAYLOAD_SIZE / 2**20,
+                       help="largest frame payload accepted, in MiB; bigger ones close the connection")
+
+    fleet = commands.add_parser("fleet", help="simulate robots sending frames to a running server")
+    fleet.add_argument("--address", default="/tmp/disaster-detector.sock")
+    fleet.add_argument("--source", required=True, help="video file, image directory or image each robot replays")
+    fleet.add_argument("--robots", type=int, default=8)
+    fleet.add_argument("--fps", type=float, default=10, help="frames per second per robot")
+    fleet.add_argument("--duration", type=float, default=10, help="seconds")
+    fleet.add_argument("--encoding", choices=["raw", "jpeg"], default="raw")
+
+    metrics = commands.add_parser("metrics", help="print a running server's metrics")
+    metrics.add_argument("--address", default="/tmp/disaster-detector.sock")
+    args = parser.parse_args()
+
+    if args.command == "fleet":
+        print(json.dumps(run_fleet(args.address, args.source, args.robots, args.fps, args.duration, args.encoding),
+                         indent=2))
+        return
+    if args.command == "metrics":
+        with InferenceClient(args.address) as client:
+            print(json.dumps(client.metrics(), indent=2))
+        return
+
+    detector = load_detector(args.model, backend=args.backend, device=args.device)
+    # Warm up at both ends of the batch sizes so the first robots see steady-state latency
+    start = time.perf_counter()
+    for batch_size in sorted({1, args.batch_size}):
+        detector.warm_up(batch_size)
+    print(f"Warmed up in {time.perf_counter() - start:.1f}s", file=sys.stderr, flush=True)
+    batcher = DynamicBatcher(detector, args.batch_size, args.max_latency / 1000, args.queue_size)
+    server = make_server(args.address, batcher, int(args.max_frame_mb * 2**20))
+    print(f"Serving {args.model} on {args.address}", file=sys.stderr, flush=True)
+    # Clean up the socket on a service manager's stop as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        if isinstance(parse_address(args.address), str) and os.path.exists(args.address):
+            os.unlink(args.address)
+
+
+if __name__ == "__main__":
+    main()
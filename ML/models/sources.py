@@ -0,0 +1,125 @@
+import os
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence, Union
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+class Frame(NamedTuple):
+    index: int
+    image: np.ndarray  # HxWx3 BGR uint8, as OpenCV reads it
+    timestamp: float  # time.monotonic() when the frame was read
+    source: str
+
+
+class FrameSource:
+    """Iterable of Frames. Subclasses implement read() and may override close()."""
+
+    name = "frames"
+
+    def read(self) -> Optional[np.ndarray]:
+        """Return the next BGR image, or None when the source is exhausted."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __iter__(self) -> Iterator[Frame]:
+        index = 0
+        try:
+            while True:
+                image = self.read()
+                if image is None:
+                    return
+                yield Frame(index, image, time.monotonic(), self.name)
+                index += 1
+        finally:
+            self.close()
+
+
+class CameraSource(FrameSource):
+    def __init__(self, index: int = 0, width: Optional[int] = None, height: Optional[int] = None,
+                 fps: Optional[int] = None):
+        self.name = f"camera:{index}"
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Error: Could not open camera {index}.")
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def read(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def close(self):
+        self.cap.release()
+
+
+class VideoFileSource(CameraSource):
+    def __init__(self, path: str):
+        self.name = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Error: Could not open video {path}.")
+
+
+class ImageDirectorySource(FrameSource):
+    """Every image file in a directory, in name order."""
+
+    def __init__(self, path: str):
+        self.name = path
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        )
+        self.position = 0
+
+    def read(self):
+        while self.position < len(self.paths):
+            path = self.paths[self.position]
+            self.position += 1
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                return image
+            print(f"Warning: could not decode {path}, skipped")
+        return None
+
+
+class ArraySource(FrameSource):
+    """Frames that are already in memory: HxWx3 BGR arrays or an NxHxWx3 stack."""
+
+    def __init__(self, frames: Union[np.ndarray, Sequence[np.ndarray], Iterable[np.ndarray]], name: str = "array"):
+        self.name = name
+        self.frames = iter(frames)
+
+    def read(self):
+        return next(self.frames, None)
+
+
+def open_source(spec, **camera_options) -> FrameSource:
+    """A FrameSource for spec: a camera index, a video file, an image
+    directory or file, an in-memory array (or list of arrays), or a
+    FrameSource, which is returned unchanged."""
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, np.ndarray) and spec.ndim == 3:
+        return ArraySource([spec])
+    if isinstance(spec, (np.ndarray, list, tuple)):
+        return ArraySource(spec)
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec), **camera_options)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    if os.path.splitext(spec)[1].lower() in IMAGE_EXTENSIONS:
+        image = cv2.imread(spec, cv2.IMREAD_COLOR)
+        if image is None:
+            raise RuntimeError(f"Error: Could not read image {spec}.")
+        return ArraySource([image], name=spec)
+    return VideoFileSource(spec)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from detectors import Detection, Detector
+from scheduler import DetectionScheduler, IoUTracker
+
+
+class MovingBox(Detector):
+    """One box moving right at speed pixels per frame; frame is set by the test."""
+
+    def __init__(self, speed: float):
+        super().__init__("cpu")
+        self.speed = speed
+        self.frame = 0
+
+    def box(self, frame: int) -> Detection:
+        x = 10 + self.speed * frame
+        return Detection("fire", 0, 0.9, (x, 20.0, x + 40, 60.0))
+
+    def predict(self, frames):
+        return [[self.box(self.frame)]]
+
+
+@pytest.mark.parametrize("every", [2, 3])
+def test_tracked_boxes_follow_constant_motion(every):
+    detector = MovingBox(speed=5)
+    scheduler = DetectionScheduler(detector, every=every, tracker=IoUTracker(smoothing=0))
+    image = np.zeros((64, 64, 3), np.uint8)
+    for frame in range(6 * every):
+        detector.frame = frame
+        result = scheduler.process(image)
+        assert len(result.detections) == 1
+        # The velocity is only known from the second detector run on
+        if frame >= every:
+            assert result.detections[0].bbox == pytest.approx(detector.box(frame).bbox)
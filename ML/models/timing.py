@@ -0,0 +1,55 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+import torch
+
+from capture import percentiles
+
+
+class StageTimer:
+    """Seconds spent per named stage of a pipeline, recorded only while enabled.
+
+        with timer("forward"):
+            output = model(batch)
+
+    On CUDA the device is synchronized around each stage while enabled, so
+    asynchronous kernels are charged to the stage that launched them. When
+    disabled a stage costs one attribute check.
+    """
+
+    def __init__(self, device=None):
+        self.enabled = False
+        self.synchronize = device is not None and torch.device(device).type == "cuda"
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, stage: str):
+        if not self.enabled:
+            yield
+            return
+        if self.synchronize:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self.samples[stage].append(time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        """Add a time measured elsewhere, e.g. reported by a library."""
+        if self.enabled:
+            self.samples[stage].append(seconds)
+
+    def reset(self):
+        self.samples.clear()
+
+    def summary(self) -> Dict[str, dict]:
+        """p50/p95/p99/max milliseconds, count and total seconds per stage."""
+        return {
+            stage: {**percentiles(samples), "count": len(samples), "total_seconds": round(sum(samples), 4)}
+            for stage, samples in self.samples.items()
+        }
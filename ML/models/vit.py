@@ -1,66 +1,164 @@
 import cv2
+import numpy as np
 import torch
-import torchvision.transforms.v2 as v2
+from functools import lru_cache
 from torch.utils.data import Dataset, DataLoader
-from typing import Tuple, Set
-from torchvision.models import vit_b_16
+from typing import List, Optional, Sequence, Tuple, Set
+from torchvision.models import vit_b_16, ViT_B_16_Weights
+
+from backends import CPU_BACKENDS, prepare_for_frames
+from capture import ThreadedCapture
+from registry import default_registry, load_state_dict
+from sources import CameraSource
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+@lru_cache(maxsize=None)
+def normalization(device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Per-channel scale and bias folding /255 and ImageNet mean/std into x * scale + bias."""
+    std = torch.tensor(IMAGENET_STD, device=device).view(1, 3, 1, 1)
+    mean = torch.tensor(IMAGENET_MEAN, device=device).view(1, 3, 1, 1)
+    return 1 / (255 * std), -mean / std
+
+
+def preprocess(frames: Sequence[np.ndarray], target_size: Tuple[int, int], device,
+               interpolation: int = cv2.INTER_AREA) -> torch.Tensor:
+    """(B, 3, H, W) normalized RGB batch from BGR uint8 frames.
+
+    Deterministic, for inference: no augmentation. Each frame is resized with
+    cv2.resize; the rest runs once on the whole batch, on the device.
+    INTER_AREA matches the antialiased resize the model was trained with;
+    INTER_LINEAR is much faster on large frames but aliases.
+    """
+    device = torch.device(device)
+    height, width = target_size
+    resized = np.stack([cv2.resize(frame, (width, height), interpolation=interpolation) for frame in frames])
+    # BGR -> RGB on uint8 before the float conversion
+    batch = torch.from_numpy(resized).to(device).permute(0, 3, 1, 2).flip(1)
+    scale, bias = normalization(device)
+    return torch.addcmul(bias, batch.float(), scale)
+
+
+class ViTClassifier:
+    """vit_b_16 ImageNet classifier over batches of BGR frames.
+
+    With target_classes, top_k() only considers those class ids. backend
+    selects how the model runs (see backends.py); all but eager run on the
+    CPU, and compile only applies to eager.
+
+    Pretrained weights come from the local registry (see registry.py) and
+    are memory-mapped into a model built without initialising its own; what
+    torch.compile and the other backends build is kept there between runs.
+    """
+
+    def __init__(self,
+                 target_classes: Optional[Set[int]] = None,
+                 target_size: Tuple[int, int] = (224, 224),
+                 pretrained: bool = True,
+                 device=None,
+                 compile: bool = False,
+                 backend: str = "eager",
+                 calibration: Optional[Sequence[np.ndarray]] = None,
+                 onnx_path: Optional[str] = None):
+        if backend in CPU_BACKENDS:
+            device = "cpu"
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.target_size = target_size
+        weights = ViT_B_16_Weights.IMAGENET1K_V1
+        registry = default_registry()
+        cache_path = None
+        if pretrained:
+            with torch.device("meta"):
+                self.model = vit_b_16()
+            self.model.load_state_dict(load_state_dict(registry.path("vit_b_16")), assign=True)
+            if backend != "eager" and calibration is None:
+                cache_path = registry.artifact("vit_b_16", f"{backend}-{target_size[0]}x{target_size[1]}",
+                                               "onnx" if backend == "onnx" else "pt")
+        else:
+            self.model = vit_b_16()
+        self.model = self.model.to(self.device).eval()
+        if compile and backend == "eager" and hasattr(torch, "compile"):
+            registry.use_compile_cache()
+            self.model = torch.compile(self.model)
+        self.forward = prepare_for_frames(self.model, backend, self.preprocess, calibration, onnx_path,
+                                          cache_path=cache_path)
+        self.categories = weights.meta["categories"]
+        self.target_classes = target_classes
+        self.classes = torch.tensor(sorted(target_classes), device=self.device) if target_classes else None
+
+    def preprocess(self, frames: Sequence[np.ndarray]) -> torch.Tensor:
+        return preprocess(frames, self.target_size, self.device)
+
+    def logits(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.forward(batch)  # (batch_size, num_classes)
+
+    def top_k(self, frames: Sequence[np.ndarray], k: int = 1) -> Tuple[torch.Tensor, torch.Tensor]:
+        """(B, k) probabilities and class ids of the k most likely (target) classes of each frame."""
+        return self.top_k_logits(self.logits(self.preprocess(frames)), k)
+
+    def top_k_logits(self, logits: torch.Tensor, k: int = 1) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Probabilities over all classes, so they read the same with or without target_classes
+        probabilities = logits.softmax(dim=1)
+        if self.classes is not None:
+            probabilities = probabilities[:, self.classes.to(probabilities.device)]
+        confidences, indexes = probabilities.topk(min(k, probabilities.shape[1]), dim=1)
+        if self.classes is not None:
+            indexes = self.classes.to(indexes.device)[indexes]
+        return confidences, indexes
+
+    def warm_up(self, batch_size: int = 1, runs: int = 3):
+        """Compile and autotune on blank frames of the real batch size, so the
+        first camera frame runs at steady-state latency."""
+        frames = [np.zeros((*self.target_size, 3), np.uint8)] * batch_size
+        for _ in range(runs):
+            self.top_k(frames)
+
 
 class RealTimeCameraDataset(Dataset):
-    def __init__(self, 
+    """The newest camera frame per item, as a BGR array; batch with collate_fn=list
+    and preprocess the whole batch (see preprocess())."""
+
+    def __init__(self,
                  device: str = "cuda" if torch.cuda.is_available() else "cpu",
                  target_size: Tuple[int, int] = (224, 224),
                  fps: int = 30):
         self.device = torch.device(device)
         self.target_size = target_size
         self.fps = fps
-        
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise RuntimeError("Error: Could not open camera.")
-            
-        self.cap.set(cv2.CAP_PROP_FPS, fps)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, target_size[0])
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, target_size[1])
-        
-        self.transform = v2.Compose([
-            v2.ToImage(),
-            v2.Resize(size=target_size, antialias=True),
-            v2.ToDtype(torch.float32, scale=True),
-            v2.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-            v2.RandomHorizontalFlip(p=0.5),
-            v2.RandomRotation(degrees=15),
-        ])
+
+        # the camera is read on its own thread, __getitem__ takes the newest frame
+        self.capture = ThreadedCapture(CameraSource(0, target_size[0], target_size[1], fps)).start()
 
     def __len__(self) -> int:
-        return 1000  
+        return 1000
 
-    def __getitem__(self, idx: int) -> torch.Tensor:
-        ret, frame = self.cap.read()
-        if not ret:
+    def __getitem__(self, idx: int) -> np.ndarray:
+        frame = self.capture.latest(timeout=1.0)
+        if frame is None:
             raise RuntimeError("Error: Could not read frame from camera.")
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        tensor = self.transform(frame)
-        return tensor.to(self.device)
+        return frame.image
 
     def release(self):
-        self.cap.release()
+        self.capture.stop()
 
 class RealTimeClassifier:
-    def __init__(self, 
+    def __init__(self,
                  target_classes: Set[int],
                  batch_size: int = 1,
                  target_size: Tuple[int, int] = (224, 224),
                  fps: int = 30):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        
         # load model, use torch.compile (read about this if you want to know more, it kind of gets complex, but we def want to do this)
-        self.model = vit_b_16(pretrained=True).to(self.device)
-        self.model.eval()
-        if hasattr(torch, "compile"):
-            self.model = torch.compile(self.model)
-        
+        self.classifier = ViTClassifier(target_classes, target_size, compile=True)
+        # compiling happens on the first batch; do it before the camera opens
+        self.classifier.warm_up(batch_size)
+        self.device = self.classifier.device
+        self.model = self.classifier.model
+
         self.target_classes = target_classes
-        
+
         # init dataset and dataloader
         self.dataset = RealTimeCameraDataset(
             device=self.device,
@@ -68,36 +166,54 @@ class RealTimeClassifier:
             fps=fps
         )
 
+        # frames are preprocessed per batch, not per item
         self.dataloader = DataLoader(
             self.dataset,
             batch_size=batch_size,
             num_workers=0,
-            drop_last=True
+            drop_last=True,
+            collate_fn=list
         )
 
     def predict(self) -> str:
         try:
-            for batch in self.dataloader:
-                with torch.no_grad():
-                    predictions = self.model(batch)  # (batch_size, num_classes)
-                    predicted_class = torch.argmax(predictions, dim=1)  # (batch_size,)
-                    class_idx = predicted_class.item()  # single value for batch_size=1
-                    return str(class_idx)  # convert to string
+            for frames in self.dataloader:
+                predictions = self.classifier.logits(self.classifier.preprocess(frames))  # (batch_size, num_classes)
+                predicted_class = torch.argmax(predictions, dim=1)  # (batch_size,)
+                class_idx = predicted_class[0].item()  # first frame of the batch
+                return str(class_idx)  # convert to string
         except Exception as e:
             return f"Error: {str(e)}"
         finally:
             self.dataset.release()
 
+    def predict_top_k(self, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """(class id, probability) of the k most likely target classes for every
+        frame of the next batch. Leaves the camera open; call release() when done."""
+        for frames in self.dataloader:
+            confidences, indexes = self.classifier.top_k(frames, k)
+            return [list(zip(frame_indexes, frame_confidences))
+                    for frame_indexes, frame_confidences in zip(indexes.tolist(), confidences.tolist())]
+        return []
+
+    def release(self):
+        self.dataset.release()
+
 
 if __name__ == "__main__":
     # choose which targets we want to be looking for
-    # target_classes = {0, 1, 2} -> 
+    # target_classes = {0, 1, 2} ->
+    target_classes = None
     classifier = RealTimeClassifier(
         target_classes=target_classes,
         batch_size=1,
         target_size=(224, 224),
         fps=30
     )
-    
-    result = classifier.predict()
-    print(f"Predicted class index: {result}")
+
+    try:
+        for frame_top_k in classifier.predict_top_k(k=5):
+            print("Top classes:", ", ".join(f"{classifier.classifier.categories[idx]} {conf:.2f}"
+                                            for idx, conf in frame_top_k))
+    finally:
+        classifier.release()
@@ -1,69 +1,504 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, url_for, stream_with_context
 from flask_migrate import Migrate
 from models import db, SimulationEvent
-from config import get_config
+from config import get_config, engine_options
+from queries import paginate_events
+from bulk import validate_event, validate_completion, validate_resolution_time, insert_events, complete_events
+import stats
+import telemetry
+from export import export_events, CONTENT_TYPES
+from cache import ResponseCache
+from metrics import DatabaseMetrics
+from ingest import EventIngestQueue, QueueFull, queued_event_dict
+from feed import EventBroker, FEED_TYPES, decode_feed_id, event_stream
+from serialization import EVENT_COLUMNS, negotiate, encode, events_payload, event_payload, request_data
+from compression import DecompressRequestBody, choose_encoding, compress, compress_response
+from sqlite_backend import begin_write, configure_sqlite
 import os
 import json
+import hashlib
 from datetime import datetime
 
-app = Flask(__name__)
-app.config.from_object(get_config())
-db.init_app(app)
-migrate = Migrate(app, db)
+api = Blueprint('api', __name__, cli_group=None)
+migrate = Migrate()
 
-@app.route('/api/events', methods=['POST'])
+def create_app(config=None, start_background=True):
+    """Build the API application.
+
+    Pass start_background=False when the app is created in a process that
+    will fork (e.g. gunicorn with preload_app); each child then calls
+    init_worker() to get its own connections and background threads.
+    """
+    if isinstance(config, type):
+        config = config()
+    app = Flask(__name__)
+    app.config.from_object(config or get_config())
+    app.wsgi_app = DecompressRequestBody(app.wsgi_app, app.config['MAX_REQUEST_BODY_SIZE'])
+    
+    db_metrics = DatabaseMetrics(app.config['SLOW_QUERY_MS'], app.config['EXPLAIN_SLOW_QUERIES'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, db_metrics.pool_class())
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            configure_sqlite(db.engine, app.config)
+        db_metrics.instrument(db.engine)
+    app.extensions['db_metrics'] = db_metrics
+    migrate.init_app(app, db)
+    
+    app.extensions['response_cache'] = ResponseCache(
+        app.config['RESPONSE_CACHE_SIZE'],
+        app.config['RESPONSE_CACHE_TTL']
+    )
+    app.extensions['event_feed'] = EventBroker(
+        app,
+        backend=feed_backend(app.config),
+        max_subscribers=app.config['FEED_MAX_SUBSCRIBERS'],
+        max_pending=app.config['FEED_MAX_PENDING']
+    )
+    app.register_blueprint(api)
+    
+    if start_background:
+        start_background_workers(app)
+    return app
+
+def feed_backend(config):
+    if config['FEED_BACKEND'] != 'auto':
+        return config['FEED_BACKEND']
+    return 'postgres' if config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'memory'
+
+def start_background_workers(app):
+    app.extensions['event_feed'].start()
+    if app.config['INGEST_MODE'] == 'async' and 'ingest_queue' not in app.extensions:
+        app.extensions['ingest_queue'] = EventIngestQueue(
+            app,
+            max_size=app.config['INGEST_QUEUE_SIZE'],
+            batch_size=app.config['INGEST_BATCH_SIZE'],
+            flush_interval=app.config['INGEST_FLUSH_INTERVAL'],
+            enqueue_timeout=app.config['INGEST_ENQUEUE_TIMEOUT'],
+            spill_dir=app.config['INGEST_SPILL_DIR'],
+            fsync=app.config['INGEST_FSYNC']
+        ).start()
+
+def stop_background_workers(app):
+    app.extensions['event_feed'].stop()
+    ingest_queue = app.extensions.pop('ingest_queue', None)
+    if ingest_queue:
+        ingest_queue.stop()
+
+def init_worker(app):
+    """Prepare a freshly forked worker process.
+
+    Connections inherited from the parent must not be used by the child:
+    dispose(close=False) drops them from this process's pool without closing
+    the parent's sockets.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    start_background_workers(app)
+
+def event_last_modified(events):
+    timestamps = [t for event in events for t in (event.started_at, event.completed_at) if t]
+    return max(timestamps) if timestamps else None
+
+def cached_response(key, build):
+    """Serve build(layout)'s (payload, headers, last_modified) from the response cache.
+
+    The body is encoded in the format the client negotiated (see
+    serialization.negotiate) and compressed variants are kept alongside it, so
+    repeated polls cost neither serialization nor compression. The response
+    carries an ETag and Last-Modified, so a client that already has the
+    current version gets a 304 without a body.
+    """
+    mimetype, layout = negotiate(request)
+    key = key + (mimetype, layout)
+    cache = current_app.extensions['response_cache']
+    entry, version = cache.get(key)
+    if entry is None:
+        payload, headers, last_modified = build(layout)
+        body = encode(payload, mimetype)
+        entry = (body, hashlib.md5(body).hexdigest(), last_modified, headers, {})
+        cache.put(key, entry, version)
+    
+    body, etag, last_modified, headers, compressed = entry
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding and len(body) >= current_app.config['COMPRESS_MIN_SIZE']:
+        if encoding not in compressed:
+            compressed[encoding] = compress(body, encoding)
+        body = compressed[encoding]
+        headers = dict(headers, **{'Content-Encoding': encoding})
+    
+    response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag, weak='Content-Encoding' in headers)
+    response.last_modified = last_modified
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Accept')
+    # Let clients keep a copy but revalidate it on every poll
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def queue_full_response(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def flush_if_queued(event_ids):
+    """Write queued events before completing them; False if that failed."""
+    ingest_queue = current_app.extensions.get('ingest_queue')
+    if ingest_queue and any(ingest_queue.is_pending(event_id) for event_id in event_ids):
+        return ingest_queue.flush()
+    return True
+
+@api.route('/api/events', methods=['POST'])
 def create_event():
-    data = request.json
+    data = request_data(request)
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    required_fields = ['robot_type', 'world_type']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+    # Validate before queueing, so a row the writer would reject never gets a 202
+    row, error = validate_event(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    event = SimulationEvent(
-        robot_type=data['robot_type'],
-        world_type=data['world_type'],
-        disaster_type=data.get('disaster_type')
-    )
+    ingest_queue = current_app.extensions.get('ingest_queue')
+    if ingest_queue:
+        try:
+            row, = ingest_queue.submit([row])
+        except QueueFull as e:
+            return queue_full_response(e)
+        return jsonify(queued_event_dict(row)), 202
+    
+    begin_write(db.session)
+    event = SimulationEvent(**row)
     
     db.session.add(event)
+    stats.record_created([event])
+    # The feed notification needs the id
+    db.session.flush()
+    current_app.extensions['event_feed'].announce('created', [event])
     db.session.commit()
+    current_app.extensions['response_cache'].invalidate_events()
     
     return jsonify(event.to_dict()), 201
 
-@app.route('/api/events/<int:event_id>/complete', methods=['POST'])
+@api.route('/api/events/<int:event_id>/complete', methods=['POST'])
 def complete_event(event_id):
-    data = request.json
+    data = request_data(request)
     
     if not data or 'resolution_time_seconds' not in data:
         return jsonify({'error': 'Resolution time required'}), 400
+    resolution_time, error = validate_resolution_time(data['resolution_time_seconds'])
+    if error:
+        return jsonify({'error': error}), 400
     
-    event = SimulationEvent.query.get(event_id)
+    if not flush_if_queued([event_id]):
+        return jsonify({'error': 'Event is queued and could not be written yet'}), 503
+    
+    begin_write(db.session)
+    event = db.session.get(SimulationEvent, event_id, with_for_update=True)
     if not event:
         return jsonify({'error': 'Event not found'}), 404
     
-    event.complete(data['resolution_time_seconds'])
+    previous = event.resolution_time_seconds if event.completed else None
+    event.complete(resolution_time)
+    stats.record_completed([event], {event.id: previous})
+    current_app.extensions['event_feed'].announce('completed', [event])
     db.session.commit()
+    current_app.extensions['response_cache'].invalidate_events([event.id])
     
     return jsonify(event.to_dict())
 
-@app.route('/api/events', methods=['GET'])
+def get_batch_items(data, key):
+    # Accept either a bare JSON array or {"<key>": [...]}
+    if isinstance(data, dict):
+        data = data.get(key)
+    if not isinstance(data, list) or not data:
+        return None, (jsonify({'error': f'Expected a non-empty list of {key}'}), 400)
+    if len(data) > current_app.config['MAX_BATCH_SIZE']:
+        return None, (jsonify({'error': f"Batch larger than {current_app.config['MAX_BATCH_SIZE']} items"}), 413)
+    return data, None
+
+@api.route('/api/events/batch', methods=['POST'])
+def create_events_batch():
+    items, error_response = get_batch_items(request_data(request), 'events')
+    if error_response:
+        return error_response
+    
+    rows, indexes, errors = [], [], []
+    for index, item in enumerate(items):
+        row, error = validate_event(item)
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            rows.append(row)
+            indexes.append(index)
+    
+    ingest_queue = current_app.extensions.get('ingest_queue')
+    if ingest_queue and rows:
+        try:
+            queued = ingest_queue.submit(rows)
+        except QueueFull as e:
+            return queue_full_response(e)
+        created = [dict(queued_event_dict(row), index=index) for index, row in zip(indexes, queued)]
+        return jsonify({'created': created, 'errors': errors}), 202
+    
+    begin_write(db.session)
+    events = insert_events(rows)
+    stats.record_created(events)
+    current_app.extensions['event_feed'].announce('created', events)
+    db.session.commit()
+    current_app.extensions['response_cache'].invalidate_events()
+    
+    created = [dict(event.to_dict(), index=index) for index, event in zip(indexes, events)]
+    return jsonify({'created': created, 'errors': errors}), 201 if created else 400
+
+@api.route('/api/events/complete/batch', methods=['POST'])
+def complete_events_batch():
+    items, error_response = get_batch_items(request_data(request), 'completions')
+    if error_response:
+        return error_response
+    
+    completions, indexes, errors = [], {}, []
+    for index, item in enumerate(items):
+        completion, error = validate_completion(item)
+        if not error and completion[0] in indexes:
+            error = 'Duplicate event id in batch'
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            completions.append(completion)
+            indexes[completion[0]] = index
+    
+    if not flush_if_queued(indexes):
+        return jsonify({'error': 'Some events are queued and could not be written yet'}), 503
+    
+    begin_write(db.session)
+    previous = stats.previous_resolutions(indexes)
+    events = complete_events(completions)
+    stats.record_completed(events.values(), previous)
+    current_app.extensions['event_feed'].announce('completed', events.values())
+    db.session.commit()
+    current_app.extensions['response_cache'].invalidate_events(events)
+    
+    completed = []
+    for event_id, index in indexes.items():
+        if event_id in events:
+            completed.append(dict(events[event_id].to_dict(), index=index))
+        else:
+            errors.append({'index': index, 'error': 'Event not found'})
+    errors.sort(key=lambda error: error['index'])
+    
+    return jsonify({'completed': completed, 'errors': errors}), 200 if completed else 400
+
+@api.after_request
+def compress_api_response(response):
+    return compress_response(response, request.accept_encodings, current_app.config['COMPRESS_MIN_SIZE'])
+
+@api.route('/api/events', methods=['GET'])
 def get_events():
-    events = SimulationEvent.query.all()
-    return jsonify([event.to_dict() for event in events])
+    def build(layout):
+        # Plain column rows: no ORM objects to build for a read-only page
+        events, next_cursor = paginate_events(
+            request.args,
+            current_app.config['EVENTS_PAGE_SIZE'],
+            current_app.config['EVENTS_MAX_PAGE_SIZE'],
+            EVENT_COLUMNS
+        )
+        
+        # Body stays a plain array so existing clients keep working; the cursor for
+        # the next page travels in headers
+        headers = {}
+        if next_cursor:
+            args = request.args.to_dict()
+            args['cursor'] = next_cursor
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = f'<{url_for("api.get_events", **args)}>; rel="next"'
+        
+        return events_payload(events, layout), headers, event_last_modified(events)
+    
+    try:
+        return cached_response(current_app.extensions['response_cache'].list_key(request.full_path), build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/api/events/export', methods=['GET'])
+def export_events_route():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in CONTENT_TYPES:
+        return jsonify({'error': f"format must be one of {', '.join(CONTENT_TYPES)}"}), 400
+    
+    compress = request.args.get('compress') != 'none' and 'gzip' in request.accept_encodings
+    try:
+        chunks = export_events(request.args, export_format, current_app.config['EXPORT_CHUNK_SIZE'], compress)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = Response(stream_with_context(chunks), mimetype=CONTENT_TYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=simulation_events.{export_format}'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@api.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    types = request.args.get('types', ','.join(FEED_TYPES)).split(',')
+    if any(kind not in FEED_TYPES for kind in types):
+        return jsonify({'error': f"types must be a subset of {', '.join(FEED_TYPES)}"}), 400
+    filters = {field: request.args[field] for field in ('robot_type', 'world_type', 'disaster_type')
+               if field in request.args}
+    
+    # EventSource sends Last-Event-ID when it reconnects; last_event_id is for other clients
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        position = decode_feed_id(last_event_id) if last_event_id else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    broker = current_app.extensions['event_feed']
+    subscriber = broker.subscribe()
+    if subscriber is None:
+        response = jsonify({'error': 'Too many feed subscribers'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    
+    stream = event_stream(
+        broker, subscriber, position, types, filters,
+        current_app.config['FEED_BACKFILL_LIMIT'],
+        current_app.config['FEED_HEARTBEAT_SECONDS']
+    )
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    # The generator's own cleanup only runs once it has started, which it never
+    # does if the client is gone before the first byte or the request is a HEAD
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-@app.route('/api/events/<int:event_id>', methods=['GET'])
+@api.route('/api/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
-    event = SimulationEvent.query.get(event_id)
-    if not event:
+    # An event accepted with 202 exists as soon as the client has its id
+    if not flush_if_queued([event_id]):
+        return jsonify({'error': 'Event is queued and could not be written yet'}), 503
+    
+    def build(layout):
+        event = db.session.get(SimulationEvent, event_id)
+        if not event:
+            raise LookupError(event_id)
+        return event_payload(event), {}, event_last_modified([event])
+    
+    try:
+        return cached_response(current_app.extensions['response_cache'].event_key(event_id), build)
+    except LookupError:
         return jsonify({'error': 'Event not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/api/events/<int:event_id>/telemetry', methods=['POST'])
+def add_telemetry(event_id):
+    # Either JSON samples or the packed float32 format telemetry.pack_samples() produces
+    if request.mimetype == telemetry.BINARY_CONTENT_TYPE:
+        samples, error = telemetry.parse_binary_samples(request.get_data())
+    else:
+        samples, error = telemetry.parse_samples(request_data(request))
+    if error:
+        return jsonify({'error': error}), 400
+    if len(samples) > current_app.config['TELEMETRY_MAX_SAMPLES']:
+        return jsonify({'error': f"More than {current_app.config['TELEMETRY_MAX_SAMPLES']} samples in one upload"}), 413
     
-    return jsonify(event.to_dict())
+    if not flush_if_queued([event_id]):
+        return jsonify({'error': 'Event is queued and could not be written yet'}), 503
+    begin_write(db.session)
+    if not db.session.get(SimulationEvent, event_id):
+        return jsonify({'error': 'Event not found'}), 404
+    
+    chunks = telemetry.store_samples(event_id, samples, current_app.config['TELEMETRY_CHUNK_SIZE'])
+    db.session.commit()
+    
+    return jsonify({'event_id': event_id, 'samples': len(samples), 'chunks': chunks}), 201
+
+@api.route('/api/events/<int:event_id>/telemetry', methods=['GET'])
+def get_telemetry(event_id):
+    if not db.session.get(SimulationEvent, event_id):
+        return jsonify({'error': 'Event not found'}), 404
+    
+    try:
+        samples, total = telemetry.query_telemetry(event_id, request.args, current_app.config['TELEMETRY_MAX_POINTS'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format') == 'binary':
+        response = Response(telemetry.pack_samples(samples), mimetype=telemetry.BINARY_CONTENT_TYPE)
+        response.headers['X-Telemetry-Fields'] = ','.join(telemetry.FIELDS)
+        response.headers['X-Telemetry-Total'] = str(total)
+        return response
+    
+    return jsonify({
+        'event_id': event_id,
+        'fields': telemetry.FIELDS,
+        'total': total,
+        'count': len(samples),
+        'samples': samples
+    })
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(current_app.extensions['response_cache'].stats())
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    metrics = current_app.extensions['db_metrics'].snapshot()
+    metrics['response_cache'] = current_app.extensions['response_cache'].stats()
+    metrics['event_feed'] = current_app.extensions['event_feed'].status()
+    if 'ingest_queue' in current_app.extensions:
+        metrics['ingest_queue'] = current_app.extensions['ingest_queue'].status()
+    return jsonify(metrics)
+
+@api.route('/api/stats', methods=['GET'])
+def get_stats():
+    group_by = request.args.get('group_by', ','.join(stats.GROUP_FIELDS)).split(',')
+    if any(field not in stats.GROUP_FIELDS for field in group_by):
+        return jsonify({'error': f"group_by must be a subset of {', '.join(stats.GROUP_FIELDS)}"}), 400
+    
+    try:
+        percentiles = [float(q) for q in request.args.get('percentiles', '50,90,95,99').split(',')]
+    except ValueError:
+        return jsonify({'error': 'percentiles must be a comma separated list of numbers'}), 400
+    if any(not 0 <= q <= 100 for q in percentiles):
+        return jsonify({'error': 'percentiles must be between 0 and 100'}), 400
+    
+    return jsonify(stats.query_stats(request.args, group_by, percentiles))
+
+@api.route('/api/stats/archive', methods=['GET'])
+def get_archived_stats():
+    group_by = request.args.get('group_by', 'month').split(',')
+    if any(field not in stats.ARCHIVE_GROUP_FIELDS for field in group_by):
+        return jsonify({'error': f"group_by must be a subset of {', '.join(stats.ARCHIVE_GROUP_FIELDS)}"}), 400
+    
+    try:
+        percentiles = [float(q) for q in request.args.get('percentiles', '50,90,95,99').split(',')]
+    except ValueError:
+        return jsonify({'error': 'percentiles must be a comma separated list of numbers'}), 400
+    if any(not 0 <= q <= 100 for q in percentiles):
+        return jsonify({'error': 'percentiles must be between 0 and 100'}), 400
+    
+    try:
+        return jsonify(stats.query_archived_stats(request.args, group_by, percentiles))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute simulation_event_stats from simulation_events."""
+    begin_write(db.session)
+    stats.rebuild_stats()
+    print('Statistics rebuilt.')
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
-    app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,295 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from models import db, SimulationEvent, TelemetryChunk, ArchivedEventStats
+from serialization import EVENT_COLUMNS
+from sqlite_backend import begin_write
+import partitions
+import stats
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, see requirements.txt
+    pyarrow = None
+
+TELEMETRY_COLUMNS = (TelemetryChunk.event_id, TelemetryChunk.t_start, TelemetryChunk.t_end,
+                     TelemetryChunk.sample_count, TelemetryChunk.data, TelemetryChunk.created_at)
+
+# Ids per IN (...) list; SQLite allows at most 32766 bound parameters per statement
+ID_SLICE = 1000
+
+def event_schema():
+    return pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('robot_type', pyarrow.string()),
+        ('world_type', pyarrow.string()),
+        ('disaster_type', pyarrow.string()),
+        ('resolution_time_seconds', pyarrow.float64()),
+        ('completed', pyarrow.bool_()),
+        ('started_at', pyarrow.timestamp('us')),
+        ('completed_at', pyarrow.timestamp('us')),
+    ])
+
+def telemetry_schema():
+    # data stays in the telemetry.encode_chunk() format, decode with telemetry.decode_chunk()
+    return pyarrow.schema([
+        ('event_id', pyarrow.int64()),
+        ('t_start', pyarrow.float64()),
+        ('t_end', pyarrow.float64()),
+        ('sample_count', pyarrow.int32()),
+        ('data', pyarrow.binary()),
+        ('created_at', pyarrow.timestamp('us')),
+    ])
+
+def write_parquet(path, rows, schema):
+    """Write rows, tuples in schema order, to path as one zstd compressed Parquet file."""
+    columns = list(zip(*rows))
+    table = pyarrow.Table.from_arrays(
+        [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pyarrow.parquet.write_table(table, path, compression='zstd')
+    # On disk before the deletes commit, so a power cut cannot lose both copies
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+def sync_directory(path):
+    if hasattr(os, 'O_DIRECTORY'):  # not on Windows
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def promote(temporary, final):
+    os.replace(temporary, final)
+    sync_directory(os.path.dirname(final))
+
+def archive_path(archive_dir, table, month, ids):
+    # Hive style month=YYYY-MM directories, which pyarrow.dataset, DuckDB and
+    # Spark read back as a month column
+    return os.path.join(archive_dir, table, f'month={month:%Y-%m}', f'part-{min(ids)}-{max(ids)}.parquet')
+
+def recover_temporary(archive_dir):
+    """Finish or undo batches a crash interrupted; returns (promoted, removed) file counts.
+
+    A .tmp events file whose ids are all gone from the database belongs to a
+    batch whose deletes committed, so it and its telemetry file are renamed
+    to their final names. Otherwise the batch rolled back and the files go.
+    """
+    promoted = removed = 0
+    pattern = os.path.join(archive_dir, 'simulation_events', 'month=*', '*.parquet.tmp')
+    for temporary in sorted(glob.glob(pattern)):
+        try:
+            ids = pyarrow.parquet.read_table(temporary, columns=['id']).column('id').to_pylist()
+        except (OSError, pyarrow.ArrowException):
+            # Torn by a crash while writing, so its batch never committed
+            ids = None
+        committed = ids is not None and not any(
+            db.session.execute(db.select(SimulationEvent.id).where(SimulationEvent.id.in_(id_slice)).limit(1)).first()
+            for id_slice in slices(ids)
+        )
+        telemetry = os.path.join(archive_dir, 'telemetry_chunks',
+                                 os.path.relpath(temporary, os.path.join(archive_dir, 'simulation_events')))
+        for path in (temporary, telemetry):
+            if not os.path.exists(path):
+                continue
+            if committed:
+                promote(path, path[:-len('.tmp')])
+                promoted += 1
+            else:
+                os.remove(path)
+                removed += 1
+    # Telemetry files whose events file was already promoted before the crash
+    pattern = os.path.join(archive_dir, 'telemetry_chunks', 'month=*', '*.parquet.tmp')
+    for temporary in sorted(glob.glob(pattern)):
+        events = os.path.join(archive_dir, 'simulation_events',
+                              os.path.relpath(temporary[:-len('.tmp')], os.path.join(archive_dir, 'telemetry_chunks')))
+        if os.path.exists(events):
+            promote(temporary, temporary[:-len('.tmp')])
+            promoted += 1
+        else:
+            os.remove(temporary)
+            removed += 1
+    return promoted, removed
+
+def slices(ids):
+    for i in range(0, len(ids), ID_SLICE):
+        yield ids[i:i + ID_SLICE]
+
+def archivable(cutoff):
+    return db.select(*EVENT_COLUMNS).where(
+        SimulationEvent.completed.is_(True), SimulationEvent.started_at < cutoff
+    )
+
+def record_archived(month, rows):
+    """Fold archived events into their month's archived_event_stats rows."""
+    by_group = defaultdict(list)
+    for row in rows:
+        by_group[stats.group_key(row)].append(row)
+
+    for key, group in by_group.items():
+        summary = db.session.get(ArchivedEventStats, (month.date(),) + key)
+        if summary is None:
+            summary = ArchivedEventStats(
+                month=month.date(), event_count=0, completed_count=0, resolution_total=0.0, histogram={},
+                **dict(zip(stats.GROUP_FIELDS, key))
+            )
+            db.session.add(summary)
+        stats.add_to_rollup(summary, len(group), [
+            row.resolution_time_seconds for row in group if row.resolution_time_seconds is not None
+        ])
+
+def archive_month(archive_dir, month, rows):
+    """Write one month's events and their telemetry to Parquet and delete them.
+
+    Runs inside the caller's transaction. Returns the (temporary, final) file
+    paths written and the number of telemetry chunks archived.
+    """
+    ids = [row.id for row in rows]
+    files = []
+
+    path = archive_path(archive_dir, 'simulation_events', month, ids)
+    write_parquet(path + '.tmp', rows, event_schema())
+    files.append((path + '.tmp', path))
+
+    chunks = []
+    for id_slice in slices(ids):
+        chunks.extend(db.session.execute(
+            db.select(*TELEMETRY_COLUMNS).where(TelemetryChunk.event_id.in_(id_slice))
+            .order_by(TelemetryChunk.event_id, TelemetryChunk.t_start)
+        ).all())
+    if chunks:
+        path = archive_path(archive_dir, 'telemetry_chunks', month, ids)
+        write_parquet(path + '.tmp', chunks, telemetry_schema())
+        files.append((path + '.tmp', path))
+
+    record_archived(month, rows)
+    for id_slice in slices(ids):
+        db.session.execute(db.delete(TelemetryChunk).where(TelemetryChunk.event_id.in_(id_slice)))
+        # The started_at range lets PostgreSQL delete from a single partition
+        db.session.execute(db.delete(SimulationEvent).where(
+            SimulationEvent.id.in_(id_slice),
+            SimulationEvent.started_at >= month,
+            SimulationEvent.started_at < partitions.add_months(month, 1),
+        ))
+    return files, len(chunks)
+
+def archive_batch(archive_dir, rows):
+    """Archive rows, grouped by month, in one transaction.
+
+    Files are written and fsynced under a .tmp name and only renamed once
+    the deletes have committed. If anything fails before that, the rows stay
+    in the database and the temporary files are removed, so a rerun never
+    archives an event twice. If the process dies between the commit and the
+    renames, recover_temporary() finishes them on the next run.
+    """
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[partitions.month_floor(row.started_at)].append(row)
+
+    files = []
+    chunk_count = 0
+    try:
+        for month, month_rows in sorted(by_month.items()):
+            month_files, chunks = archive_month(archive_dir, month, month_rows)
+            files.extend(month_files)
+            chunk_count += chunks
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        for temporary, _ in files:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        raise
+
+    for temporary, final in files:
+        promote(temporary, final)
+    return [final for _, final in files], chunk_count
+
+def archive_events(archive_dir, cutoff, batch_size=50000, progress=True):
+    """Move completed events that started before cutoff into Parquet files.
+
+    Returns (events archived, telemetry chunks archived, files written).
+    """
+    if pyarrow is None:
+        raise RuntimeError('pyarrow is required to write Parquet archives: pip install pyarrow')
+
+    promoted, removed = recover_temporary(archive_dir)
+    if progress and (promoted or removed):
+        print(f"  Recovered an interrupted run: {promoted} files completed, {removed} discarded")
+    events = chunks = 0
+    files = []
+    started = time.perf_counter()
+    while True:
+        # Every batch removes its rows, so the next one starts from the top again
+        begin_write(db.session)
+        rows = db.session.execute(
+            archivable(cutoff).order_by(SimulationEvent.started_at, SimulationEvent.id)
+            .limit(batch_size).with_for_update()
+        ).all()
+        if not rows:
+            db.session.rollback()
+            break
+        batch_files, batch_chunks = archive_batch(archive_dir, rows)
+        events += len(rows)
+        chunks += batch_chunks
+        files.extend(batch_files)
+        if progress:
+            print(f"  {events} events archived ({events / (time.perf_counter() - started):,.0f} rows/s)")
+            sys.stdout.flush()
+    return events, chunks, files
+
+def main():
+    from app import create_app
+
+    parser = argparse.ArgumentParser(
+        description='Move old completed events into Parquet files and maintain the monthly partitions'
+    )
+    parser.add_argument('--older-than-days', type=float,
+                        help='archive completed events that started longer ago (default: ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--archive-dir', help='where to write the Parquet files (default: ARCHIVE_DIR)')
+    parser.add_argument('--batch-size', type=int, help='events per transaction (default: ARCHIVE_BATCH_SIZE)')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be archived')
+    args = parser.parse_args()
+
+    if pyarrow is None and not args.dry_run:
+        parser.error('pyarrow is required to write Parquet archives: pip install pyarrow')
+
+    app = create_app(start_background=False)
+    config = app.config
+    older_than_days = args.older_than_days if args.older_than_days is not None else config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    with app.app_context():
+        if args.dry_run:
+            count, first, last = db.session.execute(
+                archivable(cutoff).with_only_columns(
+                    db.func.count(), db.func.min(SimulationEvent.started_at), db.func.max(SimulationEvent.started_at)
+                )
+            ).one()
+            print(f"{count} completed events started before {cutoff:%Y-%m-%d %H:%M}"
+                  + (f" ({first:%Y-%m-%d} to {last:%Y-%m-%d})" if count else ''))
+            return
+
+        for name in partitions.ensure_partitions(config['PARTITION_MONTHS_AHEAD']):
+            print(f"Created partition {name}")
+
+        start = time.perf_counter()
+        events, chunks, files = archive_events(
+            args.archive_dir or config['ARCHIVE_DIR'], cutoff, args.batch_size or config['ARCHIVE_BATCH_SIZE']
+        )
+        print(f"Archived {events} events and {chunks} telemetry chunks into {len(files)} files "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        for name in partitions.drop_empty_partitions(cutoff):
+            print(f"Dropped empty partition {name}")
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
@@ -0,0 +1,227 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+from loadtest import Client, run_scenarios, ROBOTS, WORLDS, DISASTERS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def random_event():
+    return {
+        'robot_type': random.choice(ROBOTS),
+        'world_type': random.choice(WORLDS),
+        'disaster_type': random.choice(DISASTERS),
+    }
+
+def random_id(state):
+    return random.randint(1, state['max_id'])
+
+def telemetry_samples(count, t0=0.0):
+    return [[t0 + i * 0.1, i * 0.05, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0] for i in range(count)]
+
+# One entry per route in app.py: name -> function(client, state) returning the HTTP status.
+# state holds max_id, newest (ISO start time of the newest event) and telemetry_id.
+
+def list_first_page(client, state):
+    return client.request('GET', '/api/events?limit=100')[0]
+
+def list_filtered(client, state):
+    query = urlencode({'robot_type': random.choice(ROBOTS), 'world_type': random.choice(WORLDS),
+                       'completed': 'true', 'order': 'desc', 'limit': 100})
+    return client.request('GET', f'/api/events?{query}')[0]
+
+def list_time_range(client, state):
+    # A page starting at a random point of the last 30 days, i.e. deep into the table
+    started_after = datetime.fromisoformat(state['newest']) - timedelta(days=random.uniform(0, 30))
+    return client.request('GET', f'/api/events?limit=100&started_after={started_after.isoformat()}')[0]
+
+def get_event(client, state):
+    return client.request('GET', f'/api/events/{random_id(state)}')[0]
+
+def export_recent(client, state):
+    started_after = datetime.fromisoformat(state['newest']) - timedelta(hours=1)
+    return client.request('GET', f'/api/events/export?format=ndjson&compress=none'
+                                 f'&started_after={started_after.isoformat()}')[0]
+
+def get_stats(client, state):
+    return client.request('GET', '/api/stats?group_by=robot_type,disaster_type')[0]
+
+def get_cache_stats(client, state):
+    return client.request('GET', '/api/cache/stats')[0]
+
+def get_metrics(client, state):
+    return client.request('GET', '/api/metrics')[0]
+
+def create_event(client, state):
+    return client.request('POST', '/api/events', random_event())[0]
+
+def complete_event(client, state):
+    return client.request('POST', f'/api/events/{random_id(state)}/complete',
+                          {'resolution_time_seconds': random.uniform(10, 600)})[0]
+
+def create_batch(client, state):
+    return client.request('POST', '/api/events/batch', [random_event() for _ in range(100)])[0]
+
+def complete_batch(client, state):
+    ids = random.sample(range(1, state['max_id'] + 1), min(100, state['max_id']))
+    return client.request('POST', '/api/events/complete/batch', [
+        {'id': event_id, 'resolution_time_seconds': random.uniform(10, 600)} for event_id in ids
+    ])[0]
+
+def add_telemetry(client, state):
+    state['t'] = state.get('t', 0.0) + 10.0
+    return client.request('POST', f"/api/events/{state['telemetry_id']}/telemetry",
+                          telemetry_samples(100, state['t']))[0]
+
+def get_telemetry(client, state):
+    return client.request('GET', f"/api/events/{state['telemetry_id']}/telemetry?tolerance=0.01")[0]
+
+def stream_connect(client, state):
+    """Open the live feed and wait for its first message, i.e. time to subscribe."""
+    parts = urlsplit(state['url'])
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    try:
+        conn.request('GET', parts.path.rstrip('/') + '/api/events/stream')
+        response = conn.getresponse()
+        if response.status == 200:
+            while response.fp.readline() not in (b'\n', b'\r\n', b''):
+                pass
+        return response.status
+    finally:
+        conn.close()
+
+ROUTES = {
+    'GET /api/events': list_first_page,
+    'GET /api/events (filtered)': list_filtered,
+    'GET /api/events (time range)': list_time_range,
+    'GET /api/events/<id>': get_event,
+    'GET /api/events/export': export_recent,
+    'GET /api/events/stream': stream_connect,
+    'GET /api/events/<id>/telemetry': get_telemetry,
+    'GET /api/stats': get_stats,
+    'GET /api/cache/stats': get_cache_stats,
+    'GET /api/metrics': get_metrics,
+    'POST /api/events': create_event,
+    'POST /api/events/<id>/complete': complete_event,
+    'POST /api/events/batch': create_batch,
+    'POST /api/events/complete/batch': complete_batch,
+    'POST /api/events/<id>/telemetry': add_telemetry,
+}
+
+# A closed feed connection keeps its server thread until the next heartbeat,
+# so hammering the stream starves every route measured after it; run it on
+# its own with --routes
+DEFAULT_ROUTES = [name for name in ROUTES if name != 'GET /api/events/stream']
+
+def table_size():
+    from models import db, SimulationEvent
+    return db.session.execute(db.select(db.func.count(SimulationEvent.id))).scalar()
+
+def grow_table(app, size, generator, batch_size):
+    """Add generated events until the table holds at least size rows; returns the row count."""
+    from generate_data import load_events
+    with app.app_context():
+        missing = size - table_size()
+        if missing > 0:
+            print(f"Loading {missing} events to reach {size}...")
+            load_events(missing, generator, batch_size=batch_size)
+        return table_size()
+
+def prepare_state(url):
+    """Look up the ids and times the scenarios need, and give one event some telemetry."""
+    client = Client(url)
+    status, body = client.request('GET', '/api/events?order=desc&limit=1')
+    newest = json.loads(body)
+    if status != 200 or not newest:
+        raise RuntimeError(f'Could not read events from {url} (status {status})')
+    state = {'url': url, 'max_id': newest[0]['id'], 'newest': newest[0]['started_at'],
+             'telemetry_id': newest[0]['id']}
+    client.request('POST', f"/api/events/{state['telemetry_id']}/telemetry", telemetry_samples(2000))
+    return state
+
+def wait_for_server(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url.rstrip('/') + '/api/cache/stats', timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f'Server at {url} did not start within {timeout}s')
+
+def start_server(url):
+    """Start serve.py bound to url's port, as the production setup would run it."""
+    env = dict(os.environ, API_BIND=f'0.0.0.0:{urlsplit(url).port or 80}')
+    server = subprocess.Popen([sys.executable, 'serve.py'], cwd=HERE, env=env)
+    wait_for_server(url)
+    return server
+
+def main():
+    from app import create_app
+    from generate_data import add_generator_arguments, make_generator
+
+    parser = argparse.ArgumentParser(
+        description='Throughput and latency of every API route at several table sizes and concurrency levels'
+    )
+    parser.add_argument('--url', default='http://localhost:5000', help='base URL of the API under test')
+    parser.add_argument('--serve', action='store_true', help='start serve.py on the --url port for the run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='table sizes to test at; the table is grown with generated events as needed')
+    parser.add_argument('--no-load', action='store_true', help='test the table as it is, do not add events')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5, help='seconds per route and concurrency level')
+    parser.add_argument('--routes', nargs='+', choices=list(ROUTES), metavar='ROUTE',
+                        help='only these routes (default: all but GET /api/events/stream)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    routes = {name: ROUTES[name] for name in (args.routes or DEFAULT_ROUTES)}
+    app = create_app(start_background=False)
+    generator = make_generator(args)
+    server = start_server(args.url) if args.serve else None
+
+    results = []
+    try:
+        wait_for_server(args.url)
+        sizes = [None] if args.no_load else sorted(args.sizes)
+        for size in sizes:
+            rows = size if args.no_load else grow_table(app, size, generator, args.batch_size)
+            state = prepare_state(args.url)
+            if not args.json:
+                print(f"\n== {rows if rows is not None else 'existing'} events ==")
+            for name, scenario in routes.items():
+                for concurrency in args.concurrency:
+                    result = run_scenarios(args.url, [(scenario, 1)], concurrency, args.duration, state)
+                    result.update(route=name, table_size=rows)
+                    results.append(result)
+                    if not args.json:
+                        latency = result['latency_ms']
+                        if not result['requests']:
+                            print(f"{name:<34} c={concurrency:<4} no requests completed")
+                            continue
+                        print(f"{name:<34} c={concurrency:<4} {result['requests_per_second']:9.1f} req/s   "
+                              f"p50 {latency['p50']:8.2f} ms   p95 {latency['p95']:8.2f} ms   "
+                              f"p99 {latency['p99']:8.2f} ms   errors {result['errors']}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
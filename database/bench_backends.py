@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from app import create_app, stop_background_workers
+from bootstrap import bootstrap
+from config import get_config, masked_uri
+from generate_data import EventGenerator, DEFAULTS, load_events
+from models import db, SimulationEvent, SimulationEventStats, ArchivedEventStats, TelemetryChunk
+from sqlite_backend import begin_write
+
+ROBOTS = ['TurtleBot3', 'CustomRobot']
+WORLDS = ['Warehouse', 'Office', 'Apartment']
+DISASTERS = [None, 'Fire', 'Flood']
+
+def backend_config(uri, ingest_mode, spill_dir):
+    config = get_config()
+    config.SQLALCHEMY_DATABASE_URI = uri
+    config.INGEST_MODE = ingest_mode
+    config.INGEST_SPILL_DIR = spill_dir
+    # Measure the database, not the response cache or the slow query EXPLAINs
+    config.RESPONSE_CACHE_SIZE = 0
+    config.EXPLAIN_SLOW_QUERIES = False
+    config.DEBUG = False
+    return config
+
+def empty_tables(app):
+    with app.app_context():
+        begin_write(db.session)
+        for model in (TelemetryChunk, SimulationEventStats, ArchivedEventStats, SimulationEvent):
+            db.session.execute(db.delete(model))
+        db.session.commit()
+
+def random_event():
+    return {'robot_type': random.choice(ROBOTS), 'world_type': random.choice(WORLDS),
+            'disaster_type': random.choice(DISASTERS)}
+
+def timed_requests(app, count, request, threads=1):
+    """Run request(client, i) count times over threads clients; returns throughput and latency."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(indexes):
+        client = app.test_client()
+        local, failed = [], 0
+        for i in indexes:
+            start = time.perf_counter()
+            status = request(client, i)
+            local.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    workers = [threading.Thread(target=worker, args=(range(t, count, threads),)) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'operations': count,
+        'threads': threads,
+        'per_second': round(count / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(latencies[int(0.99 * (len(latencies) - 1))], 3),
+        'errors': sum(errors),
+    }
+
+def bench_backend(name, uri, args, spill_dir):
+    """Bulk load, then time every ingest and query path of the API against uri."""
+    print(f"\n== {name}: {masked_uri(uri)} ==")
+    sys.stdout.flush()
+    app = create_app(backend_config(uri, 'sync', spill_dir), start_background=False)
+    bootstrap(app, seed=False)
+    empty_tables(app)
+    app.extensions['event_feed'].start()
+    results = {}
+
+    generator = EventGenerator(DEFAULTS['robots'], DEFAULTS['worlds'], DEFAULTS['disasters'],
+                               DEFAULTS['resolution_median'], seed=42)
+    with app.app_context():
+        start = time.perf_counter()
+        load_events(args.rows, generator, days=30, batch_size=args.batch_size, progress=False)
+        elapsed = time.perf_counter() - start
+        max_id = db.session.execute(db.select(db.func.max(SimulationEvent.id))).scalar()
+        newest = db.session.execute(db.select(db.func.max(SimulationEvent.started_at))).scalar()
+    results['bulk load'] = {'operations': args.rows, 'per_second': round(args.rows / elapsed, 1)}
+
+    def create(client, i):
+        return client.post('/api/events', json=random_event()).status_code
+
+    def create_batch(client, i):
+        return client.post('/api/events/batch', json=[random_event() for _ in range(100)]).status_code
+
+    def complete(client, i):
+        return client.post(f'/api/events/{random.randint(1, max_id)}/complete',
+                           json={'resolution_time_seconds': random.uniform(10, 600)}).status_code
+
+    def list_page(client, i):
+        return client.get('/api/events?limit=100').status_code
+
+    def list_filtered(client, i):
+        query = urlencode({'robot_type': random.choice(ROBOTS), 'world_type': random.choice(WORLDS),
+                           'completed': 'true', 'order': 'desc', 'limit': 100})
+        return client.get(f'/api/events?{query}').status_code
+
+    def list_time_range(client, i):
+        started_after = newest - timedelta(days=random.uniform(0, 30))
+        return client.get(f'/api/events?limit=100&started_after={started_after.isoformat()}').status_code
+
+    def get_event(client, i):
+        return client.get(f'/api/events/{random.randint(1, max_id)}').status_code
+
+    def get_stats(client, i):
+        return client.get('/api/stats?group_by=robot_type,disaster_type').status_code
+
+    n = args.requests
+    results['create (1 per commit)'] = timed_requests(app, n, create)
+    results['create batch of 100'] = timed_requests(app, max(n // 20, 1), create_batch)
+    results['complete'] = timed_requests(app, n, complete)
+    results[f'complete, {args.threads} threads'] = timed_requests(app, n, complete, args.threads)
+    for label, request in (('list first page', list_page), ('list filtered', list_filtered),
+                           ('list time range', list_time_range), ('get by id', get_event),
+                           ('stats', get_stats)):
+        results[label] = timed_requests(app, n, request)
+        results[f'{label}, {args.threads} threads'] = timed_requests(app, n, request, args.threads)
+    stop_background_workers(app)
+
+    # The same creates through the write-behind queue, until they are all committed
+    app = create_app(backend_config(uri, 'async', spill_dir))
+    start = time.perf_counter()
+    accepted = timed_requests(app, n, create, args.threads)
+    app.extensions['ingest_queue'].flush()
+    elapsed = time.perf_counter() - start
+    results[f'create, async ingest, {args.threads} threads'] = dict(accepted, per_second=round(n / elapsed, 1))
+    stop_background_workers(app)
+
+    for label, result in results.items():
+        line = f"{label:<34} {result['per_second']:>10.1f}/s"
+        if 'p50_ms' in result:
+            line += f"   p50 {result['p50_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms   errors {result['errors']}"
+        print(line)
+    sys.stdout.flush()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ingest and query throughput of the SQLite and PostgreSQL backends')
+    parser.add_argument('--backends', nargs='+', choices=['sqlite', 'postgresql'], default=['sqlite', 'postgresql'])
+    parser.add_argument('--sqlite-path', help='database file to benchmark (default: a temporary file)')
+    parser.add_argument('--postgres-url',
+                        help='PostgreSQL database to benchmark; its tables are EMPTIED. Skipped if not given')
+    parser.add_argument('--rows', type=int, default=100000, help='events bulk loaded before the request tests')
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per test')
+    parser.add_argument('--threads', type=int, default=8, help='threads for the concurrent tests')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_backends_')
+    backends = []
+    if 'sqlite' in args.backends:
+        backends.append(('sqlite', f"sqlite:///{args.sqlite_path or os.path.join(workdir, 'bench.db')}"))
+    if 'postgresql' in args.backends:
+        if args.postgres_url:
+            backends.append(('postgresql', args.postgres_url))
+        else:
+            print("No --postgres-url given, skipping PostgreSQL")
+
+    results = {}
+    try:
+        for name, uri in backends:
+            random.seed(42)
+            results[name] = bench_backend(name, uri, args, os.path.join(workdir, f'spill-{name}'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({'rows': args.rows, 'at': datetime.utcnow().isoformat(), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
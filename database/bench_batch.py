@@ -0,0 +1,81 @@
+import argparse
+import random
+import sys
+import time
+from app import create_app, db
+
+ROBOTS = ['TurtleBot3', 'CustomRobot']
+WORLDS = ['Warehouse', 'Office', 'Apartment']
+DISASTERS = [None, 'Fire', 'Flood']
+
+def make_events(count):
+    return [
+        {
+            'robot_type': random.choice(ROBOTS),
+            'world_type': random.choice(WORLDS),
+            'disaster_type': random.choice(DISASTERS)
+        }
+        for _ in range(count)
+    ]
+
+def bench_single(client, events):
+    start = time.perf_counter()
+    ids = []
+    for event in events:
+        response = client.post('/api/events', json=event)
+        ids.append(response.json['id'])
+    created = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for event_id in ids:
+        client.post(f'/api/events/{event_id}/complete', json={'resolution_time_seconds': random.uniform(10, 600)})
+    completed = time.perf_counter() - start
+    return created, completed
+
+def bench_batch(client, events, batch_size):
+    start = time.perf_counter()
+    ids = []
+    for i in range(0, len(events), batch_size):
+        response = client.post('/api/events/batch', json=events[i:i + batch_size])
+        ids.extend(event['id'] for event in response.json['created'])
+    created = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        completions = [
+            {'id': event_id, 'resolution_time_seconds': random.uniform(10, 600)}
+            for event_id in ids[i:i + batch_size]
+        ]
+        client.post('/api/events/complete/batch', json=completions)
+    completed = time.perf_counter() - start
+    return created, completed
+
+def report(label, count, created, completed):
+    print(f"{label:<24} create: {created:8.3f}s ({count / created:9.1f} events/s)   "
+          f"complete: {completed:8.3f}s ({count / completed:9.1f} events/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare single-event and batch ingestion routes')
+    parser.add_argument('--count', type=int, default=2000, help='events to create and complete per run')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"Benchmarking against {db.engine.url.render_as_string(hide_password=True)}")
+        db.create_all()
+
+    events = make_events(args.count)
+    client = app.test_client()
+
+    created, completed = bench_single(client, events)
+    report('single-event routes', args.count, created, completed)
+
+    created_batch, completed_batch = bench_batch(client, events, args.batch_size)
+    report(f'batch routes (x{args.batch_size})', args.count, created_batch, completed_batch)
+
+    print(f"Speed-up: create {created / created_batch:.1f}x, complete {completed / completed_batch:.1f}x")
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from flask import jsonify
+from app import create_app
+from models import db, SimulationEvent
+from serialization import EVENT_COLUMNS, JSON_MIMETYPE, MSGPACK_MIMETYPE, encode, events_payload, msgpack
+from compression import compress, supported_encodings
+
+ROBOTS = ['TurtleBot3', 'CustomRobot']
+WORLDS = ['Warehouse', 'Office', 'Apartment']
+DISASTERS = [None, 'Fire', 'Flood']
+
+def make_events(count):
+    """Detached events shaped like real rows; no database needed."""
+    start = datetime(2026, 1, 1)
+    events = []
+    for i in range(count):
+        event = SimulationEvent(random.choice(ROBOTS), random.choice(WORLDS), random.choice(DISASTERS))
+        event.id = i + 1
+        event.started_at = start + timedelta(seconds=i * 7.3)
+        if random.random() < 0.7:
+            event.completed = True
+            event.resolution_time_seconds = random.uniform(10, 600)
+            event.completed_at = event.started_at + timedelta(seconds=event.resolution_time_seconds)
+        events.append(event)
+    return events
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings) * 1000
+
+def bench_fetch(count, repeat):
+    """Time reading count events from the database as ORM objects and as plain rows."""
+    def fetch_objects():
+        events = SimulationEvent.query.order_by(SimulationEvent.id).limit(count).all()
+        body = encode(events_payload(events), JSON_MIMETYPE)
+        db.session.expunge_all()
+        return events, body
+
+    def fetch_rows():
+        rows = SimulationEvent.query.with_entities(*EVENT_COLUMNS).order_by(SimulationEvent.id).limit(count).all()
+        return rows, encode(events_payload(rows), JSON_MIMETYPE)
+
+    results = []
+    for label, fetch in (('ORM objects', fetch_objects), ('column rows', fetch_rows)):
+        (rows, _), total_ms = timed(fetch, repeat)
+        results.append({'fetch': label, 'rows': len(rows), 'fetch_and_serialize_ms': round(total_ms, 2)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare serialization cost and response size of the event list formats')
+    parser.add_argument('--count', type=int, default=10000, help='events per payload')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (median is reported)')
+    parser.add_argument('--database', action='store_true',
+                        help='also time fetching events from the configured database as ORM objects vs rows')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    app = create_app(start_background=False)
+    # jsonify() indents in debug mode, which is not what production serves
+    app.debug = False
+    events = make_events(args.count)
+
+    variants = {
+        'to_dict + jsonify': lambda: jsonify([event.to_dict() for event in events]).get_data(),
+        'json records': lambda: encode(events_payload(events, 'records'), JSON_MIMETYPE),
+        'json columnar': lambda: encode(events_payload(events, 'columnar'), JSON_MIMETYPE),
+    }
+    if msgpack:
+        variants['msgpack records'] = lambda: encode(events_payload(events, 'records'), MSGPACK_MIMETYPE)
+        variants['msgpack columnar'] = lambda: encode(events_payload(events, 'columnar'), MSGPACK_MIMETYPE)
+
+    results = []
+    with app.test_request_context():
+        for label, serialize in variants.items():
+            body, serialize_ms = timed(serialize, args.repeat)
+            result = {'format': label, 'serialize_ms': round(serialize_ms, 2), 'bytes': len(body)}
+            for encoding in supported_encodings():
+                compressed, compress_ms = timed(lambda: compress(body, encoding), args.repeat)
+                result[f'{encoding}_bytes'] = len(compressed)
+                result[f'{encoding}_ms'] = round(compress_ms, 2)
+            results.append(result)
+
+    fetch_results = []
+    if args.database:
+        with app.app_context():
+            fetch_results = bench_fetch(args.count, args.repeat)
+
+    if args.json:
+        print(json.dumps({'serialization': results, 'fetch': fetch_results}, indent=2))
+        return
+
+    print(f"{args.count} events, median of {args.repeat} runs")
+    header = f"{'format':<20} {'serialize':>10} {'bytes':>10}"
+    for encoding in supported_encodings():
+        header += f" {encoding + ' bytes':>12} {encoding + ' ms':>9}"
+    print(header)
+    for result in results:
+        line = f"{result['format']:<20} {result['serialize_ms']:>8.2f}ms {result['bytes']:>10}"
+        for encoding in supported_encodings():
+            line += f" {result[f'{encoding}_bytes']:>12} {result[f'{encoding}_ms']:>7.2f}ms"
+        print(line)
+    if not msgpack:
+        print("msgpack is not installed; MessagePack formats skipped")
+    for result in fetch_results:
+        print(f"fetch {result['rows']} events as {result['fetch']:<12} + JSON: {result['fetch_and_serialize_ms']:8.2f}ms")
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
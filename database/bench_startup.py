@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Each stage runs in a fresh interpreter so module caches do not hide import cost
+STAGES = {
+    'import config': 'import config',
+    'import app': 'import app',
+    'create_app()': 'from app import create_app; create_app(start_background=False)',
+    'bootstrap (no changes)': (
+        'from app import create_app; from bootstrap import bootstrap; '
+        'bootstrap(create_app(start_background=False))'
+    ),
+}
+
+TIMER = '''
+import time
+start = time.perf_counter()
+{code}
+print('STARTUP_SECONDS', time.perf_counter() - start)
+'''
+
+def time_stage(code):
+    """Return (in-process seconds, wall-clock seconds including interpreter start)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', TIMER.format(code=code)],
+        cwd=HERE, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+    for line in result.stdout.splitlines():
+        if line.startswith('STARTUP_SECONDS'):
+            return float(line.split()[1]), wall
+    raise RuntimeError(f'no timing in output: {result.stdout!r} {result.stderr!r}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API process start-up time')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per stage')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    # Make sure the bootstrap stage measures the "nothing changed" path
+    subprocess.run([sys.executable, 'bootstrap.py'], cwd=HERE, capture_output=True, check=True)
+
+    results = []
+    for label, code in STAGES.items():
+        timings = [time_stage(code) for _ in range(args.runs)]
+        result = {
+            'stage': label,
+            'runs': args.runs,
+            'median_ms': round(statistics.median(t[0] for t in timings) * 1000, 1),
+            'median_wall_ms': round(statistics.median(t[1] for t in timings) * 1000, 1),
+        }
+        results.append(result)
+        if not args.json:
+            print(f"{label:<24} {result['median_ms']:8.1f} ms   "
+                  f"(process wall {result['median_wall_ms']:8.1f} ms)")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import glob
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, SimulationEvent
+from config import masked_uri
+import partitions
+import stats
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# First revision of the chain; its simulation_events table is the one the
+# original models (and the revisions fix_migrations.py used to autogenerate) had
+BASELINE_REVISION = '3f1c9a7b2d10'
+
+# Kept out of db.metadata so Alembic autogenerate never tries to manage it
+bootstrap_metadata = MetaData()
+schema_bootstrap = Table(
+    'schema_bootstrap', bootstrap_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('revision', String(64), nullable=False),
+    Column('checksum', String(64), nullable=False),
+    Column('bootstrapped_at', DateTime, nullable=False),
+)
+
+def head_revision():
+    from alembic.script import ScriptDirectory
+    heads = ScriptDirectory(MIGRATIONS_DIR).get_heads()
+    if len(heads) != 1:
+        raise RuntimeError(
+            f"migrations/versions has {len(heads)} heads ({', '.join(heads)}). Delete revisions that were "
+            "autogenerated locally (e.g. by an old fix_migrations.py) so one chain is left."
+        )
+    return heads[0]
+
+def adopt_legacy_revision(connection):
+    """Move a database stamped with a revision this tree does not know onto the baseline.
+
+    Installs set up by the old init scripts carry a locally autogenerated
+    revision in alembic_version. Their simulation_events table matches
+    BASELINE_REVISION, and every later migration skips what already exists,
+    so upgrading from there is safe. Returns the revision replaced, if any.
+    """
+    from alembic.script import ScriptDirectory
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    current = connection.execute(text('SELECT version_num FROM alembic_version')).scalars().all()
+    known = {script.revision for script in ScriptDirectory(MIGRATIONS_DIR).walk_revisions()}
+    unknown = [revision for revision in current if revision not in known]
+    if not unknown:
+        return None
+    if not inspect(connection).has_table('simulation_events'):
+        raise RuntimeError(
+            f"alembic_version points at revision {', '.join(unknown)}, which is not in migrations/versions, "
+            "and there is no simulation_events table to adopt. Drop the alembic_version table "
+            "(or run reset_db.py) and bootstrap again."
+        )
+    connection.execute(text('DELETE FROM alembic_version'))
+    connection.execute(text('INSERT INTO alembic_version (version_num) VALUES (:revision)'),
+                       {'revision': BASELINE_REVISION})
+    return ', '.join(unknown)
+
+def schema_checksum():
+    """Hash of the migration scripts and the model definitions.
+
+    Any new migration or model change alters it, which is what forces the
+    next bootstrap to do real work.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'versions', '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode())
+            digest.update(f.read())
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f'{column.name}:{column.type}:{column.nullable}:{column.primary_key}'.encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(f'{index.name}:{[c.name for c in index.columns]}'.encode())
+    return digest.hexdigest()
+
+def recorded_state(connection):
+    try:
+        row = connection.execute(select(schema_bootstrap).where(schema_bootstrap.c.id == 1)).first()
+    except SQLAlchemyError:
+        # Table does not exist yet: never bootstrapped
+        connection.rollback()
+        return None
+    return row
+
+def seed_sample_data():
+    """Add the example events to an empty database."""
+    if db.session.query(SimulationEvent.id).first() is not None:
+        return 0
+
+    samples = [
+        SimulationEvent('TurtleBot3', 'Warehouse'),
+        SimulationEvent('TurtleBot3', 'Office', 'Fire'),
+        SimulationEvent('CustomRobot', 'Apartment', 'Flood')
+    ]
+    # Complete one of the events
+    samples[1].complete(120.5)  # 120.5 seconds to resolve
+
+    db.session.add_all(samples)
+    stats.record_created(samples)
+    stats.record_completed([samples[1]])
+    db.session.commit()
+    return len(samples)
+
+def bootstrap(app, seed=True, force=False):
+    """Bring the database schema up to date, doing nothing if it already is.
+
+    A single-row schema_bootstrap table records the Alembic head revision and
+    schema_checksum() of the last successful run. When both still match, the
+    bootstrap costs one small query; otherwise it applies pending migrations,
+    seeds an empty database and records the new state.
+    """
+    from flask_migrate import upgrade
+
+    with app.app_context():
+        print(f"Database connection: {masked_uri(app.config['SQLALCHEMY_DATABASE_URI'])}")
+        revision = head_revision()
+        checksum = schema_checksum()
+
+        with db.engine.connect() as connection:
+            state = recorded_state(connection)
+        if not force and state is not None and state.revision == revision and state.checksum == checksum:
+            print(f"Schema is up to date (revision {revision}), nothing to do.")
+            return False
+
+        with db.engine.begin() as connection:
+            legacy = adopt_legacy_revision(connection)
+        if legacy:
+            print(f"Stamped the unknown revision {legacy} onto the baseline {BASELINE_REVISION}.")
+        print(f"Upgrading schema to revision {revision}...")
+        upgrade(directory=MIGRATIONS_DIR)
+        for name in partitions.ensure_partitions(app.config['PARTITION_MONTHS_AHEAD']):
+            print(f"Created partition {name}")
+
+        if seed:
+            added = seed_sample_data()
+            if added:
+                print(f"Added {added} sample events to the empty database.")
+
+        bootstrap_metadata.create_all(db.engine)
+        with db.engine.begin() as connection:
+            connection.execute(schema_bootstrap.delete())
+            connection.execute(schema_bootstrap.insert().values(
+                id=1, revision=revision, checksum=checksum, bootstrapped_at=datetime.utcnow()
+            ))
+        print("Database bootstrap complete.")
+        return True
+
+def main():
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Create or upgrade the simulation database schema')
+    parser.add_argument('--force', action='store_true', help='run migrations even if nothing changed')
+    parser.add_argument('--no-seed', action='store_true', help='do not add sample events to an empty database')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bootstrap(create_app(start_background=False), seed=not args.no_seed, force=args.force)
+    print(f"Bootstrap finished in {time.perf_counter() - start:.2f}s")
+    sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import math
+from datetime import datetime
+from sqlalchemy import insert, update, case
+from models import db, SimulationEvent
+
+EVENT_FIELDS = ('robot_type', 'world_type', 'disaster_type')
+REQUIRED_FIELDS = ('robot_type', 'world_type')
+
+def validate_event(data):
+    """Return (row, error) for one event payload; exactly one of them is None."""
+    if not isinstance(data, dict):
+        return None, 'Event must be an object'
+
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return None, f'Missing required field: {field}'
+
+    for field in EVENT_FIELDS:
+        value = data.get(field)
+        if value is not None and not isinstance(value, str):
+            return None, f'Field {field} must be a string'
+        if value is not None and len(value) > 100:
+            return None, f'Field {field} is longer than 100 characters'
+
+    return {field: data.get(field) for field in EVENT_FIELDS}, None
+
+def validate_resolution_time(value):
+    """Return (seconds, error) for a resolution_time_seconds value."""
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None, 'Field resolution_time_seconds must be a number'
+    if not math.isfinite(value) or value < 0:
+        return None, 'Field resolution_time_seconds must be a finite number >= 0'
+    return float(value), None
+
+def validate_completion(data):
+    """Return ((event_id, resolution_time_seconds), error) for one completion payload."""
+    if not isinstance(data, dict):
+        return None, 'Completion must be an object'
+
+    if 'id' not in data:
+        return None, 'Missing required field: id'
+    if 'resolution_time_seconds' not in data:
+        return None, 'Resolution time required'
+
+    event_id = data['id']
+    if not isinstance(event_id, int) or isinstance(event_id, bool):
+        return None, 'Field id must be an integer'
+    resolution_time, error = validate_resolution_time(data['resolution_time_seconds'])
+    if error:
+        return None, error
+
+    return (event_id, resolution_time), None
+
+def insert_events(rows):
+    """Insert all rows with a single multi-row INSERT ... RETURNING.
+
+    Returns the created events in the same order as rows. The caller owns the
+    transaction and must commit.
+    """
+    if not rows:
+        return []
+
+    stmt = insert(SimulationEvent).returning(SimulationEvent, sort_by_parameter_order=True)
+    return list(db.session.scalars(stmt, rows))
+
+def complete_events(completions):
+    """Complete every (event_id, resolution_time_seconds) pair with one UPDATE ... RETURNING.
+
+    Returns the updated events keyed by id; ids missing from the result do not
+    exist. The caller owns the transaction and must commit.
+    """
+    if not completions:
+        return {}
+
+    resolution_times = dict(completions)
+    stmt = (
+        update(SimulationEvent)
+        .where(SimulationEvent.id.in_(resolution_times))
+        .values(
+            completed=True,
+            resolution_time_seconds=case(resolution_times, value=SimulationEvent.id),
+            completed_at=datetime.utcnow()
+        )
+        .returning(SimulationEvent)
+        .execution_options(synchronize_session=False)
+    )
+    return {event.id: event for event in db.session.scalars(stmt)}
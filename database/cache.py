@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """Bounded LRU cache with per-entry TTL for serialized API responses.
+
+    Entries are stored under a version number that every invalidation bumps,
+    so a response built from data read before a write can never be stored
+    after that write has invalidated the cache. List responses are keyed by
+    the current list generation, which lets a single counter increment retire
+    every cached page at once; the stale pages then age out of the LRU.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=10.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = 0
+        self.list_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def event_key(self, event_id):
+        return ('event', event_id)
+
+    def list_key(self, path):
+        with self.lock:
+            return ('list', self.list_generation, path)
+
+    def get(self, key):
+        """Return (value, version). value is None on a miss; pass version to put()."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, self.version
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], self.version
+
+    def put(self, key, value, version):
+        with self.lock:
+            if version != self.version or self.max_entries <= 0:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_events(self, event_ids=()):
+        """Drop the given single-event entries and every cached list page.
+
+        Callers may extend event_key() with extra parts (e.g. the response
+        format), so every entry that starts with it is dropped.
+        """
+        event_ids = set(event_ids)
+        with self.lock:
+            self.version += 1
+            self.list_generation += 1
+            if event_ids:
+                stale = [key for key in self.entries if key[0] == 'event' and key[1] in event_ids]
+                for key in stale:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.list_generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
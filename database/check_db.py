@@ -1,7 +1,8 @@
-from app import app, db
+from app import create_app, db
 from models import SimulationEvent
 
 def check_database():
+    app = create_app(start_background=False)
     with app.app_context():
         count = SimulationEvent.query.count()
         print(f"Total simulation events: {count}")
@@ -0,0 +1,114 @@
+import gzip
+import io
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional, see requirements.txt
+    zstandard = None
+
+# What a corrupt body makes the decompressors raise
+DECODE_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+# Buffered responses worth compressing; streamed exports compress themselves
+# and packed telemetry floats barely shrink
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/msgpack'}
+
+class BodyTooLarge(ValueError):
+    pass
+
+def supported_encodings():
+    """Content codings this server can decode and produce, best first."""
+    return ('zstd', 'gzip') if zstandard else ('gzip',)
+
+def compress(data, encoding, level=None):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    return gzip.compress(data, compresslevel=level or 6)
+
+def decompress(data, encoding, max_size):
+    """Decompress a request body, refusing to produce more than max_size bytes."""
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(wbits=31)
+        result = decompressor.decompress(data, max_size + 1)
+        if not decompressor.eof:
+            if len(result) > max_size:
+                raise BodyTooLarge(f'Decompressed body larger than {max_size} bytes')
+            raise ValueError('Truncated gzip body')
+    elif encoding == 'zstd' and zstandard:
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            result = reader.read(max_size + 1)
+    else:
+        raise LookupError(encoding)
+    if len(result) > max_size:
+        raise BodyTooLarge(f'Decompressed body larger than {max_size} bytes')
+    return result
+
+def choose_encoding(accept_encodings):
+    """The best encoding the client accepts, or None."""
+    for encoding in supported_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+class DecompressRequestBody:
+    """WSGI middleware: transparently inflate gzip or zstd encoded request bodies.
+
+    Flask's request.json and get_data() then see the plain body. Unsupported
+    codings are refused with 415 and malformed or oversized bodies with 400
+    and 413.
+    """
+
+    def __init__(self, wsgi_app, max_size):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding in ('', 'identity'):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length) if length else environ['wsgi.input'].read()
+        try:
+            body = decompress(body, encoding, self.max_size)
+        except LookupError:
+            return self.error(start_response, '415 Unsupported Media Type',
+                              f"Content-Encoding must be one of {', '.join(supported_encodings())}")
+        except BodyTooLarge as e:
+            return self.error(start_response, '413 Request Entity Too Large', str(e))
+        except (ValueError,) + DECODE_ERRORS as e:
+            return self.error(start_response, '400 Bad Request', f'Invalid {encoding} body: {e}')
+
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    def error(self, start_response, status, message):
+        body = json.dumps({'error': message}).encode()
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+def compress_response(response, accept_encodings, min_size, level=None):
+    """Compress a buffered response in place if the client accepts it and it is worth it."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < min_size:
+        return response
+    response.set_data(compress(body, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    # The bytes differ per coding, so a strong ETag would be wrong
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -1,8 +1,14 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+_env_loaded = False
+
+def load_env():
+    """Load the .env file once, the first time a configuration is built."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 class Config:
     DEBUG = False
@@ -10,36 +16,199 @@ class Config:
     CSRF_ENABLED = True
     SECRET_KEY = 'simulation-database-secret-key'
     
-    # Get PostgreSQL credentials from environment variables or use defaults
-    PG_USER = os.environ.get('POSTGRES_USER', 'postgres')
-    PG_PASSWORD = os.environ.get('POSTGRES_PASSWORD', 'postgres')
-    PG_DB = os.environ.get('POSTGRES_DB', 'simulation_db')
-    PG_HOST = os.environ.get('POSTGRES_HOST', 'localhost')
-    
-    # Use postgresql+psycopg2 instead of postgresql+psycopg
-    SQLALCHEMY_DATABASE_URI = os.environ.get(
-        'DATABASE_URL', 
-        f'postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:5432/{PG_DB}'
-    )
+    # PostgreSQL credentials and SQLALCHEMY_DATABASE_URI are read from the
+    # environment when the config is instantiated, see __init__
+    PG_USER = 'postgres'
+    PG_PASSWORD = 'postgres'
+    PG_DB = 'simulation_db'
+    PG_HOST = 'localhost'
+    SQLALCHEMY_DATABASE_URI = None
+    
+    # 'postgresql', or 'sqlite' for an embedded database in SQLITE_PATH that
+    # needs no server (see sqlite_backend.py). DATABASE_URL overrides both.
+    DB_BACKEND = 'postgresql'
+    SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simulation.db')
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    print(f"Database connection: postgresql+psycopg2://{PG_USER}:****@{PG_HOST}:5432/{PG_DB}")
+    # GET /api/events page size when no limit is given, and the hard cap on limit
+    EVENTS_PAGE_SIZE = 100
+    EVENTS_MAX_PAGE_SIZE = 1000
+    
+    # Largest list accepted by the /batch endpoints
+    MAX_BATCH_SIZE = 1000
+    
+    # Largest request body accepted after gzip/zstd decompression, and the
+    # smallest response worth compressing
+    MAX_REQUEST_BODY_SIZE = 64 * 1024 * 1024
+    COMPRESS_MIN_SIZE = 1024
+    
+    # Rows fetched per round-trip by GET /api/events/export
+    EXPORT_CHUNK_SIZE = 5000
+    
+    # In-process cache for GET /api/events and /api/events/<id> responses.
+    # Writes invalidate it in the worker that handled them; the TTL bounds how
+    # stale other worker processes can be.
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 10
+    
+    # Connection pool (QueuePool) sizing, see engine_options() below
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+    # Server-side cap on any single statement (PostgreSQL only, 0 disables)
+    DB_STATEMENT_TIMEOUT_MS = 30000
+    
+    # Pose samples per telemetry_chunks row, the largest upload accepted by
+    # POST /api/events/<id>/telemetry and the most samples one GET returns
+    TELEMETRY_CHUNK_SIZE = 1024
+    TELEMETRY_MAX_SAMPLES = 100000
+    TELEMETRY_MAX_POINTS = 10000
+    
+    # GET /api/events/stream: 'memory' publishes within this process only,
+    # 'postgres' goes through LISTEN/NOTIFY so every worker sees every write;
+    # 'auto' picks 'postgres' on PostgreSQL
+    FEED_BACKEND = 'auto'
+    # Every open stream holds one server thread for its whole lifetime, so a
+    # worker takes at most this many (default: API_THREADS - 2) and answers
+    # further ones with 503, keeping threads free for the REST API
+    FEED_MAX_SUBSCRIBERS = None
+    # Undelivered notifications per subscriber before it is disconnected
+    FEED_MAX_PENDING = 1000
+    # Most missed events replayed per type when a client resumes
+    FEED_BACKFILL_LIMIT = 1000
+    FEED_HEARTBEAT_SECONDS = 15
+    
+    # archive.py moves completed events that started more than
+    # ARCHIVE_AFTER_DAYS ago into Parquet files under ARCHIVE_DIR
+    ARCHIVE_AFTER_DAYS = 90
+    ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+    ARCHIVE_BATCH_SIZE = 50000
+    # Monthly simulation_events partitions kept ready beyond the current month (PostgreSQL)
+    PARTITION_MONTHS_AHEAD = 3
+    
+    # Queries slower than this are kept in the slow query log on /api/metrics
+    SLOW_QUERY_MS = 200
+    EXPLAIN_SLOW_QUERIES = False
+    
+    # 'async' accepts new events into a write-behind queue (see ingest.py)
+    # instead of committing them inside the request
+    INGEST_MODE = 'sync'
+    INGEST_QUEUE_SIZE = 10000
+    INGEST_BATCH_SIZE = 500
+    INGEST_FLUSH_INTERVAL = 0.5
+    INGEST_ENQUEUE_TIMEOUT = 2.0
+    INGEST_SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ingest_spill')
+    INGEST_FSYNC = True
+    
+    # Threads per API worker process (see gunicorn.conf.py and serve.py);
+    # default 16 with an embedded SQLite database, otherwise 4
+    API_THREADS = None
+    
+    # Settings an environment variable of the same name overrides
+    env_overrides = {
+        'API_THREADS': int,
+        'FEED_MAX_SUBSCRIBERS': int,
+        'DB_BACKEND': str,
+        'SQLITE_PATH': str,
+        'DB_POOL_SIZE': int,
+        'DB_MAX_OVERFLOW': int,
+        'DB_STATEMENT_TIMEOUT_MS': int,
+        'INGEST_MODE': str,
+        'INGEST_SPILL_DIR': str,
+        'ARCHIVE_AFTER_DAYS': int,
+        'ARCHIVE_DIR': str,
+    }
+    
+    def __init__(self):
+        load_env()
+        for name, cast in self.env_overrides.items():
+            if name in os.environ:
+                setattr(self, name, cast(os.environ[name]))
+        
+        self.PG_USER = os.environ.get('POSTGRES_USER', self.PG_USER)
+        self.PG_PASSWORD = os.environ.get('POSTGRES_PASSWORD', self.PG_PASSWORD)
+        self.PG_DB = os.environ.get('POSTGRES_DB', self.PG_DB)
+        self.PG_HOST = os.environ.get('POSTGRES_HOST', self.PG_HOST)
+        if self.DB_BACKEND == 'sqlite':
+            default_uri = f'sqlite:///{self.SQLITE_PATH}'
+            # One process owns the file, so new events go through its single
+            # batching writer thread unless asked otherwise
+            if 'INGEST_MODE' not in os.environ and int(os.environ.get('API_WORKERS', 1)) == 1:
+                self.INGEST_MODE = 'async'
+        elif self.DB_BACKEND == 'postgresql':
+            # Use postgresql+psycopg2 instead of postgresql+psycopg
+            default_uri = f'postgresql+psycopg2://{self.PG_USER}:{self.PG_PASSWORD}@{self.PG_HOST}:5432/{self.PG_DB}'
+        else:
+            raise ValueError(f"DB_BACKEND must be 'postgresql' or 'sqlite', not {self.DB_BACKEND!r}")
+        self.SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', default_uri)
+        if self.API_THREADS is None:
+            self.API_THREADS = 16 if self.SQLALCHEMY_DATABASE_URI.startswith('sqlite') else 4
+        if self.FEED_MAX_SUBSCRIBERS is None:
+            self.FEED_MAX_SUBSCRIBERS = max(0, self.API_THREADS - 2)
+        
+        # Without a database sequence the ingest queue hands out ids itself
+        # (see ingest.IdAllocator), so two workers would hand out the same ones
+        workers = int(os.environ.get('API_WORKERS', 1))
+        if (self.INGEST_MODE == 'async' and workers != 1
+                and not self.SQLALCHEMY_DATABASE_URI.startswith('postgresql')):
+            raise ValueError(f"INGEST_MODE=async needs PostgreSQL or API_WORKERS=1, not {workers} workers")
 
 class ProductionConfig(Config):
     DEBUG = False
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 10
 
 class DevelopmentConfig(Config):
     DEVELOPMENT = True
     DEBUG = True
+    SLOW_QUERY_MS = 50
+    EXPLAIN_SLOW_QUERIES = True
 
 class TestingConfig(Config):
     TESTING = True
+    DB_POOL_SIZE = 2
+    DB_MAX_OVERFLOW = 2
+    DB_STATEMENT_TIMEOUT_MS = 5000
+
+def engine_options(config, pool_class=None):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings of a loaded config."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        import sqlite_backend
+        return sqlite_backend.engine_options(config, pool_class)
+    
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if pool_class is not None:
+        options['poolclass'] = pool_class
+    if uri.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
 
 def get_config():
+    """Return the configuration for FLASK_ENV, reading .env and the environment now."""
+    load_env()
     env = os.environ.get('FLASK_ENV', 'development')
     if env == 'production':
-        return ProductionConfig
+        return ProductionConfig()
     elif env == 'testing':
-        return TestingConfig
+        return TestingConfig()
     else:
-        return DevelopmentConfig 
\ No newline at end of file
+        return DevelopmentConfig()
+
+def masked_uri(uri):
+    """The database URI with its password hidden, for log output."""
+    from sqlalchemy.engine import make_url
+    return make_url(uri).render_as_string(hide_password=True) 
\ No newline at end of file
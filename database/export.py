@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import zlib
+from models import db, SimulationEvent
+from queries import apply_event_filters
+
+EXPORT_COLUMNS = (
+    'id', 'robot_type', 'world_type', 'disaster_type', 'resolution_time_seconds',
+    'completed', 'started_at', 'completed_at'
+)
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def export_query(args):
+    columns = [getattr(SimulationEvent, name) for name in EXPORT_COLUMNS]
+    return apply_event_filters(db.select(*columns), args).order_by(
+        SimulationEvent.started_at, SimulationEvent.id
+    )
+
+def export_rows(stmt, chunk_size):
+    """Yield lists of rows from stmt, chunk_size at a time.
+
+    yield_per streams the result (a server-side cursor on PostgreSQL), so only
+    one chunk of rows is held in memory at once.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield partition
+
+def format_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def ndjson_chunks(row_chunks):
+    # NDJSON has no header line; an empty first chunk still gets the response
+    # headers (and, compressed, the gzip header) out before the first query returns
+    yield b''
+    for rows in row_chunks:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(format_value, row)))) + '\n' for row in rows
+        ).encode()
+
+def csv_chunks(row_chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # Send the header before the first query returns so clients see bytes immediately
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    for rows in row_chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([map(format_value, row) for row in rows])
+        yield buffer.getvalue().encode()
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Sync flush so every chunk reaches the client instead of sitting in the compressor
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def export_events(args, export_format, chunk_size, compress=False):
+    """Return a generator of encoded bytes for the export response body.
+
+    Filters are parsed here rather than in the generator so invalid arguments
+    raise ValueError before the response starts.
+    """
+    row_chunks = export_rows(export_query(args), chunk_size)
+    chunks = csv_chunks(row_chunks) if export_format == 'csv' else ndjson_chunks(row_chunks)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,271 @@
+import base64
+import json
+import select
+import threading
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event, func, text
+from flask_sqlalchemy.session import Session
+from models import db, SimulationEvent
+
+NOTIFY_CHANNEL = 'simulation_events'
+FEED_TYPES = ('created', 'completed')
+
+class Subscriber:
+    """Bounded mailbox of one feed connection."""
+
+    def __init__(self, max_pending):
+        self.messages = deque()
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.overflowed = False
+
+    def put(self, messages):
+        with self.condition:
+            if len(self.messages) + len(messages) > self.max_pending:
+                # The client cannot keep up; it has to reconnect and resume
+                self.overflowed = True
+            else:
+                self.messages.extend(messages)
+            self.condition.notify()
+
+    def get(self, timeout):
+        """Return all waiting messages, or [] after timeout seconds without any."""
+        with self.condition:
+            if not self.messages and not self.overflowed:
+                self.condition.wait(timeout)
+            messages = list(self.messages)
+            self.messages.clear()
+            return messages
+
+class EventBroker:
+    """In-process publish/subscribe of create/complete notifications.
+
+    announce() is called inside the write transaction. With the 'memory'
+    backend the messages are handed to this process's subscribers once the
+    session commits. With 'postgres' they are sent with pg_notify(), which
+    PostgreSQL also delivers only on commit, and a listener thread in every
+    worker process feeds them back into its own broker, so a subscriber sees
+    writes made by any worker.
+    """
+
+    def __init__(self, app, backend='memory', max_subscribers=100, max_pending=1000):
+        self.app = app
+        self.backend = backend
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.listener = None
+        self.stopping = threading.Event()
+        self.published = 0
+
+    def subscribe(self):
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.max_pending)
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, messages):
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.published += len(messages)
+        for subscriber in subscribers:
+            subscriber.put(messages)
+
+    def announce(self, kind, events):
+        """Queue a notification for events; it is published when the session commits."""
+        messages = [{'type': kind, 'event': e.to_dict()} for e in events]
+        if not messages:
+            return
+        if self.backend == 'postgres':
+            db.session.execute(
+                text('SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload'),
+                {'channel': NOTIFY_CHANNEL, 'payloads': [json.dumps(message) for message in messages]}
+            )
+        else:
+            db.session.info.setdefault('feed_messages', []).append((self, messages))
+
+    # PostgreSQL LISTEN
+
+    def start(self):
+        if self.backend == 'postgres' and self.listener is None:
+            self.stopping.clear()
+            self.listener = threading.Thread(target=self.listen, name='event-feed-listener', daemon=True)
+            self.listener.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.listener:
+            self.listener.join()
+            self.listener = None
+
+    def listen(self):
+        while not self.stopping.is_set():
+            try:
+                with self.app.app_context():
+                    connection = db.engine.raw_connection()
+                try:
+                    self.listen_on(connection.dbapi_connection)
+                finally:
+                    connection.close()
+            except Exception as e:
+                print(f"Event feed listener error, reconnecting: {e}")
+                self.stopping.wait(2)
+
+    def listen_on(self, dbapi_connection):
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+        while not self.stopping.is_set():
+            if select.select([dbapi_connection], [], [], 1.0)[0]:
+                dbapi_connection.poll()
+                messages = [json.loads(notify.payload) for notify in dbapi_connection.notifies]
+                dbapi_connection.notifies.clear()
+                if messages:
+                    self.publish(messages)
+
+    def status(self):
+        with self.lock:
+            return {
+                'backend': self.backend,
+                'subscribers': len(self.subscribers),
+                'published': self.published,
+                'listening': bool(self.listener and self.listener.is_alive()),
+            }
+
+@event.listens_for(Session, 'after_commit')
+def publish_committed(session):
+    for broker, messages in session.info.pop('feed_messages', []):
+        broker.publish(messages)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rolled_back(session):
+    session.info.pop('feed_messages', None)
+
+# Resuming
+
+def encode_feed_id(created_id, completed_at):
+    """SSE id: the newest created event id and completion time seen so far."""
+    payload = [created_id, completed_at.isoformat() if completed_at else None]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_feed_id(value):
+    """Parse an id from encode_feed_id(), or a bare event id.
+
+    A bare event id resumes creates after it; completions are then only
+    reported from now on.
+    """
+    if value.isdigit():
+        return int(value), None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        created_id, completed_at = json.loads(base64.urlsafe_b64decode(padded))
+        return int(created_id), (datetime.fromisoformat(completed_at) if completed_at else None)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid Last-Event-ID')
+
+def missed_messages(created_id, completed_at, limit):
+    """Messages for writes after the given position, oldest first, and whether limit cut them short.
+
+    Ids are assigned before commit, so an event committed late with a
+    smaller id than one already seen is not replayed; clients that need
+    every event should still reconcile with GET /api/events after a resync.
+    """
+    created = db.session.scalars(
+        db.select(SimulationEvent)
+        .where(SimulationEvent.id > created_id)
+        .order_by(SimulationEvent.id)
+        .limit(limit + 1)
+    ).all()
+    completed = []
+    if completed_at is not None:
+        completed = db.session.scalars(
+            db.select(SimulationEvent)
+            .where(SimulationEvent.completed.is_(True), SimulationEvent.completed_at > completed_at)
+            .order_by(SimulationEvent.completed_at, SimulationEvent.id)
+            .limit(limit + 1)
+        ).all()
+    truncated = len(created) > limit or len(completed) > limit
+    messages = [{'type': 'created', 'event': e.to_dict()} for e in created[:limit]]
+    messages += [{'type': 'completed', 'event': e.to_dict()} for e in completed[:limit]]
+    return messages, truncated
+
+def current_position():
+    return db.session.execute(db.select(func.max(SimulationEvent.id))).scalar() or 0, datetime.utcnow()
+
+def matches(message, types, filters):
+    if message['type'] not in types:
+        return False
+    return all(
+        message['event'][field] == (None if value == 'null' else value)
+        for field, value in filters.items()
+    )
+
+def format_sse(kind, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {kind}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def event_stream(broker, subscriber, position, types, filters, backfill_limit, heartbeat):
+    """Server-Sent Events for one subscriber, starting with anything it missed.
+
+    position is decode_feed_id() of the client's Last-Event-ID, or None to
+    start from now.
+
+    The subscriber is registered before the backfill query, so writes
+    committed while it runs are delivered live; duplicates between the two
+    are dropped.
+    """
+    try:
+        if position is None:
+            created_id, completed_at = current_position()
+            backlog = []
+        else:
+            created_id, completed_at = position
+            backlog, truncated = missed_messages(created_id, completed_at, backfill_limit)
+            if completed_at is None:
+                completed_at = datetime.utcnow()
+            if truncated:
+                # Too far behind to replay: tell the client to reload and go live from here
+                created_id, completed_at = current_position()
+                backlog = []
+                yield format_sse('resync', {'reason': 'Too many missed events, reload the event list'},
+                                 encode_feed_id(created_id, completed_at))
+        # Do not hold a pooled connection for the lifetime of the stream
+        db.session.close()
+
+        yield format_sse('ready', {'types': list(types)}, encode_feed_id(created_id, completed_at))
+
+        replayed = {(message['type'], message['event']['id']) for message in backlog}
+        messages = backlog
+        while True:
+            for message in messages:
+                event_data = message['event']
+                if messages is not backlog and (message['type'], event_data['id']) in replayed:
+                    continue
+                if message['type'] == 'created':
+                    created_id = max(created_id, event_data['id'])
+                else:
+                    completed_at = max(completed_at, datetime.fromisoformat(event_data['completed_at']))
+                if matches(message, types, filters):
+                    yield format_sse(message['type'], event_data, encode_feed_id(created_id, completed_at))
+
+            if subscriber.overflowed:
+                yield format_sse('overflow', {'reason': 'Client too slow, reconnect to resume'},
+                                 encode_feed_id(created_id, completed_at))
+                return
+            messages = subscriber.get(heartbeat)
+            if not messages:
+                # Comment line: keeps proxies from timing out and detects gone clients
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import io
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from models import db, SimulationEvent, SimulationEventStats, ArchivedEventStats, TelemetryChunk
+from sqlite_backend import begin_write
+import stats
+
+GeneratedEvent = namedtuple('GeneratedEvent', [
+    'id', 'robot_type', 'world_type', 'disaster_type', 'resolution_time_seconds',
+    'completed', 'started_at', 'completed_at'
+])
+
+COPY_COLUMNS = ('robot_type', 'world_type', 'disaster_type', 'resolution_time_seconds',
+                'completed', 'started_at', 'completed_at')
+
+DEFAULTS = {
+    'robots': 'TurtleBot3:3,CustomRobot:1',
+    'worlds': 'Warehouse:2,Office:2,Apartment:1',
+    'disasters': 'none:2,Fire:1,Flood:1',
+    # Median seconds to resolve, per disaster; spread is log-normal
+    'resolution_median': 'none:60,Fire:180,Flood:300',
+}
+
+def parse_weights(spec):
+    """Parse "name:weight,name:weight" into {name: weight}; "none" means no disaster."""
+    weights = {}
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition(':')
+        if not name:
+            continue
+        try:
+            weights[None if name == 'none' else name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f'Invalid weight in {spec!r}: {item!r}')
+    if not weights or any(weight < 0 for weight in weights.values()):
+        raise ValueError(f'Expected "name:weight,..." with non-negative weights, got {spec!r}')
+    return weights
+
+class EventGenerator:
+    """Realistic simulation_events rows, reproducible for a given seed.
+
+    Start times are spread evenly over the window in order, so ids grow with
+    started_at as they do in production. Events are completed with
+    probability completion_rate after a log-normal resolution time whose
+    median depends on the disaster; runs that would still be going at the end
+    of the window are left incomplete.
+    """
+
+    def __init__(self, robots, worlds, disasters, resolution_median, resolution_sigma=0.8,
+                 completion_rate=0.8, seed=None):
+        self.robots = parse_weights(robots)
+        self.worlds = parse_weights(worlds)
+        self.disasters = parse_weights(disasters)
+        self.medians = parse_weights(resolution_median)
+        self.sigma = resolution_sigma
+        self.completion_rate = completion_rate
+        self.rng = random.Random(seed)
+
+    def choices(self, weights, count):
+        return self.rng.choices(list(weights), list(weights.values()), k=count)
+
+    def batch(self, count, start, end):
+        """count events starting in [start, end)."""
+        rng = self.rng
+        robots = self.choices(self.robots, count)
+        worlds = self.choices(self.worlds, count)
+        disasters = self.choices(self.disasters, count)
+        step = (end - start).total_seconds() / count
+        default_median = self.medians.get(None, 60.0)
+
+        events = []
+        for i in range(count):
+            started_at = start + timedelta(seconds=(i + rng.random()) * step)
+            resolution = completed_at = None
+            if rng.random() < self.completion_rate:
+                median = self.medians.get(disasters[i], default_median)
+                resolution = rng.lognormvariate(math.log(median), self.sigma)
+                completed_at = started_at + timedelta(seconds=resolution)
+                if completed_at >= end:
+                    resolution = completed_at = None
+            events.append(GeneratedEvent(
+                None, robots[i], worlds[i], disasters[i], resolution,
+                completed_at is not None, started_at, completed_at
+            ))
+        return events
+
+def copy_batch(events):
+    """Load events with PostgreSQL COPY inside the session's transaction."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for event in events:
+        writer.writerow((
+            event.robot_type, event.world_type, event.disaster_type,
+            event.resolution_time_seconds, 't' if event.completed else 'f',
+            event.started_at.isoformat(), event.completed_at.isoformat() if event.completed_at else None
+        ))
+    buffer.seek(0)
+    dbapi_connection = db.session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        # In CSV format an unquoted empty field is NULL
+        cursor.copy_expert(f"COPY simulation_events ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def insert_batch(events):
+    """Load events with one executemany INSERT (SQLite and other backends)."""
+    db.session.execute(insert(SimulationEvent.__table__), [
+        {column: getattr(event, column) for column in COPY_COLUMNS} for event in events
+    ])
+
+def load_events(count, generator, days=30, end=None, batch_size=50000, progress=True):
+    """Append count generated events whose start times cover the days before end.
+
+    Each batch is committed together with its simulation_event_stats
+    increments, so /api/stats stays consistent with the table.
+    """
+    end = end or datetime.utcnow()
+    start = end - timedelta(days=days)
+    span = (end - start) / count if count else timedelta(0)
+    use_copy = db.engine.dialect.name == 'postgresql'
+
+    loaded = 0
+    started = time.perf_counter()
+    while loaded < count:
+        size = min(batch_size, count - loaded)
+        batch_start = start + span * loaded
+        events = generator.batch(size, batch_start, batch_start + span * size)
+        begin_write(db.session)
+        if use_copy:
+            copy_batch(events)
+        else:
+            insert_batch(events)
+        stats.record_created(events)
+        stats.record_completed([event for event in events if event.completed])
+        db.session.commit()
+
+        loaded += size
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"  {loaded}/{count} events ({loaded / elapsed:,.0f} rows/s)")
+            sys.stdout.flush()
+
+    if use_copy:
+        # Fresh planner statistics, otherwise the first benchmark queries plan for an empty table
+        db.session.execute(text('ANALYZE simulation_events'))
+        db.session.commit()
+    return loaded
+
+def add_generator_arguments(parser):
+    parser.add_argument('--robots', default=DEFAULTS['robots'], help='robot types and weights, "name:weight,..."')
+    parser.add_argument('--worlds', default=DEFAULTS['worlds'], help='world types and weights')
+    parser.add_argument('--disasters', default=DEFAULTS['disasters'],
+                        help='disaster types and weights, "none" for no disaster')
+    parser.add_argument('--resolution-median', default=DEFAULTS['resolution_median'],
+                        help='median resolution seconds per disaster, "name:seconds,..."')
+    parser.add_argument('--resolution-sigma', type=float, default=0.8,
+                        help='log-normal spread of resolution times')
+    parser.add_argument('--completion-rate', type=float, default=0.8, help='share of events that complete')
+    parser.add_argument('--days', type=float, default=30, help='time window the start times cover')
+    parser.add_argument('--seed', type=int, default=42, help='random seed, for reproducible data')
+    parser.add_argument('--batch-size', type=int, default=50000, help='rows per COPY/INSERT and commit')
+
+def make_generator(args):
+    return EventGenerator(args.robots, args.worlds, args.disasters, args.resolution_median,
+                          args.resolution_sigma, args.completion_rate, args.seed)
+
+def main():
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Bulk-load synthetic simulation events')
+    parser.add_argument('--rows', type=int, default=1000000, help='events to add')
+    parser.add_argument('--truncate', action='store_true', help='delete existing events, telemetry and statistics first')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        generator = make_generator(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    app = create_app(start_background=False)
+    with app.app_context():
+        print(f"Loading into {db.engine.url.render_as_string(hide_password=True)}")
+        if args.truncate:
+            db.session.execute(db.delete(SimulationEventStats))
+            db.session.execute(db.delete(ArchivedEventStats))
+            db.session.execute(db.delete(TelemetryChunk))
+            db.session.execute(db.delete(SimulationEvent))
+            db.session.commit()
+
+        started = time.perf_counter()
+        loaded = load_events(args.rows, generator, args.days, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        total = db.session.execute(db.select(db.func.count(SimulationEvent.id))).scalar()
+        print(f"Loaded {loaded} events in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s); table now has {total}")
+
+if __name__ == '__main__':
+    main()
+    sys.stdout.flush()
@@ -0,0 +1,46 @@
+# Gunicorn settings for the simulation database API.
+# gunicorn reads ./gunicorn.conf.py automatically: `gunicorn wsgi:app`
+import multiprocessing
+import os
+from config import get_config
+
+bind = os.environ.get('API_BIND', '0.0.0.0:5000')
+
+# Preforked processes, each with a small thread pool so slow database calls
+# do not block every request handled by that worker. An embedded SQLite
+# database belongs to a single process with more threads: it hands out event
+# ids and publishes the live feed in-process, and only one writer can commit
+# at a time anyway.
+config = get_config()
+embedded = config.SQLALCHEMY_DATABASE_URI.startswith('sqlite')
+workers = int(os.environ.get('API_WORKERS', 1 if embedded else multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+# Live feed streams each hold a thread; Config caps them below this (FEED_MAX_SUBSCRIBERS)
+threads = config.API_THREADS
+
+# Simulators reuse their connections between calls
+keepalive = int(os.environ.get('API_KEEPALIVE', 5))
+timeout = int(os.environ.get('API_TIMEOUT', 60))
+graceful_timeout = 30
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = 10000
+max_requests_jitter = 1000
+
+# Import the app once in the master; workers share its memory and only
+# need fresh database connections after the fork (see post_worker_init)
+preload_app = True
+
+accesslog = os.environ.get('API_ACCESS_LOG')
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    from app import init_worker
+    init_worker(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    from app import stop_background_workers
+    if worker.wsgi is not None:
+        stop_background_workers(worker.wsgi)
@@ -0,0 +1,452 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import func, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from models import db, SimulationEvent
+from bulk import insert_events
+from sqlite_backend import begin_write
+import stats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+class QueueFull(Exception):
+    pass
+
+def queued_event_dict(row):
+    """Same shape as SimulationEvent.to_dict() for an event that is not written yet."""
+    return {
+        'id': row['id'],
+        'robot_type': row['robot_type'],
+        'world_type': row['world_type'],
+        'disaster_type': row['disaster_type'],
+        'resolution_time_seconds': None,
+        'completed': False,
+        'started_at': row['started_at'].isoformat(),
+        'completed_at': None
+    }
+
+class IdAllocator:
+    """Hands out simulation_events ids before the rows are written.
+
+    On PostgreSQL ids are reserved from the table's sequence a block at a
+    time, so they never collide with ids issued to other processes. Other
+    backends count up from the current maximum, which is only safe while
+    this process is the only writer; Config refuses async ingest on them
+    with more than one API worker.
+    """
+
+    def __init__(self, engine, block_size=1000, floor=0):
+        self.engine = engine
+        self.block_size = block_size
+        self.ids = deque()
+        self.lock = threading.Lock()
+        self.next_id = None
+        self.floor = floor
+
+    def reserve_block(self, count):
+        with self.engine.connect() as conn:
+            if conn.dialect.name == 'postgresql':
+                rows = conn.execute(text(
+                    "SELECT nextval(pg_get_serial_sequence('simulation_events', 'id')) "
+                    "FROM generate_series(1, :count)"
+                ), {'count': count})
+                self.ids.extend(row[0] for row in rows)
+                return
+
+            if self.next_id is None:
+                max_id = conn.execute(db.select(func.max(SimulationEvent.id))).scalar() or 0
+                self.next_id = max(max_id, self.floor) + 1
+            self.ids.extend(range(self.next_id, self.next_id + count))
+            self.next_id += count
+
+    def allocate(self, count):
+        with self.lock:
+            if len(self.ids) < count:
+                self.reserve_block(max(self.block_size, count - len(self.ids)))
+            return [self.ids.popleft() for _ in range(count)]
+
+class EventIngestQueue:
+    """Write-behind queue for new simulation events.
+
+    submit() assigns ids, appends the rows to a local spill file and returns
+    straight away; a background thread writes them to the database in batches
+    of batch_size or every flush_interval seconds, whichever comes first. The
+    spill file is replayed on start-up, so accepted events survive a crash or
+    restart. Rows already committed are only cut from the front of it once
+    they take up compact_bytes and at least as much as the rows still queued,
+    so compacting costs O(1) per event rather than O(queue) per batch.
+
+    A batch the database rejects is split in half until the rows it rejects
+    on their own are found; those go to dead-letter.ndjson in the spill
+    directory so the rows behind them keep draining. Only when the database
+    is unavailable does the whole batch stay queued for a retry.
+    """
+
+    def __init__(self, app, max_size=10000, batch_size=500, flush_interval=0.5,
+                 enqueue_timeout=2.0, spill_dir='ingest_spill', fsync=True, id_block_size=1000,
+                 compact_bytes=1 << 20):
+        self.app = app
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_dir = spill_dir
+        self.spill_path = os.path.join(spill_dir, f'ingest-{os.getpid()}.ndjson')
+        self.dead_letter_path = os.path.join(spill_dir, 'dead-letter.ndjson')
+        self.fsync = fsync
+        self.id_block_size = id_block_size
+        self.compact_bytes = compact_bytes
+
+        self.pending = deque()
+        self.pending_ids = set()
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.stopping = False
+        self.thread = None
+        self.spill_file = None
+        # Byte length of each queued row's line, in spill file order, and how
+        # many bytes at the front of the file belong to rows already done
+        self.spill_lines = deque()
+        self.spill_done = 0
+        self.spill_size = 0
+        self.allocator = None
+
+        self.accepted = 0
+        self.written = 0
+        self.rejected = 0
+        self.dead_lettered = 0
+        self.failed_flushes = 0
+
+    # Lifecycle
+
+    def start(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.spill_file = open(self.spill_path, 'a+', encoding='utf-8')
+        if fcntl:
+            fcntl.flock(self.spill_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        recovered = self.recover()
+        with self.app.app_context():
+            floor = max((row['id'] for row in recovered), default=0)
+            self.allocator = IdAllocator(db.engine, self.id_block_size, floor)
+
+        self.thread = threading.Thread(target=self.run, name='event-ingest-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        with self.condition:
+            if self.stopping:
+                return
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+        with self.write_lock:
+            self.compact_spill(force=True)
+        self.spill_file.close()
+
+    def recover(self):
+        """Re-queue spilled events that never reached the database.
+
+        Spill files from other processes are only taken over when their owner
+        no longer holds the lock on them (i.e. it has exited). Whatever is
+        still unwritten is rewritten into this process's own spill file.
+        """
+        rows = self.read_spill(self.spill_file)
+        orphans = []
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, 'ingest-*.ndjson'))):
+            if os.path.abspath(path) == os.path.abspath(self.spill_path):
+                continue
+            with open(path, 'r+', encoding='utf-8') as spill:
+                if fcntl:
+                    try:
+                        fcntl.flock(spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                    # The owner may have just replaced the file (see rewrite_spill())
+                    # and released the lock on the old one
+                    if os.fstat(spill.fileno()).st_ino != os.stat(path).st_ino:
+                        continue
+                rows.extend(self.read_spill(spill))
+            orphans.append(path)
+
+        missing = []
+        if rows:
+            with self.app.app_context():
+                ids = [row['id'] for row in rows]
+                existing = set(db.session.scalars(
+                    db.select(SimulationEvent.id).where(SimulationEvent.id.in_(ids))
+                ))
+            # Rows dead-lettered since the last compaction are still spilled
+            existing.update(self.dead_letter_ids())
+            missing = [row for row in rows if row['id'] not in existing]
+
+        # Rewriting also drops any torn line left by a crash mid-append
+        self.rewrite_spill(missing)
+        for path in orphans:
+            os.remove(path)
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+
+        with self.condition:
+            self.pending.extend(missing)
+            self.pending_ids.update(row['id'] for row in missing)
+        if missing:
+            print(f"Recovered {len(missing)} unwritten events from {self.spill_dir}")
+        return rows
+
+    # Spill file
+
+    def read_spill(self, spill):
+        spill.seek(0)
+        rows = []
+        for line in spill:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-write was never acknowledged
+                continue
+            row['started_at'] = datetime.fromisoformat(row['started_at'])
+            rows.append(row)
+        return rows
+
+    def spill_lines_for(self, rows):
+        # ensure_ascii keeps every line ASCII, so characters are bytes
+        return [json.dumps(dict(row, started_at=row['started_at'].isoformat())) + '\n' for row in rows]
+
+    def append_spill(self, rows):
+        """Append rows to the spill file; called with the condition held."""
+        lines = self.spill_lines_for(rows)
+        self.spill_file.seek(0, os.SEEK_END)
+        self.spill_file.write(''.join(lines))
+        self.spill_file.flush()
+        if self.fsync:
+            os.fsync(self.spill_file.fileno())
+        self.spill_lines.extend(len(line) for line in lines)
+        self.spill_size += sum(len(line) for line in lines)
+
+    def rewrite_spill(self, rows):
+        """Replace the spill file with just rows, at start-up."""
+        lines = self.spill_lines_for(rows)
+        self.replace_spill(''.join(lines))
+        self.spill_lines = deque(len(line) for line in lines)
+        self.spill_done = 0
+        self.spill_size = sum(self.spill_lines)
+
+    def replace_spill(self, text, tail_from=None):
+        """Write text to a new spill file and rename it over the old one, so
+        a crash leaves one or the other.
+
+        With tail_from, whatever was appended to the old file from that
+        offset on is copied after text first; the caller holds the condition
+        so nothing more is appended before the rename.
+        """
+        temporary = self.spill_path + '.tmp'
+        spill = open(temporary, 'w+', encoding='utf-8')
+        if fcntl:
+            fcntl.flock(spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        spill.write(text)
+        if tail_from is not None:
+            self.spill_file.seek(tail_from)
+            spill.write(self.spill_file.read())
+        spill.flush()
+        if self.fsync:
+            os.fsync(spill.fileno())
+        if fcntl is None:
+            # Windows cannot replace a file that is still open
+            self.spill_file.close()
+        os.replace(temporary, self.spill_path)
+        if self.spill_file:
+            self.spill_file.close()
+        self.spill_file = spill
+
+    def compact_spill(self, force=False):
+        """Cut rows already done from the front of the spill file once they
+        are at least compact_bytes and at least half of it (or at all, with
+        force).
+
+        Called by the writer with write_lock held, so spill_done cannot move.
+        The rows still queued are copied without the condition, so submit()
+        keeps appending meanwhile; only the rows it appended during the copy
+        are copied with the condition held, just before the rename.
+        """
+        with self.condition:
+            done, size = self.spill_done, self.spill_size
+        if not done or (not force and done < max(self.compact_bytes, size - done)):
+            return
+
+        with open(self.spill_path, 'r', encoding='utf-8') as old:
+            old.seek(done)
+            live = old.read(size - done)
+        with self.condition:
+            self.replace_spill(live, tail_from=size)
+            self.spill_size -= done
+            self.spill_done = 0
+
+    def dead_letter_ids(self):
+        if not os.path.exists(self.dead_letter_path):
+            return set()
+        ids = set()
+        with open(self.dead_letter_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    ids.add(json.loads(line)['id'])
+                except (ValueError, KeyError):
+                    continue
+        return ids
+
+    def dead_letter(self, failures):
+        """Append rows the database rejected, with the error, for someone to look at."""
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(
+                json.dumps(dict(row, started_at=row['started_at'].isoformat(), error=error)) + '\n'
+                for row, error in failures
+            ))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        print(f"Moved {len(failures)} rejected events to {self.dead_letter_path}")
+
+    # Producer side
+
+    def submit(self, rows):
+        """Queue validated event rows and return them with their ids assigned.
+
+        Raises QueueFull if there is no room within enqueue_timeout seconds.
+        """
+        ids = self.allocator.allocate(len(rows))
+        started_at = datetime.utcnow()
+        rows = [dict(row, id=event_id, started_at=started_at) for row, event_id in zip(rows, ids)]
+
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self.condition:
+            while len(self.pending) + len(rows) > self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.stopping:
+                    self.rejected += len(rows)
+                    raise QueueFull(f'Ingest queue is full ({self.max_size} events pending)')
+                self.condition.wait(remaining)
+
+            self.append_spill(rows)
+            self.pending.extend(rows)
+            self.pending_ids.update(ids)
+            self.accepted += len(rows)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+        return rows
+
+    def is_pending(self, event_id):
+        with self.condition:
+            return event_id in self.pending_ids
+
+    # Writer side
+
+    def run(self):
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self.pending) < self.batch_size and not self.stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.stopping:
+                    return
+
+            if not self.flush_once():
+                # Back off while the database is unavailable; events stay queued
+                time.sleep(min(self.flush_interval * 4, 5))
+
+    def flush(self):
+        """Write everything queued so far; used before completing a queued event."""
+        while True:
+            with self.condition:
+                if not self.pending:
+                    return True
+            if not self.flush_once():
+                return False
+
+    def flush_once(self):
+        with self.write_lock:
+            with self.condition:
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                self.in_flight = len(batch)
+            if not batch:
+                return True
+
+            # Halves still to write, in order from the end of the list
+            parts = [batch]
+            written, failures, unwritten = [], [], []
+            while parts:
+                rows = parts.pop()
+                try:
+                    self.write(rows)
+                except (OperationalError, InterfaceError) as e:
+                    # The database is unavailable rather than rejecting these rows
+                    print(f"Error writing {len(rows)} queued events: {e}")
+                    unwritten = rows + [row for part in reversed(parts) for row in part]
+                    break
+                except Exception as e:
+                    if len(rows) == 1:
+                        failures.append((rows[0], str(e)))
+                    else:
+                        middle = len(rows) // 2
+                        parts.extend([rows[middle:], rows[:middle]])
+                    continue
+                written.extend(rows)
+
+            if failures:
+                self.dead_letter(failures)
+            with self.condition:
+                self.pending.extendleft(reversed(unwritten))
+                self.pending_ids.difference_update(row['id'] for row in written)
+                self.pending_ids.difference_update(row['id'] for row, _ in failures)
+                # Rows are spilled and batched in the same order, and whatever
+                # is left unwritten goes back to the front, so the done rows
+                # are always the front of the spill file
+                for _ in range(len(batch) - len(unwritten)):
+                    self.spill_done += self.spill_lines.popleft()
+                self.in_flight = 0
+                self.written += len(written)
+                self.dead_lettered += len(failures)
+                self.condition.notify_all()
+                if unwritten:
+                    self.failed_flushes += 1
+                    return False
+            self.compact_spill()
+            return True
+
+    def write(self, rows):
+        with self.app.app_context():
+            begin_write(db.session)
+            events = insert_events(rows)
+            stats.record_created(events)
+            self.app.extensions['event_feed'].announce('created', events)
+            db.session.commit()
+            self.app.extensions['response_cache'].invalidate_events()
+
+    def status(self):
+        with self.condition:
+            return {
+                'pending': len(self.pending),
+                'in_flight': self.in_flight,
+                'max_size': self.max_size,
+                'accepted': self.accepted,
+                'written': self.written,
+                'rejected': self.rejected,
+                'dead_lettered': self.dead_lettered,
+                'failed_flushes': self.failed_flushes,
+            }
@@ -0,0 +1,155 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROBOTS = ['TurtleBot3', 'CustomRobot']
+WORLDS = ['Warehouse', 'Office', 'Apartment']
+DISASTERS = [None, 'Fire', 'Flood']
+
+class Client:
+    """One keep-alive HTTP connection, reopened after errors."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.conn.request(method, self.prefix + path, body=json.dumps(body) if body is not None else None,
+                              headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+def make_scenarios(write_ratio):
+    """Weighted request mix resembling simulators plus dashboards."""
+    def create(client, state):
+        status, data = client.request('POST', '/api/events', {
+            'robot_type': random.choice(ROBOTS),
+            'world_type': random.choice(WORLDS),
+            'disaster_type': random.choice(DISASTERS)
+        })
+        if status in (201, 202):
+            state['ids'].append(json.loads(data)['id'])
+        return status
+
+    def complete(client, state):
+        if not state['ids']:
+            return create(client, state)
+        event_id = state['ids'].pop()
+        status, _ = client.request('POST', f'/api/events/{event_id}/complete',
+                                   {'resolution_time_seconds': random.uniform(10, 600)})
+        return status
+
+    def get_event(client, state):
+        event_id = random.choice(state['ids']) if state['ids'] else 1
+        return client.request('GET', f'/api/events/{event_id}')[0]
+
+    def list_events(client, state):
+        return client.request('GET', '/api/events?limit=50')[0]
+
+    writes = [(create, write_ratio / 2), (complete, write_ratio / 2)]
+    reads = [(get_event, (1 - write_ratio) / 2), (list_events, (1 - write_ratio) / 2)]
+    return writes + reads
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q / 100 * len(sorted_values)))]
+
+def run(url, concurrency, duration, write_ratio):
+    return run_scenarios(url, make_scenarios(write_ratio), concurrency, duration)
+
+def run_scenarios(url, scenarios, concurrency, duration, state=None):
+    """Run weighted (function(client, state) -> status, weight) scenarios from concurrency threads.
+
+    Each thread gets its own keep-alive connection and a copy of state.
+    """
+    functions = [scenario for scenario, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        client = Client(url)
+        worker_state = dict(state or {}, ids=[])
+        while time.monotonic() < deadline:
+            scenario = random.choices(functions, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = scenario(client, worker_state)
+            except (OSError, http.client.HTTPException):
+                status = None
+            latencies[index].append((time.perf_counter() - start) * 1000)
+            if status is None or status >= 400:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = sorted(latency for worker_latencies in latencies for latency in worker_latencies)
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'requests': len(all_latencies),
+        'errors': sum(errors),
+        'requests_per_second': round(len(all_latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': percentile(all_latencies, 50),
+            'p95': percentile(all_latencies, 95),
+            'p99': percentile(all_latencies, 99),
+            'max': all_latencies[-1] if all_latencies else None,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test the simulation database API, e.g. the dev server (python app.py) '
+                    'against gunicorn (python serve.py)'
+    )
+    parser.add_argument('urls', nargs='+', help='base URLs to test, e.g. http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=15, help='seconds per run')
+    parser.add_argument('--write-ratio', type=float, default=0.5, help='share of create/complete requests')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for url in args.urls:
+        for concurrency in args.concurrency:
+            result = run(url, concurrency, args.duration, args.write_ratio)
+            results.append(result)
+            if not args.json and not result['requests']:
+                print(f"{url:<28} c={concurrency:<4} no requests completed")
+            elif not args.json:
+                latency = result['latency_ms']
+                print(f"{url:<28} c={concurrency:<4} {result['requests_per_second']:9.1f} req/s   "
+                      f"p50 {latency['p50']:7.2f} ms   p95 {latency['p95']:7.2f} ms   "
+                      f"p99 {latency['p99']:7.2f} ms   errors {result['errors']}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import bisect
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+class Histogram:
+    """Fixed-bucket latency histogram; percentiles are reported as bucket upper bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def percentile(self, q):
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'max': self.max if self.count else None,
+                'p50': self.percentile(50) if self.count else None,
+                'p95': self.percentile(95) if self.count else None,
+                'p99': self.percentile(99) if self.count else None,
+                'buckets': {
+                    **{f'le_{bound:g}': count for bound, count in zip(self.bounds, self.counts)},
+                    'le_inf': self.counts[-1],
+                },
+            }
+
+class DatabaseMetrics:
+    """Pool checkout wait, query latency and slow query log for one engine."""
+
+    def __init__(self, slow_query_ms=200, explain_slow_queries=False, slow_query_log_size=50):
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow_queries = explain_slow_queries
+        self.checkout_wait = Histogram()
+        self.query_latency = Histogram()
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self.engine = None
+
+    def pool_class(self):
+        """Return a QueuePool subclass that reports checkout waits to this object.
+
+        The class (not an instance) is handed to create_engine, and
+        QueuePool.recreate() reuses self.__class__, so the instrumentation
+        survives engine.dispose().
+        """
+        metrics = self
+
+        class InstrumentedQueuePool(QueuePool):
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    return super()._do_get()
+                finally:
+                    metrics.checkout_wait.observe((time.perf_counter() - start) * 1000)
+
+        return InstrumentedQueuePool
+
+    def instrument(self, engine):
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+        self.query_latency.observe(elapsed_ms)
+        if elapsed_ms < self.slow_query_ms:
+            return
+
+        entry = {
+            'statement': statement,
+            'duration_ms': round(elapsed_ms, 3),
+            'executemany': executemany,
+            'at': datetime.utcnow().isoformat(),
+        }
+        if self.explain_slow_queries and not executemany:
+            entry['plan'] = self.explain(conn, cursor, statement, parameters)
+        self.slow_queries.append(entry)
+
+    def explain(self, conn, cursor, statement, parameters):
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith('SELECT'):
+            return None
+        # A separate DBAPI cursor leaves the original result untouched and does
+        # not go back through these event hooks
+        explain_cursor = cursor.connection.cursor()
+        # On PostgreSQL a failed statement aborts the whole transaction, so
+        # fence the EXPLAIN off in a savepoint
+        savepoint = conn.dialect.name == 'postgresql'
+        try:
+            if savepoint:
+                explain_cursor.execute('SAVEPOINT explain_slow_query')
+            explain_cursor.execute(prefix + statement, parameters)
+            plan = [' '.join(str(column) for column in row) for row in explain_cursor.fetchall()]
+            if savepoint:
+                explain_cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+            return plan
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+            return [f'EXPLAIN failed: {e}']
+        finally:
+            explain_cursor.close()
+
+    def pool_status(self):
+        pool = self.engine.pool if self.engine is not None else None
+        if not isinstance(pool, QueuePool):
+            return {'class': type(pool).__name__ if pool else None}
+        return {
+            'class': type(pool).__name__,
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'timeout': pool.timeout(),
+        }
+
+    def snapshot(self):
+        return {
+            'pool': self.pool_status(),
+            'checkout_wait_ms': self.checkout_wait.snapshot(),
+            'query_latency_ms': self.query_latency.snapshot(),
+            'slow_query_threshold_ms': self.slow_query_ms,
+            'slow_queries': list(self.slow_queries),
+        }
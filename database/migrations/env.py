@@ -96,6 +96,11 @@ def run_migrations_online():
 
     connectable = get_engine()
 
+    # SQLite cannot ALTER most things in place; batch mode makes alter_column
+    # and friends recreate the table instead, so one migration runs on both
+    # engines
+    conf_args.setdefault("render_as_batch", connectable.dialect.name == "sqlite")
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
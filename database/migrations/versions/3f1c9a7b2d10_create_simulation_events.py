@@ -0,0 +1,39 @@
+"""create simulation_events
+
+Revision ID: 3f1c9a7b2d10
+Revises: 
+Create Date: 2026-10-18 09:12:44.512833
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7b2d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # init_db.py runs db.create_all() before upgrading, so the table may
+    # already be there on existing installs
+    if sa.inspect(op.get_bind()).has_table('simulation_events'):
+        return
+
+    op.create_table('simulation_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('robot_type', sa.String(length=100), nullable=False),
+    sa.Column('world_type', sa.String(length=100), nullable=False),
+    sa.Column('disaster_type', sa.String(length=100), nullable=True),
+    sa.Column('resolution_time_seconds', sa.Float(), nullable=True),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('simulation_events')
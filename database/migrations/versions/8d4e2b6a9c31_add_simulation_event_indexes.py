@@ -0,0 +1,36 @@
+"""add simulation_events keyset pagination indexes
+
+Revision ID: 8d4e2b6a9c31
+Revises: 3f1c9a7b2d10
+Create Date: 2026-10-18 09:20:03.184410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e2b6a9c31'
+down_revision = '3f1c9a7b2d10'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_simulation_events_started_at_id': ['started_at', 'id'],
+    'ix_simulation_events_robot_world_disaster_started':
+        ['robot_type', 'world_type', 'disaster_type', 'started_at', 'id'],
+    'ix_simulation_events_completed_started': ['completed', 'started_at', 'id'],
+}
+
+
+def upgrade():
+    # db.create_all() already builds these on fresh databases
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('simulation_events')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'simulation_events', columns, unique=False)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='simulation_events')
@@ -0,0 +1,40 @@
+"""add archived_event_stats monthly rollup table
+
+Revision ID: a7e3f5c1b9d2
+Revises: d91a6c3f7e25
+Create Date: 2026-10-18 15:12:09.471835
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3f5c1b9d2'
+down_revision = 'd91a6c3f7e25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('archived_event_stats'):
+        return
+
+    op.create_table('archived_event_stats',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('robot_type', sa.String(length=100), nullable=False),
+    sa.Column('world_type', sa.String(length=100), nullable=False),
+    sa.Column('disaster_type', sa.String(length=100), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('resolution_total', sa.Float(), nullable=False),
+    sa.Column('resolution_min', sa.Float(), nullable=True),
+    sa.Column('resolution_max', sa.Float(), nullable=True),
+    sa.Column('histogram', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('month', 'robot_type', 'world_type', 'disaster_type')
+    )
+
+
+def downgrade():
+    op.drop_table('archived_event_stats')
@@ -0,0 +1,40 @@
+"""add simulation_event_stats rollup table
+
+Revision ID: b52f7c0e4a18
+Revises: 8d4e2b6a9c31
+Create Date: 2026-10-18 10:02:37.905211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52f7c0e4a18'
+down_revision = '8d4e2b6a9c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('simulation_event_stats'):
+        return
+
+    op.create_table('simulation_event_stats',
+    sa.Column('robot_type', sa.String(length=100), nullable=False),
+    sa.Column('world_type', sa.String(length=100), nullable=False),
+    sa.Column('disaster_type', sa.String(length=100), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('resolution_total', sa.Float(), nullable=False),
+    sa.Column('resolution_min', sa.Float(), nullable=True),
+    sa.Column('resolution_max', sa.Float(), nullable=True),
+    sa.Column('histogram', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('robot_type', 'world_type', 'disaster_type')
+    )
+    # Existing events are folded in with `flask rebuild-stats`
+
+
+def downgrade():
+    op.drop_table('simulation_event_stats')
@@ -0,0 +1,135 @@
+"""partition simulation_events by month on started_at (PostgreSQL only)
+
+Revision ID: c2f8d4a6e1b7
+Revises: a7e3f5c1b9d2
+Create Date: 2026-10-18 15:40:26.118402
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f8d4a6e1b7'
+down_revision = 'a7e3f5c1b9d2'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('id, robot_type, world_type, disaster_type, resolution_time_seconds, '
+           'completed, started_at, completed_at')
+
+TABLE_DDL = """
+CREATE TABLE simulation_events (
+    id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+    robot_type VARCHAR(100) NOT NULL,
+    world_type VARCHAR(100) NOT NULL,
+    disaster_type VARCHAR(100),
+    resolution_time_seconds FLOAT,
+    completed BOOLEAN,
+    started_at TIMESTAMP WITHOUT TIME ZONE {started_at},
+    completed_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY ({primary_key})
+){partitioning}
+"""
+
+INDEXES = {
+    'ix_simulation_events_started_at_id': ['started_at', 'id'],
+    'ix_simulation_events_robot_world_disaster_started':
+        ['robot_type', 'world_type', 'disaster_type', 'started_at', 'id'],
+    'ix_simulation_events_completed_started': ['completed', 'started_at', 'id'],
+}
+
+# Partitions created beyond the current month; partitions.ensure_partitions()
+# keeps extending them afterwards
+MONTHS_AHEAD = 3
+
+
+def is_partitioned(bind):
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'simulation_events' AND pg_table_is_visible(c.oid)"
+    )).first() is not None
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def replace_table(bind, old_name, partitioned):
+    """Move simulation_events aside as old_name, recreate it and copy the rows over."""
+    inspector = sa.inspect(bind)
+    primary_key = inspector.get_pk_constraint('simulation_events')['name']
+    existing = {index['name'] for index in inspector.get_indexes('simulation_events')}
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('simulation_events', 'id')")).scalar()
+
+    # Keep the id sequence alive when the old table is dropped
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    op.execute(f'ALTER TABLE simulation_events RENAME TO {old_name}')
+    op.execute(f'ALTER TABLE {old_name} RENAME CONSTRAINT {primary_key} TO {old_name}_pkey')
+    for name in INDEXES:
+        if name in existing:
+            op.execute(f'DROP INDEX {name}')
+
+    op.execute(TABLE_DDL.format(
+        sequence=sequence,
+        started_at="NOT NULL DEFAULT (now() AT TIME ZONE 'utc')" if partitioned else '',
+        primary_key='id, started_at' if partitioned else 'id',
+        partitioning=' PARTITION BY RANGE (started_at)' if partitioned else '',
+    ))
+
+    if partitioned:
+        first, = bind.execute(sa.text(f'SELECT min(started_at) FROM {old_name}')).first()
+        now = datetime.utcnow()
+        month = datetime((first or now).year, (first or now).month, 1)
+        end = add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD + 1)
+        while month < end:
+            following = add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE simulation_events_{month:%Y_%m} PARTITION OF simulation_events "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            )
+            month = following
+        # Rows beyond the last monthly partition land here until one is created for them
+        op.execute('CREATE TABLE simulation_events_default PARTITION OF simulation_events DEFAULT')
+
+    # Indexes on a partitioned table are created on every partition, present and future
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'simulation_events', columns, unique=False)
+    op.execute(f'INSERT INTO simulation_events ({COLUMNS}) SELECT {COLUMNS} FROM {old_name}')
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY simulation_events.id')
+    op.execute(f'DROP TABLE {old_name}')
+    op.execute('ANALYZE simulation_events')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or is_partitioned(bind):
+        return
+
+    # The partition key is part of the primary key, so it cannot be NULL
+    op.execute(
+        "UPDATE simulation_events SET started_at = COALESCE(completed_at, now() AT TIME ZONE 'utc') "
+        "WHERE started_at IS NULL"
+    )
+    # A foreign key to a partitioned table would have to include started_at;
+    # archive.py removes telemetry together with its events instead
+    for foreign_key in sa.inspect(bind).get_foreign_keys('telemetry_chunks'):
+        if foreign_key['referred_table'] == 'simulation_events':
+            op.drop_constraint(foreign_key['name'], 'telemetry_chunks', type_='foreignkey')
+
+    replace_table(bind, 'simulation_events_unpartitioned', partitioned=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not is_partitioned(bind):
+        return
+
+    replace_table(bind, 'simulation_events_partitioned', partitioned=False)
+    op.execute('DELETE FROM telemetry_chunks WHERE event_id NOT IN (SELECT id FROM simulation_events)')
+    op.create_foreign_key(
+        'telemetry_chunks_event_id_fkey', 'telemetry_chunks', 'simulation_events',
+        ['event_id'], ['id'], ondelete='CASCADE'
+    )
@@ -0,0 +1,39 @@
+"""add telemetry_chunks table for per-event pose samples
+
+Revision ID: d91a6c3f7e25
+Revises: b52f7c0e4a18
+Create Date: 2026-10-18 13:41:52.660318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91a6c3f7e25'
+down_revision = 'b52f7c0e4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('telemetry_chunks'):
+        return
+
+    op.create_table('telemetry_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('t_start', sa.Float(), nullable=False),
+    sa.Column('t_end', sa.Float(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['simulation_events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_telemetry_chunks_event_t_start', 'telemetry_chunks', ['event_id', 't_start'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_telemetry_chunks_event_t_start', table_name='telemetry_chunks')
+    op.drop_table('telemetry_chunks')
@@ -1,12 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()
 
 class SimulationEvent(db.Model):
     __tablename__ = 'simulation_events'
+    __table_args__ = (
+        # Keyset pagination walks (started_at, id); the filtered variants let
+        # each page be an index range scan instead of a full table scan
+        Index('ix_simulation_events_started_at_id', 'started_at', 'id'),
+        Index('ix_simulation_events_robot_world_disaster_started',
+              'robot_type', 'world_type', 'disaster_type', 'started_at', 'id'),
+        Index('ix_simulation_events_completed_started', 'completed', 'started_at', 'id'),
+    )
+    # On PostgreSQL the table is range partitioned by month on started_at
+    # (migration c2f8d4a6e1b7, see partitions.py), with (id, started_at) as
+    # its primary key and started_at NOT NULL
     
     id = Column(Integer, primary_key=True)
     robot_type = Column(String(100), nullable=False)
@@ -38,4 +49,62 @@ class SimulationEvent(db.Model):
             'completed': self.completed,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        } 
\ No newline at end of file
+        } 
+
+class SimulationEventStats(db.Model):
+    """Per robot/world/disaster rollup maintained as events are created and completed."""
+    __tablename__ = 'simulation_event_stats'
+    
+    # disaster_type is part of the primary key, so "no disaster" is stored as ''
+    robot_type = Column(String(100), primary_key=True)
+    world_type = Column(String(100), primary_key=True)
+    disaster_type = Column(String(100), primary_key=True, default='')
+    event_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    resolution_total = Column(Float, nullable=False, default=0.0)
+    resolution_min = Column(Float, nullable=True)
+    resolution_max = Column(Float, nullable=True)
+    # Log-bucketed resolution time histogram {bucket: count}, see stats.py
+    histogram = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArchivedEventStats(db.Model):
+    """Monthly rollup of the events archive.py moved out of simulation_events.
+
+    Same counters as SimulationEventStats, one row per month of started_at and
+    robot/world/disaster group.
+    """
+    __tablename__ = 'archived_event_stats'
+    
+    month = Column(Date, primary_key=True)
+    robot_type = Column(String(100), primary_key=True)
+    world_type = Column(String(100), primary_key=True)
+    disaster_type = Column(String(100), primary_key=True, default='')
+    event_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    resolution_total = Column(Float, nullable=False, default=0.0)
+    resolution_min = Column(Float, nullable=True)
+    resolution_max = Column(Float, nullable=True)
+    histogram = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TelemetryChunk(db.Model):
+    """A run of pose samples for one event, packed into a single binary column.
+
+    See telemetry.py for the encoding of data.
+    """
+    __tablename__ = 'telemetry_chunks'
+    __table_args__ = (
+        Index('ix_telemetry_chunks_event_t_start', 'event_id', 't_start'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # PostgreSQL cannot enforce this key against the partitioned events table,
+    # so there it is dropped and archive.py deletes an event's chunks itself
+    event_id = Column(Integer, ForeignKey('simulation_events.id', ondelete='CASCADE'), nullable=False)
+    # Seconds since the start of the run, covering every sample in the chunk
+    t_start = Column(Float, nullable=False)
+    t_end = Column(Float, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
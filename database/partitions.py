@@ -0,0 +1,101 @@
+import re
+from datetime import datetime
+from sqlalchemy import text
+from models import db
+
+# Monthly partitions of simulation_events on PostgreSQL, created by migration
+# c2f8d4a6e1b7. Each covers [first of the month, first of the next month) of
+# started_at and is named simulation_events_YYYY_MM; anything no monthly
+# partition covers goes to simulation_events_default.
+PARENT = 'simulation_events'
+DEFAULT_PARTITION = 'simulation_events_default'
+PARTITION_NAME = re.compile(r'^simulation_events_(\d{4})_(\d{2})$')
+
+def month_floor(value):
+    return datetime(value.year, value.month, 1)
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f'{PARENT}_{month:%Y_%m}'
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :parent AND pg_table_is_visible(c.oid)"
+    ), {'parent': PARENT}).first() is not None
+
+def monthly_partitions():
+    """{first of month: partition name} for the attached monthly partitions."""
+    names = db.session.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {'parent': PARENT})
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+def create_partition(month):
+    """Create and attach the partition for month. Runs inside the caller's transaction.
+
+    Rows for that month that already sit in the default partition are moved
+    into the new table first; PostgreSQL refuses to attach a range the
+    default partition still holds rows for.
+    """
+    name = partition_name(month)
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    db.session.execute(text(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)'))
+    db.session.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE started_at >= :start AND started_at < :end '
+        f'RETURNING *) INSERT INTO {name} SELECT * FROM moved'
+    ), bounds)
+    # Attaching builds the parent's indexes and primary key on the new table
+    db.session.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    ))
+    return name
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create any missing partitions from this month to months_ahead months on.
+
+    Does nothing unless simulation_events is partitioned. Returns the names of
+    the partitions created.
+    """
+    if not is_partitioned():
+        return []
+    this_month = month_floor(now or datetime.utcnow())
+    existing = monthly_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(this_month, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    db.session.commit()
+    return created
+
+def drop_empty_partitions(before):
+    """Drop the monthly partitions that end on or before before and hold no rows.
+
+    Called after archiving: once every event of a month has been moved out,
+    its partition goes too, which keeps planning and maintenance cheap.
+    Returns the names of the dropped partitions.
+    """
+    if not is_partitioned():
+        return []
+    dropped = []
+    for month, name in sorted(monthly_partitions().items()):
+        if add_months(month, 1) > before:
+            continue
+        if db.session.execute(text(f'SELECT 1 FROM {name} LIMIT 1')).first() is None:
+            db.session.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
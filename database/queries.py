@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from models import SimulationEvent
+
+# Query string filters understood by the event list routes
+STRING_FILTERS = ('robot_type', 'world_type', 'disaster_type')
+TIME_FILTERS = {
+    'started_after': (SimulationEvent.started_at, '>='),
+    'started_before': (SimulationEvent.started_at, '<'),
+    'completed_after': (SimulationEvent.completed_at, '>='),
+    'completed_before': (SimulationEvent.completed_at, '<'),
+}
+
+def parse_bool(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'Invalid boolean value: {value}')
+
+def parse_datetime(value):
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid timestamp: {value}')
+    # started_at/completed_at are stored as naive UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    return parsed
+
+def encode_cursor(event):
+    payload = [event.started_at.isoformat() if event.started_at else None, event.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        started_at, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(started_at) if started_at else None), int(event_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def apply_event_filters(query, args):
+    """Apply the robot/world/disaster, completed and time range filters in args."""
+    for field in STRING_FILTERS:
+        if field in args:
+            column = getattr(SimulationEvent, field)
+            value = args[field]
+            query = query.filter(column.is_(None) if value == 'null' else column == value)
+
+    if 'completed' in args:
+        query = query.filter(SimulationEvent.completed.is_(parse_bool(args['completed'])))
+
+    for field, (column, op) in TIME_FILTERS.items():
+        if field in args:
+            value = parse_datetime(args[field])
+            query = query.filter(column >= value if op == '>=' else column < value)
+
+    return query
+
+def apply_keyset(query, cursor, descending=False):
+    """Order by (started_at, id) and resume strictly after the given cursor."""
+    if descending:
+        query = query.order_by(SimulationEvent.started_at.desc(), SimulationEvent.id.desc())
+    else:
+        query = query.order_by(SimulationEvent.started_at.asc(), SimulationEvent.id.asc())
+
+    if cursor:
+        started_at, event_id = decode_cursor(cursor)
+        if started_at is None:
+            query = query.filter(SimulationEvent.id < event_id if descending else SimulationEvent.id > event_id)
+        elif descending:
+            query = query.filter(or_(
+                SimulationEvent.started_at < started_at,
+                and_(SimulationEvent.started_at == started_at, SimulationEvent.id < event_id)
+            ))
+        else:
+            query = query.filter(or_(
+                SimulationEvent.started_at > started_at,
+                and_(SimulationEvent.started_at == started_at, SimulationEvent.id > event_id)
+            ))
+
+    return query
+
+def parse_page_size(args, default, maximum):
+    if 'limit' not in args:
+        return default
+    try:
+        limit = int(args['limit'])
+    except ValueError:
+        raise ValueError(f"Invalid limit: {args['limit']}")
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+def paginate_events(args, default_limit, max_limit, columns=None):
+    """Return one page of events matching args and the cursor for the next page.
+
+    With columns, the page holds plain rows of those columns instead of
+    SimulationEvent objects; they must include started_at and id.
+    """
+    limit = parse_page_size(args, default_limit, max_limit)
+    descending = args.get('order', 'asc').lower() == 'desc'
+
+    query = SimulationEvent.query.with_entities(*columns) if columns else SimulationEvent.query
+    query = apply_event_filters(query, args)
+    query = apply_keyset(query, args.get('cursor'), descending)
+
+    # Fetch one extra row to learn whether another page exists without a COUNT(*)
+    events = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
@@ -1,87 +1,51 @@
-import os
+import argparse
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-from datetime import datetime
+from sqlalchemy import text
+from models import db, SimulationEvent
+from bootstrap import bootstrap, schema_bootstrap
 
-# Load environment variables
-load_dotenv()
+def reset_database(app):
+    """Drop every table and rebuild the schema from the migrations, with sample data.
 
-# Connection parameters from environment
-PG_USER = os.environ.get('POSTGRES_USER', 'postgres')
-PG_PASSWORD = os.environ.get('POSTGRES_PASSWORD', 'postgres')
-PG_DB = os.environ.get('POSTGRES_DB', 'simulation_db')
-PG_HOST = os.environ.get('POSTGRES_HOST', 'localhost')
+    Works the same on PostgreSQL and SQLite: the tables come from the models
+    and migrations instead of hand-written DDL.
+    """
+    try:
+        with app.app_context():
+            print("Dropping all tables...")
+            # Dropping the partitioned simulation_events also drops its partitions
+            db.drop_all()
+            with db.engine.begin() as connection:
+                connection.execute(text('DROP TABLE IF EXISTS alembic_version'))
+                schema_bootstrap.drop(connection, checkfirst=True)
 
-# Database connection string
-DB_URI = f'postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:5432/{PG_DB}'
-print(f"Connecting to: postgresql+psycopg2://{PG_USER}:****@{PG_HOST}:5432/{PG_DB}")
+        bootstrap(app, seed=True, force=True)
 
-try:
-    # Create engine and session
-    engine = create_engine(DB_URI)
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    
-    # Create simulation_events table directly with SQL
-    print("Creating simulation_events table...")
-    session.execute("""
-    CREATE TABLE IF NOT EXISTS simulation_events (
-        id SERIAL PRIMARY KEY,
-        robot_type VARCHAR(100) NOT NULL,
-        world_type VARCHAR(100) NOT NULL,
-        disaster_type VARCHAR(100),
-        resolution_time_seconds FLOAT,
-        completed BOOLEAN DEFAULT FALSE,
-        started_at TIMESTAMP DEFAULT NOW(),
-        completed_at TIMESTAMP
-    )
-    """)
-    
-    # Insert sample data
-    print("Inserting sample data...")
-    current_time = datetime.utcnow()
-    
-    # First sample: TurtleBot3 in Warehouse
-    session.execute("""
-    INSERT INTO simulation_events 
-    (robot_type, world_type, disaster_type, completed, started_at)
-    VALUES ('TurtleBot3', 'Warehouse', NULL, FALSE, :timestamp)
-    """, {"timestamp": current_time})
-    
-    # Second sample: TurtleBot3 in Office with Fire (completed)
-    completed_time = datetime.utcnow()
-    session.execute("""
-    INSERT INTO simulation_events 
-    (robot_type, world_type, disaster_type, resolution_time_seconds, completed, started_at, completed_at)
-    VALUES ('TurtleBot3', 'Office', 'Fire', 120.5, TRUE, :timestamp, :completed_timestamp)
-    """, {"timestamp": current_time, "completed_timestamp": completed_time})
-    
-    # Third sample: CustomRobot in Apartment with Flood
-    session.execute("""
-    INSERT INTO simulation_events 
-    (robot_type, world_type, disaster_type, completed, started_at)
-    VALUES ('CustomRobot', 'Apartment', 'Flood', FALSE, :timestamp)
-    """, {"timestamp": current_time})
-    
-    # Commit changes
-    session.commit()
-    print("Sample data inserted successfully!")
-    
-    # Verify data was inserted
-    result = session.execute("SELECT COUNT(*) FROM simulation_events")
-    count = result.scalar()
-    print(f"Total records in simulation_events: {count}")
-    
-    print("Database reset complete!")
-    
-except Exception as e:
-    print(f"ERROR: {e}")
-    import traceback
-    traceback.print_exc()
-finally:
-    # Close session
-    if 'session' in locals():
-        session.close()
-    print("Done.") 
\ No newline at end of file
+        with app.app_context():
+            count = db.session.query(SimulationEvent).count()
+            print(f"Total records in simulation_events: {count}")
+
+        print("Database reset complete!")
+
+    except Exception as e:
+        print(f"ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        print("Done.")
+
+if __name__ == '__main__':
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Delete all data and recreate the simulation database schema')
+    parser.add_argument('--yes', action='store_true', help='do not ask for confirmation')
+    args = parser.parse_args()
+
+    app = create_app(start_background=False)
+    if not args.yes:
+        from config import masked_uri
+        answer = input(f"Delete everything in {masked_uri(app.config['SQLALCHEMY_DATABASE_URI'])}? [y/N] ")
+        if answer.strip().lower() != 'y':
+            sys.exit(1)
+    reset_database(app)
+    sys.stdout.flush()
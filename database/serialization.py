@@ -0,0 +1,92 @@
+import json
+from operator import attrgetter
+from sqlalchemy.engine import Row
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+from models import SimulationEvent
+
+try:
+    import msgpack
+except ImportError:  # optional, see requirements.txt
+    msgpack = None
+
+# Same keys and order as SimulationEvent.to_dict()
+EVENT_FIELDS = ('id', 'robot_type', 'world_type', 'disaster_type', 'resolution_time_seconds',
+                'completed', 'started_at', 'completed_at')
+LAYOUTS = ('records', 'columnar')
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+EVENT_COLUMNS = tuple(getattr(SimulationEvent, field) for field in EVENT_FIELDS)
+
+_event_values = attrgetter(*EVENT_FIELDS)
+
+def event_rows(events):
+    """Event values as tuples in EVENT_FIELDS order, timestamps as ISO strings.
+
+    events are SimulationEvent objects or, much cheaper to fetch, rows
+    selected with EVENT_COLUMNS (see queries.paginate_events).
+    """
+    rows = []
+    for event in events:
+        values = tuple(event) if isinstance(event, Row) else _event_values(event)
+        started_at, completed_at = values[6], values[7]
+        rows.append(values[:6] + (
+            started_at.isoformat() if started_at else None,
+            completed_at.isoformat() if completed_at else None,
+        ))
+    return rows
+
+def events_payload(events, layout='records'):
+    """The list response body before encoding.
+
+    records is the classic array of objects. columnar names every field once
+    and gives one array per field, which is smaller and faster to build.
+    """
+    rows = event_rows(events)
+    if layout == 'columnar':
+        columns = list(zip(*rows)) if rows else [()] * len(EVENT_FIELDS)
+        return {
+            'fields': EVENT_FIELDS,
+            'count': len(rows),
+            'columns': {field: list(values) for field, values in zip(EVENT_FIELDS, columns)},
+        }
+    return [dict(zip(EVENT_FIELDS, row)) for row in rows]
+
+def event_payload(event):
+    return dict(zip(EVENT_FIELDS, event_rows([event])[0]))
+
+def accepted_mimetypes():
+    return (JSON_MIMETYPE,) + (MSGPACK_MIMETYPES if msgpack else ())
+
+def negotiate(request):
+    """Return (mimetype, layout) for a response, from Accept and ?layout=.
+
+    Raises ValueError for an unknown layout.
+    """
+    layout = request.args.get('layout', 'records')
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    mimetype = request.accept_mimetypes.best_match(accepted_mimetypes(), default=JSON_MIMETYPE)
+    if mimetype in MSGPACK_MIMETYPES:
+        mimetype = MSGPACK_MIMETYPE
+    return mimetype, layout
+
+def encode(payload, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(payload)
+    # Plain json.dumps: Flask's provider sorts keys and goes through a default
+    # hook for every object, which is the slow part of jsonify()
+    return f"{json.dumps(payload, separators=(',', ':'))}\n".encode()
+
+def request_data(request):
+    """The decoded JSON or MessagePack request body, like request.json."""
+    if request.mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise UnsupportedMediaType('MessagePack support is not installed')
+        try:
+            return msgpack.unpackb(request.get_data())
+        except ValueError as e:
+            raise BadRequest(f'Invalid MessagePack body: {e}')
+    return request.json
@@ -0,0 +1,25 @@
+import os
+import sys
+
+def serve_gunicorn():
+    # Replace this process with gunicorn; it picks up gunicorn.conf.py from this directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', 'wsgi:app'])
+
+def serve_waitress():
+    # gunicorn does not run on Windows; waitress is a threaded (non-forking) server
+    from waitress import serve
+    from app import create_app
+    # Set before the app reads its config, which sizes the live feed to fit
+    os.environ.setdefault('API_THREADS', '16')
+    app = create_app()
+    host, port = os.environ.get('API_BIND', '0.0.0.0:5000').rsplit(':', 1)
+    threads = app.config['API_THREADS']
+    print(f"Serving on http://{host}:{port} with waitress ({threads} threads)")
+    serve(app, host=host, port=int(port), threads=threads)
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        serve_waitress()
+    else:
+        serve_gunicorn()
@@ -0,0 +1,80 @@
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
+
+# SQLite runs inside the API process: the database is one file, readers never
+# block thanks to the write-ahead log, and there is a single write lock.
+#
+# pysqlite's own transaction handling is switched off (it never starts a
+# transaction for a SELECT and breaks SAVEPOINT); instead every SQLAlchemy
+# transaction begins with an explicit BEGIN, and write transactions with
+# BEGIN IMMEDIATE, see begin_write().
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+def is_memory(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+def engine_options(config, pool_class=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for a SQLite database URI."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_memory(uri):
+        # SQLAlchemy keeps one connection per thread for in-memory databases
+        return {}
+    options = {
+        # Connections are cheap, but one per serving thread avoids queueing on the pool
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'connect_args': {
+            # How long BEGIN IMMEDIATE waits for another writer to commit
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'check_same_thread': False,
+        },
+    }
+    if pool_class is not None:
+        options['poolclass'] = pool_class
+    return options
+
+def configure_sqlite(engine, config):
+    """Set the pragmas on every new connection and take over transaction control."""
+    memory = is_memory(config['SQLALCHEMY_DATABASE_URI'])
+    pragmas = [
+        f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        'foreign_keys = ON',
+        f"cache_size = -{config['SQLITE_CACHE_SIZE_KB']}",
+        f"mmap_size = {config['SQLITE_MMAP_SIZE']}",
+        'temp_store = MEMORY',
+    ]
+    if not memory:
+        # Readers see the last commit while a writer works, and commits only
+        # append to the log; with synchronous = NORMAL they no longer fsync
+        pragmas.insert(0, 'journal_mode = WAL')
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin(conn):
+        conn.exec_driver_sql(f"BEGIN {conn.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+def begin_write(session):
+    """Start session's next transaction as a write transaction.
+
+    On SQLite this issues BEGIN IMMEDIATE, which takes the write lock up front,
+    queueing behind other writers for up to SQLITE_BUSY_TIMEOUT_MS. A deferred
+    transaction that reads first would instead fail with "database is locked"
+    when it tries to write after another connection committed. It also makes
+    the read-modify-write of a completion atomic, which SELECT ... FOR UPDATE
+    does elsewhere. Call before the session runs any statement; a no-op on
+    other backends or once the transaction has begun.
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.get_bind().dialect.name == 'sqlite' and not session.in_transaction():
+        session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
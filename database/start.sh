@@ -32,13 +32,13 @@ done
 
 # Initialize the database
 echo "Initializing database..."
-python init_db.py || {
+python bootstrap.py || {
     echo "Database initialization failed."
     echo "Please check your PostgreSQL configuration."
     echo "See the README.md for configuration instructions."
     exit 1
 }
 
-# Start the Flask application
+# Start the API under gunicorn (see gunicorn.conf.py)
 echo "Starting Flask API..."
-python app.py 
\ No newline at end of file
+python serve.py 
\ No newline at end of file
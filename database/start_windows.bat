@@ -28,11 +28,11 @@ pip install -r requirements.txt
 
 REM Initialize the database
 echo Initializing database...
-python init_db.py
+python bootstrap.py
 
-REM Start the Flask application
+REM Start the API under waitress (multi-threaded production server)
 echo Starting Flask API server...
-python app.py
+python serve.py
 
 REM This line will only execute if the app crashes or is closed
 call venv\Scripts\deactivate.bat
@@ -0,0 +1,267 @@
+import math
+from collections import Counter, defaultdict
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from sqlalchemy import func
+from models import db, SimulationEvent, SimulationEventStats, ArchivedEventStats
+
+# Resolution times go into logarithmic buckets whose width keeps every
+# percentile estimate within RELATIVE_ACCURACY of the true value. Histograms
+# from different groups merge by adding bucket counts, so any roll-up of the
+# robot/world/disaster groups can be answered without touching the events.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_POSITIVE = 1e-3
+ZERO_BUCKET = 'z'
+
+GROUP_FIELDS = ('robot_type', 'world_type', 'disaster_type')
+ARCHIVE_GROUP_FIELDS = ('month',) + GROUP_FIELDS
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+def bucket_key(value):
+    if value < MIN_POSITIVE:
+        return ZERO_BUCKET
+    return str(math.ceil(math.log(value) / LOG_GAMMA))
+
+def bucket_value(key):
+    if key == ZERO_BUCKET:
+        return 0.0
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+def group_key(event):
+    return (event.robot_type, event.world_type, event.disaster_type or '')
+
+def get_group_row(key):
+    """Lock and return the rollup row for key, creating it if needed."""
+    filters = dict(zip(GROUP_FIELDS, key))
+    row = SimulationEventStats.query.filter_by(**filters).with_for_update().first()
+    if row:
+        return row
+
+    try:
+        with db.session.begin_nested():
+            row = SimulationEventStats(
+                event_count=0, completed_count=0, resolution_total=0.0, histogram={}, **filters
+            )
+            db.session.add(row)
+        return row
+    except IntegrityError:
+        # Another transaction created the row first
+        return SimulationEventStats.query.filter_by(**filters).with_for_update().one()
+
+def record_created(events):
+    """Count newly created events. Runs inside the caller's transaction."""
+    for key, count in Counter(group_key(event) for event in events).items():
+        row = get_group_row(key)
+        row.event_count += count
+
+def previous_resolutions(event_ids):
+    """Lock the given events and return {id: resolution_time_seconds or None}.
+
+    Call before completing events so record_completed can replace, rather than
+    double count, the resolution time of an event that is completed twice.
+    """
+    rows = db.session.execute(
+        db.select(SimulationEvent.id, SimulationEvent.completed, SimulationEvent.resolution_time_seconds)
+        .where(SimulationEvent.id.in_(list(event_ids)))
+        .with_for_update()
+    )
+    return {row.id: row.resolution_time_seconds if row.completed else None for row in rows}
+
+def record_completed(events, previous=None):
+    """Add the resolution times of completed events to their groups.
+
+    previous maps event id to the resolution time it had before this
+    completion (None if it was not completed). Re-completing an event moves it
+    to its new bucket; if its old time was the group's min or max, the range
+    is recomputed from the group's events. Runs inside the caller's
+    transaction, after the events have been updated.
+    """
+    previous = previous or {}
+    by_group = defaultdict(list)
+    for event in events:
+        if event.resolution_time_seconds is None:
+            continue
+        by_group[group_key(event)].append((event.resolution_time_seconds, previous.get(event.id)))
+
+    for key, values in by_group.items():
+        row = get_group_row(key)
+        histogram = dict(row.histogram or {})
+        range_replaced = False
+        for value, old_value in values:
+            if old_value is None:
+                row.completed_count += 1
+            else:
+                row.resolution_total -= old_value
+                old_bucket = bucket_key(old_value)
+                histogram[old_bucket] = histogram.get(old_bucket, 0) - 1
+                if histogram[old_bucket] <= 0:
+                    del histogram[old_bucket]
+                range_replaced = range_replaced or old_value in (row.resolution_min, row.resolution_max)
+
+            add_resolution(row, histogram, value)
+
+        if range_replaced:
+            row.resolution_min, row.resolution_max = resolution_range(key)
+        # Assign a new dict so the JSON column is flagged as modified
+        row.histogram = histogram
+
+def resolution_range(key):
+    """Exact (min, max) resolution time of group key, over its events and its archived months."""
+    robot_type, world_type, disaster_type = key
+    live = db.session.execute(
+        db.select(func.min(SimulationEvent.resolution_time_seconds),
+                  func.max(SimulationEvent.resolution_time_seconds))
+        .where(SimulationEvent.robot_type == robot_type,
+               SimulationEvent.world_type == world_type,
+               func.coalesce(SimulationEvent.disaster_type, '') == disaster_type,
+               SimulationEvent.completed.is_(True),
+               SimulationEvent.resolution_time_seconds.isnot(None))
+    ).one()
+    archived = db.session.execute(
+        db.select(func.min(ArchivedEventStats.resolution_min), func.max(ArchivedEventStats.resolution_max))
+        .filter_by(**dict(zip(GROUP_FIELDS, key)))
+    ).one()
+    mins = [value for value in (live[0], archived[0]) if value is not None]
+    maxes = [value for value in (live[1], archived[1]) if value is not None]
+    return (min(mins) if mins else None), (max(maxes) if maxes else None)
+
+def add_resolution(row, histogram, value):
+    """Add one resolution time to a rollup row's total, range and histogram."""
+    row.resolution_total += value
+    bucket = bucket_key(value)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+    row.resolution_min = value if row.resolution_min is None else min(row.resolution_min, value)
+    row.resolution_max = value if row.resolution_max is None else max(row.resolution_max, value)
+
+def add_to_rollup(row, event_count, resolutions):
+    """Count event_count events, whose completed ones took resolutions, into row."""
+    row.event_count += event_count
+    histogram = dict(row.histogram or {})
+    for value in resolutions:
+        row.completed_count += 1
+        add_resolution(row, histogram, value)
+    row.histogram = histogram
+
+def merge_rollup(row, other):
+    """Add the counters of the rollup row other to row."""
+    row.event_count += other.event_count
+    row.completed_count += other.completed_count
+    row.resolution_total += other.resolution_total
+    for field, pick in (('resolution_min', min), ('resolution_max', max)):
+        values = [value for value in (getattr(row, field), getattr(other, field)) if value is not None]
+        setattr(row, field, pick(values) if values else None)
+    row.histogram = dict(Counter(row.histogram or {}) + Counter(other.histogram or {}))
+
+def percentile(histogram, total, q):
+    """Nearest-rank percentile: the smallest value at least q% of the values are <= to."""
+    if total <= 0:
+        return None
+    rank = max(1, math.ceil(q / 100 * total))
+    seen = 0
+    for key in sorted(histogram, key=lambda k: -math.inf if k == ZERO_BUCKET else int(k)):
+        seen += histogram[key]
+        if seen >= rank:
+            return bucket_value(key)
+    return None
+
+def summarize(groups, percentiles=DEFAULT_PERCENTILES):
+    """Merge rollup rows that share a group and format them for the API."""
+    event_count = sum(row.event_count for row in groups)
+    completed_count = sum(row.completed_count for row in groups)
+    resolution_total = sum(row.resolution_total for row in groups)
+    mins = [row.resolution_min for row in groups if row.resolution_min is not None]
+    maxes = [row.resolution_max for row in groups if row.resolution_max is not None]
+
+    histogram = Counter()
+    for row in groups:
+        histogram.update(row.histogram or {})
+    total = sum(histogram.values())
+
+    resolution = {
+        'mean': resolution_total / completed_count if completed_count else None,
+        'min': min(mins) if mins else None,
+        'max': max(maxes) if maxes else None,
+    }
+    for q in percentiles:
+        value = percentile(histogram, total, q)
+        # Bucket midpoints can fall just outside the observed range
+        if value is not None:
+            value = min(max(value, resolution['min']), resolution['max'])
+        resolution[f'p{q:g}'] = value
+
+    return {
+        'event_count': event_count,
+        'completed_count': completed_count,
+        'completion_rate': completed_count / event_count if event_count else None,
+        'resolution_time_seconds': resolution,
+    }
+
+def filter_groups(query, model, args):
+    for field in GROUP_FIELDS:
+        if field in args:
+            value = args[field]
+            query = query.filter(getattr(model, field) == ('' if value == 'null' else value))
+    return query
+
+def format_group_value(field, value):
+    if field == 'disaster_type':
+        return value or None
+    if field == 'month':
+        return value.strftime('%Y-%m')
+    return value
+
+def summarize_groups(rows, group_by, percentiles):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[tuple(getattr(row, field) for field in group_by)].append(row)
+
+    results = []
+    for key, rows in sorted(grouped.items()):
+        group = {field: format_group_value(field, value) for field, value in zip(group_by, key)}
+        group.update(summarize(rows, percentiles))
+        results.append(group)
+    return results
+
+def query_stats(args, group_by=GROUP_FIELDS, percentiles=DEFAULT_PERCENTILES):
+    """Return rollup statistics filtered by args and grouped by the group_by fields."""
+    query = filter_groups(SimulationEventStats.query, SimulationEventStats, args)
+    return summarize_groups(query.all(), group_by, percentiles)
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ValueError(f'Invalid month, expected YYYY-MM: {value}')
+
+def query_archived_stats(args, group_by=('month',), percentiles=DEFAULT_PERCENTILES):
+    """Like query_stats() for the archived events, which can also be grouped by month.
+
+    args may restrict the months with since and until (YYYY-MM, inclusive).
+    Raises ValueError for a malformed month.
+    """
+    query = filter_groups(ArchivedEventStats.query, ArchivedEventStats, args)
+    if 'since' in args:
+        query = query.filter(ArchivedEventStats.month >= parse_month(args['since']))
+    if 'until' in args:
+        query = query.filter(ArchivedEventStats.month <= parse_month(args['until']))
+    return summarize_groups(query.all(), group_by, percentiles)
+
+def rebuild_stats():
+    """Recompute the whole rollup table from simulation_events and the archive."""
+    SimulationEventStats.query.delete()
+    # Archived events have left simulation_events but still count
+    for archived in ArchivedEventStats.query.all():
+        merge_rollup(get_group_row(group_key(archived)), archived)
+    batch = []
+    events = db.session.scalars(db.select(SimulationEvent).execution_options(yield_per=1000))
+    for event in events:
+        batch.append(event)
+        if len(batch) >= 1000:
+            record_created(batch)
+            record_completed([e for e in batch if e.completed])
+            batch = []
+    record_created(batch)
+    record_completed([e for e in batch if e.completed])
+    db.session.commit()
@@ -0,0 +1,246 @@
+import math
+import sys
+import zlib
+from array import array
+from operator import itemgetter
+from sqlalchemy import select
+from models import db, TelemetryChunk
+
+# One pose sample: seconds since the start of the run, position and
+# orientation quaternion
+FIELDS = ('t', 'x', 'y', 'z', 'qx', 'qy', 'qz', 'qw')
+IDENTITY_ORIENTATION = {'qx': 0.0, 'qy': 0.0, 'qz': 0.0, 'qw': 1.0}
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+# Largest finite float32; samples are stored as float32, so anything bigger
+# would come back as infinity
+FLOAT32_MAX = 3.4028234663852886e38
+
+def encode_chunk(samples, t_start):
+    """Pack samples into the bytes stored in TelemetryChunk.data.
+
+    Values are little-endian float32 laid out one field after another (every
+    t, then every x, ...) with t relative to t_start. The four bytes of each
+    float are split into separate planes before zlib: consecutive poses share
+    their sign and exponent bytes and constant fields (z, roll, pitch for a
+    ground robot) repeat exactly, so most planes compress to almost nothing.
+    """
+    columns = array('f', [sample[0] - t_start for sample in samples])
+    for field in range(1, len(FIELDS)):
+        columns.extend([sample[field] for sample in samples])
+    if sys.byteorder == 'big':
+        columns.byteswap()
+    raw = columns.tobytes()
+    return zlib.compress(b''.join(raw[plane::4] for plane in range(4)))
+
+def decode_chunk(chunk):
+    """Return the samples of a TelemetryChunk as tuples in FIELDS order."""
+    planes = zlib.decompress(chunk.data)
+    plane_size = len(planes) // 4
+    raw = bytearray(len(planes))
+    for plane in range(4):
+        raw[plane::4] = planes[plane * plane_size:(plane + 1) * plane_size]
+    columns = array('f', raw)
+    if sys.byteorder == 'big':
+        columns.byteswap()
+
+    count = chunk.sample_count
+    times = [chunk.t_start + offset for offset in columns[:count]]
+    fields = [columns[i * count:(i + 1) * count] for i in range(1, len(FIELDS))]
+    return list(zip(times, *fields))
+
+def pack_samples(samples):
+    """Row-major little-endian float32, the format of binary uploads and downloads."""
+    values = array('f', [value for sample in samples for value in sample])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+def parse_samples(data):
+    """Return (samples, error) for a JSON telemetry upload.
+
+    Accepts a list (or {"samples": [...]}) whose items are [t, x, y, z],
+    [t, x, y, z, qx, qy, qz, qw] or objects with those keys. A missing
+    orientation is the identity quaternion.
+    """
+    if isinstance(data, dict):
+        data = data.get('samples')
+    if not isinstance(data, list) or not data:
+        return None, 'Expected a non-empty list of samples'
+
+    samples = []
+    for index, item in enumerate(data):
+        if isinstance(item, dict):
+            missing = [field for field in FIELDS[:4] if field not in item]
+            if missing:
+                return None, f'Sample {index}: missing field {missing[0]}'
+            item = [item.get(field, IDENTITY_ORIENTATION.get(field)) for field in FIELDS]
+        elif isinstance(item, list) and len(item) == 4:
+            item = item + list(IDENTITY_ORIENTATION.values())
+        if not isinstance(item, list) or len(item) != len(FIELDS):
+            return None, f'Sample {index}: expected 4 or {len(FIELDS)} values'
+        # Also false for NaN and infinity, and safe for ints too big for a float
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) <= FLOAT32_MAX
+                   for value in item):
+            return None, f'Sample {index}: values must be finite numbers within float32 range (±{FLOAT32_MAX:g})'
+        samples.append(tuple(float(value) for value in item))
+    return samples, None
+
+def parse_binary_samples(body):
+    """Return (samples, error) for an upload in pack_samples() format."""
+    width = len(FIELDS) * 4
+    if not body or len(body) % width:
+        return None, f'Body must hold {len(FIELDS)} little-endian float32 values per sample'
+    values = array('f', body)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    if not all(map(math.isfinite, values)):
+        return None, 'Samples must be finite numbers'
+    return list(zip(*[iter(values)] * len(FIELDS))), None
+
+def store_samples(event_id, samples, chunk_size):
+    """Append samples to an event's telemetry, chunk_size samples per row.
+
+    Small uploads that continue where the last one ended are merged into the
+    event's newest chunk until it is full, so streaming a few samples at a
+    time still produces a handful of rows per run. The caller commits.
+    Returns the number of chunks written.
+    """
+    samples = sorted(samples, key=itemgetter(0))
+    written = 0
+
+    last = db.session.scalars(
+        select(TelemetryChunk)
+        .where(TelemetryChunk.event_id == event_id)
+        .order_by(TelemetryChunk.t_end.desc(), TelemetryChunk.id.desc())
+        .limit(1)
+        .with_for_update()
+    ).first()
+    if last is not None and last.sample_count < chunk_size and samples[0][0] >= last.t_end:
+        room = chunk_size - last.sample_count
+        merged = decode_chunk(last) + samples[:room]
+        samples = samples[room:]
+        last.data = encode_chunk(merged, last.t_start)
+        last.t_end = merged[-1][0]
+        last.sample_count = len(merged)
+        written += 1
+
+    for i in range(0, len(samples), chunk_size):
+        part = samples[i:i + chunk_size]
+        db.session.add(TelemetryChunk(
+            event_id=event_id,
+            t_start=part[0][0],
+            t_end=part[-1][0],
+            sample_count=len(part),
+            data=encode_chunk(part, part[0][0])
+        ))
+        written += 1
+    return written
+
+def read_samples(event_id, start=None, end=None):
+    """Samples of one event with start <= t <= end, in time order.
+
+    Only the chunks overlapping the range are fetched and decoded.
+    """
+    stmt = select(TelemetryChunk).where(TelemetryChunk.event_id == event_id)
+    if start is not None:
+        stmt = stmt.where(TelemetryChunk.t_end >= start)
+    if end is not None:
+        stmt = stmt.where(TelemetryChunk.t_start <= end)
+    stmt = stmt.order_by(TelemetryChunk.t_start, TelemetryChunk.id)
+
+    samples = []
+    for chunk in db.session.scalars(stmt):
+        samples.extend(decode_chunk(chunk))
+    if start is not None or end is not None:
+        low = -math.inf if start is None else start
+        high = math.inf if end is None else end
+        samples = [sample for sample in samples if low <= sample[0] <= high]
+    # Separate uploads may cover overlapping time ranges
+    if any(a[0] > b[0] for a, b in zip(samples, samples[1:])):
+        samples.sort(key=itemgetter(0))
+    return samples
+
+def every_nth(samples, n):
+    """Every nth sample, keeping the last one so the trail still ends where the run did."""
+    if n <= 1 or len(samples) <= 2:
+        return samples
+    kept = samples[::n]
+    if kept[-1] is not samples[-1]:
+        kept.append(samples[-1])
+    return kept
+
+def squared_segment_distance(p, a, b):
+    dx, dy, dz = b[1] - a[1], b[2] - a[2], b[3] - a[3]
+    px, py, pz = p[1] - a[1], p[2] - a[2], p[3] - a[3]
+    length_sq = dx * dx + dy * dy + dz * dz
+    if length_sq:
+        u = max(0.0, min(1.0, (px * dx + py * dy + pz * dz) / length_sq))
+        px, py, pz = px - u * dx, py - u * dy, pz - u * dz
+    return px * px + py * py + pz * pz
+
+def douglas_peucker(samples, tolerance):
+    """Drop samples whose position lies within tolerance (metres) of the simplified trail."""
+    if tolerance <= 0 or len(samples) <= 2:
+        return samples
+
+    keep = [False] * len(samples)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(samples) - 1)]
+    while stack:
+        first, last = stack.pop()
+        a, b = samples[first], samples[last]
+        farthest, farthest_sq = None, tolerance_sq
+        for i in range(first + 1, last):
+            distance_sq = squared_segment_distance(samples[i], a, b)
+            if distance_sq > farthest_sq:
+                farthest, farthest_sq = i, distance_sq
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [sample for sample, kept in zip(samples, keep) if kept]
+
+def parse_float(args, name, minimum=None):
+    if name not in args:
+        return None
+    try:
+        value = float(args[name])
+    except ValueError:
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(value) or (minimum is not None and value < minimum):
+        raise ValueError(f'{name} must be a finite number' + (f' >= {minimum:g}' if minimum is not None else ''))
+    return value
+
+def parse_int(args, name, default, minimum=1, maximum=None):
+    try:
+        value = int(args.get(name, default))
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f'{name} must be between {minimum} and {maximum}' if maximum is not None
+                         else f'{name} must be at least {minimum}')
+    return value
+
+def query_telemetry(event_id, args, max_points):
+    """Samples for GET /api/events/<id>/telemetry and how many were in range.
+
+    args may hold start/end (seconds), every (keep every nth sample),
+    tolerance (Douglas-Peucker, metres) and max_points. Whatever is left
+    after those is thinned evenly to at most max_points. Raises ValueError
+    for invalid arguments.
+    """
+    start = parse_float(args, 'start')
+    end = parse_float(args, 'end')
+    every = parse_int(args, 'every', 1)
+    tolerance = parse_float(args, 'tolerance', minimum=0)
+    limit = parse_int(args, 'max_points', max_points, minimum=2, maximum=max_points)
+
+    samples = read_samples(event_id, start, end)
+    total = len(samples)
+    samples = every_nth(samples, every)
+    if tolerance:
+        samples = douglas_peucker(samples, tolerance)
+    if len(samples) > limit:
+        samples = every_nth(samples, math.ceil(len(samples) / (limit - 1)))
+    return samples, total
@@ -0,0 +1,73 @@
+import glob
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+pyarrow = pytest.importorskip('pyarrow')
+
+import archive
+from app import create_app
+from bootstrap import bootstrap
+from models import db, SimulationEvent
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'simulation.db'))
+    monkeypatch.setenv('INGEST_MODE', 'sync')
+    app = create_app(start_background=False)
+    bootstrap(app, seed=False)
+    with app.app_context():
+        for event_id in range(1, 6):
+            db.session.execute(text(
+                "INSERT INTO simulation_events (id, robot_type, world_type, disaster_type, "
+                "resolution_time_seconds, completed, started_at, completed_at) "
+                "VALUES (:id, 'TurtleBot3', 'Office', 'Fire', 12.5, 1, :started_at, :started_at)"
+            ), {'id': event_id, 'started_at': datetime(2025, 1, 10)})
+        db.session.commit()
+        yield app
+
+
+def event_ids():
+    return set(db.session.scalars(db.select(SimulationEvent.id)))
+
+
+def archived_ids(archive_dir):
+    paths = glob.glob(os.path.join(archive_dir, 'simulation_events', 'month=*', '*.parquet'))
+    return {event_id for path in paths
+            for event_id in pyarrow.parquet.read_table(path).column('id').to_pylist()}
+
+
+def test_crash_after_commit_is_recovered_on_next_run(app, tmp_path, monkeypatch):
+    archive_dir = str(tmp_path / 'archive')
+
+    def crash(temporary, final):
+        raise OSError('crashed before renaming')
+
+    monkeypatch.setattr(archive, 'promote', crash)
+    with pytest.raises(OSError):
+        archive.archive_events(archive_dir, datetime(2026, 1, 1), progress=False)
+    # The deletes committed, so the events only exist in the .tmp file
+    assert event_ids() == set()
+    assert archived_ids(archive_dir) == set()
+    assert glob.glob(os.path.join(archive_dir, '**', '*.tmp'), recursive=True)
+
+    monkeypatch.undo()
+    events, _, _ = archive.archive_events(archive_dir, datetime(2026, 1, 1), progress=False)
+    assert events == 0
+    assert archived_ids(archive_dir) == {1, 2, 3, 4, 5}
+    assert not glob.glob(os.path.join(archive_dir, '**', '*.tmp'), recursive=True)
+
+
+def test_leftovers_of_a_rolled_back_batch_are_removed(app, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    rows = db.session.execute(archive.archivable(datetime(2026, 1, 1))).all()
+    path = archive.archive_path(archive_dir, 'simulation_events', datetime(2025, 1, 1), [row.id for row in rows])
+    archive.write_parquet(path + '.tmp', rows, archive.event_schema())
+
+    assert archive.recover_temporary(archive_dir) == (0, 1)
+    assert not os.path.exists(path + '.tmp')
+    assert event_ids() == {1, 2, 3, 4, 5}
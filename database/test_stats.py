@@ -0,0 +1,82 @@
+import pytest
+
+import stats
+from app import create_app
+from bootstrap import bootstrap
+from bulk import validate_completion, validate_resolution_time
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'simulation.db'))
+    monkeypatch.setenv('INGEST_MODE', 'sync')
+    app = create_app(start_background=False)
+    bootstrap(app, seed=False)
+    return app.test_client()
+
+
+def histogram_of(values):
+    histogram = {}
+    for value in values:
+        key = stats.bucket_key(value)
+        histogram[key] = histogram.get(key, 0) + 1
+    return histogram
+
+
+@pytest.mark.parametrize('values, q, expected', [
+    ([3, 12.5], 50, 3),
+    ([3, 12.5], 99, 12.5),
+    ([3, 12.5], 100, 12.5),
+    ([1, 2, 30], 50, 2),
+    ([1, 2, 30], 90, 30),
+    ([1, 2, 30], 10, 1),
+])
+def test_percentile_is_nearest_rank_on_small_groups(values, q, expected):
+    value = stats.percentile(histogram_of(values), len(values), q)
+    assert value == pytest.approx(expected, rel=stats.RELATIVE_ACCURACY)
+
+
+def test_percentile_of_empty_group_is_none():
+    assert stats.percentile({}, 0, 50) is None
+
+
+@pytest.mark.parametrize('value', ['12', None, True, float('nan'), float('inf'), -1])
+def test_invalid_resolution_times_are_rejected(value):
+    assert validate_resolution_time(value)[1]
+    assert validate_completion({'id': 1, 'resolution_time_seconds': value})[1]
+
+
+def test_valid_resolution_time():
+    assert validate_resolution_time(0) == (0.0, None)
+    assert validate_completion({'id': 1, 'resolution_time_seconds': 12.5}) == ((1, 12.5), None)
+
+
+def resolution_stats(client):
+    group, = client.get('/api/stats?group_by=robot_type').get_json()
+    return group['resolution_time_seconds']
+
+
+@pytest.mark.parametrize('first, second, expected', [
+    (12.5, 20, (15, 20)),
+    (20, 12.5, (12.5, 15)),
+    (12.5, 14, (14, 15)),
+])
+def test_recompleting_the_extreme_event_recomputes_the_range(client, first, second, expected):
+    other = client.post('/api/events', json={'robot_type': 'TurtleBot3', 'world_type': 'Office'}).get_json()
+    event = client.post('/api/events', json={'robot_type': 'TurtleBot3', 'world_type': 'Office'}).get_json()
+    client.post(f"/api/events/{other['id']}/complete", json={'resolution_time_seconds': 15})
+    client.post(f"/api/events/{event['id']}/complete", json={'resolution_time_seconds': first})
+    client.post(f"/api/events/{event['id']}/complete", json={'resolution_time_seconds': second})
+
+    resolution = resolution_stats(client)
+    assert (resolution['min'], resolution['max']) == expected
+
+
+def test_recompleting_the_only_event_replaces_its_range(client):
+    event = client.post('/api/events', json={'robot_type': 'TurtleBot3', 'world_type': 'Office'}).get_json()
+    client.post(f"/api/events/{event['id']}/complete", json={'resolution_time_seconds': 12.5})
+    client.post(f"/api/events/{event['id']}/complete", json={'resolution_time_seconds': 20})
+
+    resolution = resolution_stats(client)
+    assert (resolution['min'], resolution['max']) == (20, 20)
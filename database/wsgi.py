@@ -0,0 +1,4 @@
+from app import create_app
+
+# Background threads are started per worker by init_worker(), see gunicorn.conf.py
+app = create_app(start_background=False)
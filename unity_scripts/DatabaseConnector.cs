@@ -24,11 +24,80 @@ public class SimulationEventList
     public List<SimulationEvent> events;
 }
 
+// Parses a text/event-stream response as it arrives and hands each message to onMessage
+public class EventFeedHandler : DownloadHandlerScript
+{
+    private readonly Action<string, string> onMessage;
+    private readonly StringBuilder pending = new StringBuilder();
+    private string eventType = "message";
+    private string eventId;
+    private readonly StringBuilder data = new StringBuilder();
+    
+    public string LastEventId { get; private set; }
+    
+    public EventFeedHandler(Action<string, string> onMessage) : base(new byte[4096])
+    {
+        this.onMessage = onMessage;
+    }
+    
+    protected override bool ReceiveData(byte[] received, int dataLength)
+    {
+        pending.Append(Encoding.UTF8.GetString(received, 0, dataLength));
+        string text = pending.ToString();
+        int lineEnd;
+        while ((lineEnd = text.IndexOf('\n')) >= 0)
+        {
+            HandleLine(text.Substring(0, lineEnd).TrimEnd('\r'));
+            text = text.Substring(lineEnd + 1);
+        }
+        pending.Clear().Append(text);
+        return true;
+    }
+    
+    private void HandleLine(string line)
+    {
+        if (line.Length == 0)
+        {
+            // A blank line ends the message
+            if (eventId != null)
+            {
+                LastEventId = eventId;
+            }
+            if (data.Length > 0)
+            {
+                onMessage(eventType, data.ToString());
+            }
+            eventType = "message";
+            data.Clear();
+        }
+        else if (line.StartsWith("id: "))
+        {
+            eventId = line.Substring(4);
+        }
+        else if (line.StartsWith("event: "))
+        {
+            eventType = line.Substring(7);
+        }
+        else if (line.StartsWith("data: "))
+        {
+            data.Append(line.Substring(6));
+        }
+    }
+}
+
 public class DatabaseConnector : MonoBehaviour
 {
     [SerializeField] private string apiBaseUrl = "http://localhost:5000/api";
     
+    [SerializeField] private int telemetryBatchSize = 100;
+    
     private int currentSimulationEventId = -1;
+    private float currentSimulationStartTime;
+    private string lastFeedEventId;
+    private bool feedSubscribed;
+    
+    // Pending pose samples, 8 floats each: t, x, y, z, qx, qy, qz, qw
+    private readonly List<float> telemetryBuffer = new List<float>();
 
     // Start simulation event when robot is spawned
     public void StartSimulationEvent(string robotType, string worldType, string disasterType = null)
@@ -41,6 +110,7 @@ public class DatabaseConnector : MonoBehaviour
     {
         if (currentSimulationEventId != -1)
         {
+            FlushTelemetry();
             StartCoroutine(CompleteSimulationEventCoroutine(currentSimulationEventId, resolutionTimeSeconds));
         }
         else
@@ -49,12 +119,59 @@ public class DatabaseConnector : MonoBehaviour
         }
     }
     
+    // Record the robot pose; samples are uploaded in batches to the current event
+    public void RecordPose(Vector3 position, Quaternion rotation)
+    {
+        if (currentSimulationEventId == -1)
+        {
+            return;
+        }
+        
+        telemetryBuffer.AddRange(new[]
+        {
+            Time.time - currentSimulationStartTime,
+            position.x, position.y, position.z,
+            rotation.x, rotation.y, rotation.z, rotation.w
+        });
+        if (telemetryBuffer.Count >= telemetryBatchSize * 8)
+        {
+            FlushTelemetry();
+        }
+    }
+    
+    // Upload any buffered pose samples now
+    public void FlushTelemetry()
+    {
+        if (currentSimulationEventId == -1 || telemetryBuffer.Count == 0)
+        {
+            return;
+        }
+        
+        // Packed little-endian float32, see database/telemetry.py
+        byte[] body = new byte[telemetryBuffer.Count * sizeof(float)];
+        Buffer.BlockCopy(telemetryBuffer.ToArray(), 0, body, 0, body.Length);
+        telemetryBuffer.Clear();
+        StartCoroutine(SendTelemetryCoroutine(currentSimulationEventId, body));
+    }
+    
     // Get all simulation events
     public void GetAllEvents(Action<List<SimulationEvent>> callback)
     {
         StartCoroutine(GetAllEventsCoroutine(callback));
     }
     
+    // Receive "created"/"completed" notifications as they happen instead of polling GetAllEvents
+    public void SubscribeToEvents(Action<string, SimulationEvent> onEvent)
+    {
+        feedSubscribed = true;
+        StartCoroutine(EventFeedCoroutine(onEvent));
+    }
+    
+    public void UnsubscribeFromEvents()
+    {
+        feedSubscribed = false;
+    }
+    
     // API interaction methods
     private IEnumerator CreateSimulationEvent(string robotType, string worldType, string disasterType)
     {
@@ -84,6 +201,8 @@ public class DatabaseConnector : MonoBehaviour
             {
                 SimulationEvent createdEvent = JsonUtility.FromJson<SimulationEvent>(request.downloadHandler.text);
                 currentSimulationEventId = createdEvent.id;
+                currentSimulationStartTime = Time.time;
+                telemetryBuffer.Clear();
                 Debug.Log($"Created simulation event with ID: {currentSimulationEventId}");
             }
             else
@@ -123,24 +242,105 @@ public class DatabaseConnector : MonoBehaviour
         }
     }
     
-    private IEnumerator GetAllEventsCoroutine(Action<List<SimulationEvent>> callback)
+    private IEnumerator SendTelemetryCoroutine(int eventId, byte[] body)
     {
-        using (UnityWebRequest request = UnityWebRequest.Get(apiBaseUrl + "/events"))
+        using (UnityWebRequest request = new UnityWebRequest(apiBaseUrl + $"/events/{eventId}/telemetry", "POST"))
         {
+            request.uploadHandler = new UploadHandlerRaw(body);
+            request.downloadHandler = new DownloadHandlerBuffer();
+            request.SetRequestHeader("Content-Type", "application/octet-stream");
+            
             yield return request.SendWebRequest();
             
-            if (request.result == UnityWebRequest.Result.Success)
+            if (request.result != UnityWebRequest.Result.Success)
+            {
+                Debug.LogError($"Error sending telemetry for event {eventId}: {request.error}");
+            }
+        }
+    }
+    
+    private IEnumerator EventFeedCoroutine(Action<string, SimulationEvent> onEvent)
+    {
+        while (feedSubscribed)
+        {
+            var handler = new EventFeedHandler((type, data) =>
             {
+                if (type == "created" || type == "completed")
+                {
+                    onEvent(type, JsonUtility.FromJson<SimulationEvent>(data));
+                }
+            });
+            
+            using (UnityWebRequest request = new UnityWebRequest(apiBaseUrl + "/events/stream", "GET"))
+            {
+                request.downloadHandler = handler;
+                if (!string.IsNullOrEmpty(lastFeedEventId))
+                {
+                    // Resume where the last connection stopped; the server replays what was missed
+                    request.SetRequestHeader("Last-Event-ID", lastFeedEventId);
+                }
+                
+                var operation = request.SendWebRequest();
+                while (!operation.isDone && feedSubscribed)
+                {
+                    yield return null;
+                }
+                if (!operation.isDone)
+                {
+                    request.Abort();
+                }
+                else if (request.result != UnityWebRequest.Result.Success)
+                {
+                    Debug.LogWarning($"Event feed disconnected: {request.error}");
+                }
+                
+                if (!string.IsNullOrEmpty(handler.LastEventId))
+                {
+                    lastFeedEventId = handler.LastEventId;
+                }
+            }
+            
+            if (feedSubscribed)
+            {
+                yield return new WaitForSeconds(2f);
+            }
+        }
+    }
+    
+    private IEnumerator GetAllEventsCoroutine(Action<List<SimulationEvent>> callback)
+    {
+        var allEvents = new List<SimulationEvent>();
+        string cursor = null;
+        
+        // The API returns one page at a time; follow X-Next-Cursor until it runs out
+        do
+        {
+            string url = apiBaseUrl + "/events";
+            if (!string.IsNullOrEmpty(cursor))
+            {
+                url += "?cursor=" + UnityWebRequest.EscapeURL(cursor);
+            }
+            
+            using (UnityWebRequest request = UnityWebRequest.Get(url))
+            {
+                yield return request.SendWebRequest();
+                
+                if (request.result != UnityWebRequest.Result.Success)
+                {
+                    Debug.LogError($"Error getting simulation events: {request.error}");
+                    callback(allEvents);
+                    yield break;
+                }
+                
                 string jsonResponse = request.downloadHandler.text;
                 // Parse JSON array response
                 SimulationEventList eventList = JsonUtility.FromJson<SimulationEventList>("{\"events\":" + jsonResponse + "}");
-                callback(eventList.events);
-            }
-            else
-            {
-                Debug.LogError($"Error getting simulation events: {request.error}");
-                callback(new List<SimulationEvent>());
+                allEvents.AddRange(eventList.events);
+                cursor = request.GetResponseHeader("X-Next-Cursor");
             }
         }
+        while (!string.IsNullOrEmpty(cursor));
+        
+        callback(allEvents);
     }
-} 
\ No newline at end of file
+}
\ No newline at end of file